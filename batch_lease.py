@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多机批量提取
+各台机器上的工作进程从共享的任务表（共享卷上的 SQLite）领取工作簿，
+以带心跳的限时租约持有任务；进程崩溃后租约过期，任务会被其他进程重新领取。
+输出先写入临时目录，完成后整体替换最终目录，重复执行结果相同
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from simple_excel_image_extractor import extract_workbook
+from workbook_backends import WORKBOOK_SUFFIXES
+
+DEFAULT_TABLE = "batch_jobs.sqlite"
+STAGING_DIR = ".staging"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    path TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    images INTEGER,
+    error TEXT,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, lease_until);
+"""
+
+
+def output_dir_for(output_root, excel_file):
+    """工作簿对应的输出目录：<工作簿名>_<路径哈希>，不同目录下的同名文件不会冲突"""
+    digest = hashlib.sha1(str(Path(excel_file).resolve()).encode('utf-8')).hexdigest()[:8]
+    return Path(output_root) / f"{Path(excel_file).stem}_{digest}"
+
+
+class WorkTable:
+    """共享任务表：领取、续租、完成、失败都在短的 IMMEDIATE 事务中完成"""
+
+    def __init__(self, db_path=DEFAULT_TABLE, max_attempts=3):
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(str(self.db_path), isolation_level=None, timeout=60)
+        # 共享卷（NFS/SMB）上 WAL 不可靠，使用默认的回滚日志
+        self.conn.execute("PRAGMA busy_timeout=60000")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _transaction(self, func, *args):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(*args)
+            self.conn.execute("COMMIT")
+            return result
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def add(self, paths):
+        """登记工作簿，已存在的任务保持原状态，返回新增数量"""
+        rows = [(str(Path(p).resolve()),) for p in paths]
+
+        def insert():
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO jobs (path) VALUES (?)", rows)
+            return self.conn.total_changes - before
+        return self._transaction(insert)
+
+    def claim(self, worker, lease_seconds):
+        """领取一个待处理或租约已过期的任务，返回 (路径, 第几次尝试)，没有任务时返回None"""
+        def claim_one():
+            now = time.time()
+            row = self.conn.execute(
+                "SELECT path, attempts FROM jobs "
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_until < ?)) AND attempts < ? "
+                "ORDER BY attempts, rowid LIMIT 1",
+                (now, self.max_attempts)).fetchone()
+            if row is None:
+                # 过期且重试次数用完的任务标记为失败
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = COALESCE(error, '租约过期次数过多'), finished_at = ? "
+                    "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                    (now, now, self.max_attempts))
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                "started_at = ?, error = NULL WHERE path = ?",
+                (worker, now + lease_seconds, now, row[0]))
+            return row[0], row[1] + 1
+        return self._transaction(claim_one)
+
+    def heartbeat(self, worker, path, lease_seconds):
+        """续租，租约已被别人接管时返回False"""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_until = ? WHERE path = ? AND worker = ? AND status = 'leased'",
+            (time.time() + lease_seconds, path, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, worker, path, images, publish=None):
+        """
+        标记完成，只有仍持有未过期的租约时才成功
+
+        publish 在同一事务中、确认租约之后调用（发布输出目录）；事务持有写锁，
+        发布期间其他进程无法接管任务，租约已失去时不会调用
+        """
+        def complete_one():
+            now = time.time()
+            row = self.conn.execute(
+                "SELECT 1 FROM jobs WHERE path = ? AND worker = ? AND status = 'leased' AND lease_until >= ?",
+                (path, worker, now)).fetchone()
+            if row is None:
+                return False
+            if publish is not None:
+                publish()
+            self.conn.execute(
+                "UPDATE jobs SET status = 'done', images = ?, finished_at = ?, lease_until = NULL WHERE path = ?",
+                (images, now, path))
+            return True
+        return self._transaction(complete_one)
+
+    def fail(self, worker, path, error):
+        """记录失败：还有重试次数时放回待处理，否则标记为失败"""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+            "error = ?, finished_at = ?, lease_until = NULL "
+            "WHERE path = ? AND worker = ? AND status = 'leased'",
+            (self.max_attempts, error, time.time(), path, worker))
+        return cursor.rowcount == 1
+
+    def has_live_leases(self):
+        row = self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND lease_until >= ?", (time.time(),)).fetchone()
+        return row[0] > 0
+
+    def stats(self):
+        """按状态统计任务数，以及总图片数和吞吐量"""
+        stats = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        for status, count in self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            stats[status] = count
+        images, first, last = self.conn.execute(
+            "SELECT COALESCE(SUM(images), 0), MIN(started_at), MAX(finished_at) FROM jobs WHERE status = 'done'"
+        ).fetchone()
+        stats['images'] = images
+        stats['workers'] = self.conn.execute(
+            "SELECT COUNT(DISTINCT worker) FROM jobs WHERE status = 'done'").fetchone()[0]
+        elapsed = (last - first) if first and last else 0
+        stats['elapsed'] = elapsed
+        stats['workbooks_per_sec'] = stats['done'] / elapsed if elapsed > 0 else 0.0
+        stats['images_per_sec'] = images / elapsed if elapsed > 0 else 0.0
+        return stats
+
+
+class _Heartbeat(threading.Thread):
+    """在后台定期续租；使用独立的数据库连接"""
+
+    def __init__(self, db_path, worker, path, lease_seconds, interval):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.worker = worker
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self.lost = False
+        self._halt = threading.Event()
+
+    def run(self):
+        with WorkTable(self.db_path) as table:
+            while not self._halt.wait(self.interval):
+                try:
+                    if not table.heartbeat(self.worker, self.path, self.lease_seconds):
+                        self.lost = True
+                        return
+                except sqlite3.Error:
+                    # 暂时无法访问共享表时下次再试，租约仍可能有效
+                    continue
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+def _publish(staging, final):
+    """用暂存目录整体替换最终输出目录"""
+    final.parent.mkdir(parents=True, exist_ok=True)
+    trash = None
+    if final.exists():
+        trash = final.with_name(f"{final.name}.old-{uuid.uuid4().hex[:8]}")
+        os.replace(final, trash)
+    os.replace(staging, final)
+    if trash is not None:
+        shutil.rmtree(trash, ignore_errors=True)
+
+
+def _remove_stale_staging(output_root, name):
+    """删除之前的尝试（崩溃的工作进程）留下的暂存目录"""
+    staging_root = Path(output_root) / STAGING_DIR
+    if not staging_root.is_dir():
+        return
+    for stale in staging_root.iterdir():
+        if stale.name.startswith(f"{name}."):
+            shutil.rmtree(stale, ignore_errors=True)
+            print(f"已清理遗留的暂存目录: {stale.name}")
+
+
+def run_worker(table_path, output_root, worker=None, lease_seconds=60.0, wait=True,
+               poll_interval=1.0, max_attempts=3, extractor_options=None):
+    """
+    工作进程主循环：领取 -> 提取到暂存目录 -> 发布 -> 标记完成
+
+    wait 为 True 时，只要还有别人持有的有效租约就继续等待（以便接手崩溃进程的任务）
+
+    Returns:
+        (完成数, 失败数)
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    output_root = Path(output_root)
+    options = dict(extractor_options or {})
+    done = failed = 0
+
+    with WorkTable(table_path, max_attempts) as table:
+        while True:
+            job = table.claim(worker, lease_seconds)
+            if job is None:
+                if wait and table.has_live_leases():
+                    time.sleep(poll_interval)
+                    continue
+                return done, failed
+
+            path, attempt = job
+            final = output_dir_for(output_root, path)
+            if attempt > 1:
+                # 重新领取的任务：之前持有租约的进程已失去租约，它的暂存目录不会再被发布
+                _remove_stale_staging(output_root, final.name)
+            staging = output_root / STAGING_DIR / f"{final.name}.{uuid.uuid4().hex[:8]}"
+            heartbeat = _Heartbeat(table_path, worker, path, lease_seconds, max(lease_seconds / 3, 0.1))
+            heartbeat.start()
+            try:
+                if not os.path.exists(path):
+                    images, error = 0, "文件不存在"
+                else:
+                    images, error = extract_workbook(path, staging, **options)
+            except Exception as e:
+                images, error = 0, str(e)
+            finally:
+                heartbeat.stop()
+
+            if heartbeat.lost:
+                # 租约已被接管，丢弃本次结果
+                shutil.rmtree(staging, ignore_errors=True)
+                print(f"[{worker}] 租约丢失，放弃: {path}")
+                continue
+            if error:
+                shutil.rmtree(staging, ignore_errors=True)
+                table.fail(worker, path, error)
+                failed += 1
+                print(f"[{worker}] 失败（第{attempt}次）: {path}（{error}）")
+                continue
+
+            def publish():
+                if staging.exists():
+                    _publish(staging, final)
+            if table.complete(worker, path, images, publish):
+                done += 1
+                print(f"[{worker}] 完成: {path}，{images} 张图片")
+            else:
+                # 心跳之后租约过期或被接管，不发布本次结果
+                shutil.rmtree(staging, ignore_errors=True)
+                print(f"[{worker}] 租约丢失，放弃: {path}")
+
+
+def _worker_process(args):
+    table_path, output_root, index, options = args
+    worker = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    return run_worker(table_path, output_root, worker, **options)
+
+
+def _collect_workbooks(inputs):
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            for child in sorted(path.rglob("*")):
+                if child.suffix.lower() in WORKBOOK_SUFFIXES and not child.name.startswith("~$"):
+                    yield child
+        else:
+            yield path
+
+
+def _print_stats(stats):
+    print(f"待处理 {stats['pending']}，处理中 {stats['leased']}，完成 {stats['done']}，失败 {stats['failed']}")
+    if stats['done']:
+        print(f"共 {stats['images']} 张图片，{stats['workers']} 个工作进程，用时 {stats['elapsed']:.1f} 秒，"
+              f"吞吐 {stats['workbooks_per_sec']:.2f} 个工作簿/秒，{stats['images_per_sec']:.1f} 张图片/秒")
+
+
+def batch_main(argv=None):
+    """batch 子命令：add 登记工作簿、work 启动工作进程、status 查看进度"""
+    parser = argparse.ArgumentParser(prog="simple_excel_image_extractor.py batch",
+                                     description="通过共享任务表进行多机批量提取")
+    parser.add_argument("--table", default=DEFAULT_TABLE, help="共享任务表路径（SQLite）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="登记工作簿（文件或目录）")
+    add.add_argument("inputs", nargs="+")
+
+    work = sub.add_parser("work", help="在本机启动工作进程")
+    work.add_argument("-o", "--output-dir", default="extracted_images", help="输出根目录（应位于共享卷）")
+    work.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="本机工作进程数")
+    work.add_argument("--lease", type=float, default=60.0, help="租约时长（秒）")
+    work.add_argument("--max-attempts", type=int, default=3, help="每个工作簿最多尝试次数")
+    work.add_argument("--no-wait", action="store_true", help="没有可领取的任务时立即退出")
+    work.add_argument("-k", "--key-column", help="关键列（表头名称或列字母），图片以该列的值命名")
+    work.add_argument("--manifest", action="store_true", help="写出图片清单（JSONL）")
+
+    sub.add_parser("status", help="查看进度与吞吐量")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        with WorkTable(args.table) as table:
+            added = table.add(_collect_workbooks(args.inputs))
+            print(f"新增 {added} 个工作簿")
+        return 0
+
+    if args.command == "status":
+        if not os.path.exists(args.table):
+            print(f"错误: 找不到任务表 {args.table}")
+            return 1
+        with WorkTable(args.table) as table:
+            _print_stats(table.stats())
+        return 0
+
+    options = {
+        'lease_seconds': args.lease, 'wait': not args.no_wait, 'max_attempts': args.max_attempts,
+        'extractor_options': {'key_column': args.key_column, 'manifest': args.manifest},
+    }
+    tasks = [(args.table, args.output_dir, i, options) for i in range(max(1, args.workers))]
+    with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+        results = list(pool.map(_worker_process, tasks))
+    print(f"本机完成 {sum(r[0] for r in results)} 个，失败 {sum(r[1] for r in results)} 个")
+    with WorkTable(args.table) as table:
+        _print_stats(table.stats())
+    return 0
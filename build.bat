@@ -16,7 +16,7 @@ if errorlevel 1 (
 :: 安装必要的包
 echo 正在安装必要的包...
 python -m pip install --upgrade pip
-python -m pip install pyinstaller openpyxl pillow
+python -m pip install pyinstaller -r requirements.txt
 
 :: 运行打包脚本
 echo 开始打包...
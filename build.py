@@ -3,6 +3,7 @@
 """
 打包脚本 - 将Excel图片提取器打包成完全独立的可执行文件
 使用方法：python build.py
+         python build.py --with-extras（同时打包可选功能的依赖：Pillow、NumPy、cryptography、pyarrow）
 """
 
 import os
@@ -11,6 +12,9 @@ import platform
 import subprocess
 import shutil
 
+# 可选功能的依赖（见 requirements-extras.txt），默认不打包：单文件程序每次启动都要解压全部内容
+OPTIONAL_MODULES = ('PIL', 'numpy', 'cryptography', 'pyarrow')
+
 def clean_build_dirs():
     """清理构建目录"""
     print("清理旧的构建文件...")
@@ -20,8 +24,8 @@ def clean_build_dirs():
             shutil.rmtree(dir_name)
             print(f"已删除 {dir_name} 目录")
 
-def build_app():
-    """构建独立的可执行程序"""
+def build_app(with_extras=False):
+    """构建独立的可执行程序，with_extras 为 True 时同时打包可选功能的依赖"""
     try:
         system = platform.system()
         app_name = "Excel图片提取器"
@@ -43,13 +47,17 @@ def build_app():
             # 添加所有必要的依赖
             '--hidden-import=tkinter',
             '--hidden-import=tkinter.filedialog',
-            '--hidden-import=PIL._tkinter_finder',
             '--hidden-import=openpyxl',
             '--collect-submodules=openpyxl',
-            '--collect-submodules=PIL',
+            # 未使用的大型依赖不打包，减小单文件程序启动时的解压量
+            '--exclude-module=pandas',
             # 添加运行时钩子
             '--runtime-hook=runtime_hook.py',
         ]
+        if with_extras:
+            cmd.extend(['--hidden-import=PIL._tkinter_finder', '--collect-submodules=PIL'])
+        else:
+            cmd.extend(f'--exclude-module={name}' for name in OPTIONAL_MODULES)
         
         # 创建运行时钩子文件
         with open('runtime_hook.py', 'w', encoding='utf-8') as f:
@@ -150,4 +158,4 @@ if getattr(sys, 'frozen', False):
         sys.exit(1)
 
 if __name__ == '__main__':
-    build_app() 
\ No newline at end of file
+    build_app(with_extras='--with-extras' in sys.argv[1:])
\ No newline at end of file
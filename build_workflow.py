@@ -60,15 +60,13 @@ a = Analysis(
     hiddenimports=[
         'PIL._tkinter_finder',
         'openpyxl',
-        'pandas',
-        'pathlib',
         'tkinter',
         'xml.etree.ElementTree'
     ],
     hookspath=[],
     hooksconfig={{}},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['pandas'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -114,15 +112,13 @@ a = Analysis(
     hiddenimports=[
         'PIL._tkinter_finder',
         'openpyxl',
-        'pandas',
-        'pathlib',
         'tkinter',
         'xml.etree.ElementTree'
     ],
     hookspath=[],
     hooksconfig={{}},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['pandas'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
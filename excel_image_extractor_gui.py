@@ -7,68 +7,51 @@ Excel图片提取器 - 图形界面版本
 
 import os
 import sys
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
-import threading
-import queue
 import logging
 import traceback
 from datetime import datetime
 
-# 设置日志
-log_dir = Path.home() / "Documents" / "ExcelImageExtractor_Logs"
-log_dir.mkdir(parents=True, exist_ok=True)
-log_file = log_dir / f"excel_extractor_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+from gui_jobs import JobQueue, collect_workbooks, workbook_output_dir, QUEUED, DONE, FAILED, CANCELLED, FINISHED_STATES
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# 日志文件路径，在 setup_logging() 中确定；导入本模块不产生任何文件系统副作用
+log_file = None
 
-# 导入主要功能模块
-try:
-    from simple_excel_image_extractor import SimpleExcelImageExtractor
-    logging.info("成功导入SimpleExcelImageExtractor")
-except Exception as e:
-    logging.error(f"导入SimpleExcelImageExtractor失败: {e}")
-    logging.error(traceback.format_exc())
-    
-class RedirectText:
-    """用于重定向输出到Text控件"""
-    def __init__(self, text_widget):
-        self.text_widget = text_widget
-        self.queue = queue.Queue()
-        self.updating = True
-        threading.Thread(target=self._update_text_widget, daemon=True).start()
 
-    def write(self, string):
-        self.queue.put(string)
-        logging.debug(string.strip())  # 同时记录到日志
+def setup_logging():
+    """创建日志目录并配置日志（只在程序启动时调用一次）"""
+    global log_file
+    if log_file is not None:
+        return log_file
+    
+    log_dir = Path.home() / "Documents" / "ExcelImageExtractor_Logs"
+    handlers = [logging.StreamHandler()]
+    try:
+        log_dir.mkdir(parents=True, exist_ok=True)
+        log_file = log_dir / f"excel_extractor_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+        # 延迟打开文件，第一条日志写入时才创建
+        handlers.insert(0, logging.FileHandler(log_file, encoding='utf-8', delay=True))
+    except OSError as e:
+        print(f"无法创建日志目录 {log_dir}: {e}")
+    
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=handlers
+    )
+    return log_file
 
-    def flush(self):
-        pass
 
-    def _update_text_widget(self):
-        while self.updating:
-            try:
-                while True:
-                    string = self.queue.get_nowait()
-                    self.text_widget.insert(tk.END, string)
-                    self.text_widget.see(tk.END)
-                    self.text_widget.update()
-            except queue.Empty:
-                self.text_widget.update()
-            except Exception as e:
-                logging.error(f"更新文本控件时出错: {e}")
-            self.text_widget.after(100, None)
+# 工作簿结构缓存目录（勾选“缓存工作簿结构”时使用）：同一工作簿再次提取（换输出目录或关键列）时跳过解压和XML解析
+STRUCTURE_CACHE_DIR = Path.home() / "Documents" / "ExcelImageExtractor_Cache"
+# 界面刷新任务状态的间隔（毫秒）
+POLL_INTERVAL_MS = 100
+# 日志区域最多保留的行数
+MAX_LOG_LINES = 5000
 
-    def stop(self):
-        self.updating = False
 
 class ExcelImageExtractorGUI:
     def __init__(self, root):
@@ -76,7 +59,7 @@ class ExcelImageExtractorGUI:
             logging.info("开始初始化GUI")
             self.root = root
             self.root.title("Excel图片提取器")
-            self.root.geometry("800x600")
+            self.root.geometry("900x700")
             
             # 设置异常处理
             self.root.report_callback_exception = self.handle_exception
@@ -90,9 +73,16 @@ class ExcelImageExtractorGUI:
             self.main_frame = ttk.Frame(root, padding="10")
             self.main_frame.pack(fill=tk.BOTH, expand=True)
             
+            # 任务队列（每个工作簿一个子进程）
+            self.jobs = JobQueue(workers=min(4, os.cpu_count() or 1))
+            self.selected_files = []
+            
             # 文件选择区域
             self.create_file_selection_frame()
             
+            # 任务列表
+            self.create_job_table()
+            
             # 输出区域
             self.create_output_frame()
             
@@ -101,6 +91,9 @@ class ExcelImageExtractorGUI:
             
             # 状态变量
             self.processing = False
+            # 正在后台读取的预览：(线程, 结果)
+            self._preview_loading = None
+            self.root.protocol("WM_DELETE_WINDOW", self.on_close)
             
             logging.info("GUI初始化完成")
             
@@ -116,13 +109,14 @@ class ExcelImageExtractorGUI:
         messagebox.showerror("错误", error_msg)
 
     def create_file_selection_frame(self):
-        # Excel文件选择
+        # Excel文件选择（可多选，或选择文件夹）
         excel_frame = ttk.LabelFrame(self.main_frame, text="Excel文件", padding="5")
         excel_frame.pack(fill=tk.X, pady=5)
         
         self.excel_path = tk.StringVar()
         ttk.Entry(excel_frame, textvariable=self.excel_path, width=50).pack(side=tk.LEFT, padx=5)
         ttk.Button(excel_frame, text="选择文件", command=self.select_excel_file).pack(side=tk.LEFT, padx=5)
+        ttk.Button(excel_frame, text="选择文件夹", command=self.select_excel_folder).pack(side=tk.LEFT, padx=5)
         
         # 输出目录选择
         output_frame = ttk.LabelFrame(self.main_frame, text="输出目录", padding="5")
@@ -132,9 +126,58 @@ class ExcelImageExtractorGUI:
         ttk.Entry(output_frame, textvariable=self.output_path, width=50).pack(side=tk.LEFT, padx=5)
         ttk.Button(output_frame, text="选择目录", command=self.select_output_dir).pack(side=tk.LEFT, padx=5)
         
-        # 开始按钮
-        self.start_button = ttk.Button(self.main_frame, text="开始提取", command=self.start_extraction)
-        self.start_button.pack(pady=10)
+        # 关键列（可选）：图片以同一行该列的值命名；加密工作簿的密码；图片报表；并行任务数
+        options_frame = ttk.LabelFrame(self.main_frame, text="选项", padding="5")
+        options_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(options_frame, text="关键列（可选，表头名称或列字母，如 款号 / B）").pack(side=tk.LEFT)
+        self.key_column = tk.StringVar()
+        ttk.Entry(options_frame, textvariable=self.key_column, width=15).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(options_frame, text="密码（加密工作簿）").pack(side=tk.LEFT, padx=(20, 0))
+        self.password = tk.StringVar()
+        ttk.Entry(options_frame, textvariable=self.password, width=12, show="*").pack(side=tk.LEFT, padx=5)
+        
+        self.write_report = tk.BooleanVar()
+        ttk.Checkbutton(options_frame, text="生成报表", variable=self.write_report).pack(side=tk.LEFT, padx=(20, 0))
+        
+        # 同一工作簿反复提取时才需要缓存，默认关闭
+        self.use_structure_cache = tk.BooleanVar()
+        ttk.Checkbutton(options_frame, text="缓存工作簿结构",
+                        variable=self.use_structure_cache).pack(side=tk.LEFT, padx=(20, 0))
+        
+        ttk.Label(options_frame, text="并行任务数").pack(side=tk.LEFT, padx=(20, 0))
+        self.worker_count = tk.IntVar(value=self.jobs.workers)
+        ttk.Spinbox(options_frame, from_=1, to=max(1, os.cpu_count() or 1), width=5,
+                    textvariable=self.worker_count, command=self.update_worker_count).pack(side=tk.LEFT, padx=5)
+        
+        # 按钮
+        button_frame = ttk.Frame(self.main_frame)
+        button_frame.pack(fill=tk.X, pady=5)
+        self.start_button = ttk.Button(button_frame, text="开始提取", command=self.start_extraction)
+        self.start_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="取消选中任务", command=self.cancel_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="清除已结束任务", command=self.clear_finished).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="预览图片", command=self.open_preview).pack(side=tk.LEFT, padx=5)
+        
+    def create_job_table(self):
+        # 任务列表：状态、图片数、用时、吞吐量
+        table_frame = ttk.LabelFrame(self.main_frame, text="任务", padding="5")
+        table_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        columns = ("file", "status", "progress", "images", "elapsed", "throughput")
+        self.job_table = ttk.Treeview(table_frame, columns=columns, show="headings", height=8)
+        for column, title, width, anchor in (("file", "工作簿", 320, tk.W), ("status", "状态", 80, tk.CENTER),
+                                             ("progress", "进度", 70, tk.E),
+                                             ("images", "图片数", 80, tk.E), ("elapsed", "用时", 80, tk.E),
+                                             ("throughput", "张/秒", 80, tk.E)):
+            self.job_table.heading(column, text=title)
+            self.job_table.column(column, width=width, anchor=anchor)
+        self.job_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.job_table.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.job_table.configure(yscrollcommand=scrollbar.set)
         
     def create_output_frame(self):
         # 输出文本区域
@@ -142,7 +185,7 @@ class ExcelImageExtractorGUI:
         output_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         
         self.output_text = tk.Text(output_frame, height=10, wrap=tk.WORD)
-        self.output_text.pack(fill=tk.BOTH, expand=True)
+        self.output_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         # 添加滚动条
         scrollbar = ttk.Scrollbar(output_frame, orient=tk.VERTICAL, command=self.output_text.yview)
@@ -150,115 +193,220 @@ class ExcelImageExtractorGUI:
         self.output_text.configure(yscrollcommand=scrollbar.set)
         
     def create_progress_frame(self):
-        # 进度条
+        # 进度条：已结束的任务数 / 总任务数
         self.progress_var = tk.DoubleVar()
         self.progress = ttk.Progressbar(self.main_frame, 
                                       variable=self.progress_var,
                                       maximum=100,
-                                      mode='indeterminate')
+                                      mode='determinate')
         self.progress.pack(fill=tk.X, pady=5)
         
     def select_excel_file(self):
-        filename = filedialog.askopenfilename(
+        filenames = filedialog.askopenfilenames(
             title="选择Excel文件",
-            filetypes=[("Excel文件", "*.xlsx *.xls"), ("所有文件", "*.*")]
+            filetypes=[("工作簿", "*.xlsx *.xlsm *.xlsb *.ods"), ("所有文件", "*.*")]
         )
-        if filename:
-            self.excel_path.set(filename)
+        if filenames:
+            self.selected_files = list(filenames)
+            self.excel_path.set(filenames[0] if len(filenames) == 1 else f"已选择 {len(filenames)} 个文件")
+            
+    def select_excel_folder(self):
+        dirname = filedialog.askdirectory(title="选择包含Excel文件的文件夹")
+        if dirname:
+            self.selected_files = [dirname]
+            self.excel_path.set(dirname)
             
     def select_output_dir(self):
         dirname = filedialog.askdirectory(title="选择输出目录")
         if dirname:
             self.output_path.set(dirname)
             
-    def start_extraction(self):
-        if self.processing:
-            return
+    def update_worker_count(self):
+        try:
+            self.jobs.set_workers(self.worker_count.get())
+        except (tk.TclError, ValueError):
+            pass
+            
+    def _selected_inputs(self):
+        """输入框被手动修改时以输入框为准"""
+        text = self.excel_path.get().strip()
+        if self.selected_files and (len(self.selected_files) > 1 or text == self.selected_files[0]):
+            return self.selected_files
+        return [text] if text else []
             
+    def start_extraction(self):
         try:
-            excel_file = self.excel_path.get()
+            inputs = self._selected_inputs()
             output_dir = self.output_path.get()
             
-            logging.info(f"开始处理文件: {excel_file}")
+            logging.info(f"添加任务: {inputs}")
             logging.info(f"输出目录: {output_dir}")
             
-            if not excel_file:
-                messagebox.showerror("错误", "请选择Excel文件")
+            if not inputs:
+                messagebox.showerror("错误", "请选择Excel文件或文件夹")
                 return
                 
-            if not os.path.exists(excel_file):
-                messagebox.showerror("错误", "Excel文件不存在")
+            workbooks = collect_workbooks(inputs)
+            if not workbooks:
+                messagebox.showerror("错误", "Excel文件不存在，或文件夹中没有Excel文件")
                 return
-                
-            # 禁用按钮
-            self.start_button.configure(state='disabled')
-            self.processing = True
             
-            # 清空输出
-            self.output_text.delete(1.0, tk.END)
+            # 单个文件直接输出到输出目录，多个文件各自输出到 输出目录/工作簿名_扩展名
+            key_column = self.key_column.get().strip() or None
+            password = self.password.get() or None
+            report = "xlsx" if self.write_report.get() else None
+            structure_cache = str(STRUCTURE_CACHE_DIR) if self.use_structure_cache.get() else None
+            for workbook in workbooks:
+                job_output = output_dir if len(workbooks) == 1 else str(workbook_output_dir(output_dir, workbook))
+                job_id = self.jobs.add(workbook, job_output, key_column=key_column, password=password, report=report,
+                                       structure_cache=structure_cache)
+                self.job_table.insert("", tk.END, iid=str(job_id), values=(str(workbook), QUEUED, "", "", ""))
             
-            # 开始进度条
-            self.progress.start()
-            
-            # 重定向输出
-            self.redirect = RedirectText(self.output_text)
-            sys.stdout = self.redirect
-            
-            # 在新线程中运行提取过程
-            threading.Thread(target=self._run_extraction, args=(excel_file, output_dir), daemon=True).start()
+            self.update_worker_count()
+            if not self.processing:
+                self.processing = True
+                self._poll_jobs()
             
         except Exception as e:
             logging.error(f"启动提取过程失败: {e}")
             logging.error(traceback.format_exc())
-            self._reset_ui()
             messagebox.showerror("错误", f"启动失败: {str(e)}")
 
-    def _run_extraction(self, excel_file, output_dir):
+    def cancel_selected(self):
+        for iid in self.job_table.selection():
+            if self.jobs.cancel(int(iid)):
+                job = self.jobs.jobs[int(iid)]
+                self._append_log(f"[{job.name}] {'已取消' if job.status == CANCELLED else '正在取消...'}")
+        self._refresh_table()
+        
+    def clear_finished(self):
+        for job in list(self.jobs.jobs.values()):
+            if job.status in FINISHED_STATES and self.job_table.exists(str(job.id)):
+                self.job_table.delete(str(job.id))
+        self.jobs.remove_finished()
+        self._refresh_table()
+
+    def open_preview(self):
+        """导出前预览选中任务（未选中时为选择的Excel文件）中的图片，按 工作表/列 分组"""
+        if self._preview_loading is not None:
+            return
+        selection = self.job_table.selection()
+        job = self.jobs.jobs.get(int(selection[0])) if selection else None
+        inputs = [job.excel_file] if job else self._selected_inputs()
+        workbooks = collect_workbooks(inputs)
+        if len(workbooks) != 1:
+            messagebox.showerror("错误", "请选择一个Excel文件或一个任务进行预览")
+            return
         try:
-            logging.info("开始提取图片")
-            extractor = SimpleExcelImageExtractor(excel_file, output_dir)
-            extractor.extract_images()
-            
-            logging.info("提取完成")
-            self.root.after(0, self._show_completion_message, output_dir)
-            
-        except Exception as e:
-            logging.error(f"提取过程出错: {e}")
-            logging.error(traceback.format_exc())
-            self.root.after(0, self._show_error_message, str(e))
-            
-        finally:
-            self.root.after(0, self._reset_ui)
+            # 预览需要 Pillow，首次使用时才导入
+            import PIL  # noqa: F401
+            from image_preview import PreviewWindow, WorkbookPreview
+        except ImportError as e:
+            messagebox.showerror("错误", f"预览需要安装 Pillow：{e}")
+            return
+        password = (job.options.get('password') if job else None) or self.password.get() or None
+        result = {}
 
-    def _show_completion_message(self, output_dir):
-        logging.info(f"处理完成，输出目录: {output_dir}")
-        messagebox.showinfo("完成", f"图片提取完成！\n输出目录：{output_dir}")
-        
-    def _show_error_message(self, error_msg):
-        logging.error(f"显示错误消息: {error_msg}")
-        messagebox.showerror("错误", f"处理过程中出现错误：\n{error_msg}")
-        
-    def _reset_ui(self):
+        def load():
+            # 解密、读取结构可能需要较长时间，在后台线程中进行，界面保持响应
+            try:
+                result['preview'] = WorkbookPreview(str(workbooks[0]), password=password)
+            except Exception as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=load, daemon=True)
+        self._preview_loading = (thread, result, PreviewWindow)
+        self._append_log(f"正在读取 {workbooks[0].name} 用于预览...")
+        thread.start()
+        self.root.after(POLL_INTERVAL_MS, self._poll_preview)
+
+    def _poll_preview(self):
+        """后台读取完成后在界面线程中打开预览窗口"""
+        thread, result, window_class = self._preview_loading
+        if thread.is_alive():
+            self.root.after(POLL_INTERVAL_MS, self._poll_preview)
+            return
+        self._preview_loading = None
+        if 'error' in result:
+            logging.error(f"读取工作簿失败: {result['error']}")
+            messagebox.showerror("错误", f"无法预览：{result['error']}")
+            return
+        window_class(self.root, result['preview'])
+
+    def _poll_jobs(self):
+        """定期取回子进程的事件，刷新任务列表；提取在子进程中进行，界面始终保持响应"""
         try:
-            # 停止进度条
-            self.progress.stop()
-            
-            # 恢复按钮
-            self.start_button.configure(state='normal')
-            
-            # 恢复标准输出
-            sys.stdout = sys.__stdout__
-            if hasattr(self, 'redirect'):
-                self.redirect.stop()
-                
-            self.processing = False
-            logging.info("界面已重置")
-            
+            for event in self.jobs.poll():
+                job = self.jobs.jobs.get(event[0])
+                if job is None:
+                    continue
+                if event[1] == "log":
+                    # 子进程每隔一段时间合并发送多行日志，一次插入控件
+                    self._append_log("\n".join(f"[{job.name}] {line}" for line in event[2].split("\n")))
+                elif event[1] == "finished":
+                    if job.status == CANCELLED:
+                        self._append_log(f"[{job.name}] 已取消，已保存 {job.images} 张图片")
+                    elif job.error:
+                        self._append_log(f"[{job.name}] 失败: {job.error}")
+                    else:
+                        self._append_log(f"[{job.name}] 完成，共 {job.images} 张图片，用时 {job.elapsed:.1f} 秒")
+            self._refresh_table()
         except Exception as e:
-            logging.error(f"重置界面失败: {e}")
+            logging.error(f"刷新任务状态失败: {e}")
             logging.error(traceback.format_exc())
+        
+        if self.jobs.active:
+            self.root.after(POLL_INTERVAL_MS, self._poll_jobs)
+        else:
+            self.processing = False
+            self._show_completion_message()
+
+    def _refresh_table(self):
+        jobs = list(self.jobs.jobs.values())
+        for job in jobs:
+            iid = str(job.id)
+            if not self.job_table.exists(iid):
+                continue
+            elapsed = f"{job.elapsed:.1f}s" if job.started_at is not None else ""
+            throughput = f"{job.throughput:.1f}" if job.status == DONE else ""
+            if job.status in (DONE, CANCELLED):
+                images = job.images
+            elif job.progress:
+                images = f"{job.progress['done']}/{job.progress['total']}"
+            else:
+                images = ""
+            progress = f"{job.fraction * 100:.0f}%" if job.started_at is not None else ""
+            self.job_table.item(iid, values=(job.excel_file, job.status, progress, images, elapsed, throughput))
+        # 总进度：每个任务按已处理的图片位置比例计入
+        self.progress_var.set(sum(job.fraction for job in jobs) * 100 / len(jobs) if jobs else 0)
+
+    def _append_log(self, line):
+        logging.debug(line)
+        self.output_text.insert(tk.END, line + "\n")
+        # 限制日志行数，避免长时间运行后控件越来越慢
+        lines = int(self.output_text.index("end-1c").split(".")[0])
+        if lines > MAX_LOG_LINES:
+            self.output_text.delete("1.0", f"{lines - MAX_LOG_LINES}.0")
+        self.output_text.see(tk.END)
+
+    def _show_completion_message(self):
+        jobs = list(self.jobs.jobs.values())
+        done = sum(1 for job in jobs if job.status == DONE)
+        failed = sum(1 for job in jobs if job.status == FAILED)
+        logging.info(f"全部任务结束: {done} 个完成，{failed} 个失败")
+        if failed:
+            messagebox.showerror("完成", f"全部任务已结束：{done} 个完成，{failed} 个失败\n详情见处理日志")
+        elif done:
+            messagebox.showinfo("完成", f"图片提取完成！共 {done} 个工作簿\n输出目录：{self.output_path.get()}")
+
+    def on_close(self):
+        if self.jobs.active and not messagebox.askokcancel("退出", "还有未完成的任务，确定要取消并退出吗？"):
+            return
+        self.jobs.cancel_all()
+        self.root.destroy()
 
 def main():
+    setup_logging()
     try:
         logging.info("程序启动")
         root = tk.Tk()
@@ -272,4 +420,7 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    import multiprocessing
+    # 打包后的程序启动子进程时需要
+    multiprocessing.freeze_support()
+    main()
\ No newline at end of file
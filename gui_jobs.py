@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图形界面的多工作簿任务队列
+每个工作簿在独立的子进程中提取，同时运行的任务数有上限；
+界面线程定期调用 poll() 取回事件，不会被提取过程阻塞。本模块不依赖 tkinter。
+取消任务时先设置取消令牌，让提取器在两张图片之间停下并清理临时目录；超时未退出才强制终止
+"""
+
+import multiprocessing
+import os
+import queue
+import shutil
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from workbook_backends import WORKBOOK_SUFFIXES
+
+# 任务状态
+QUEUED = "排队中"
+RUNNING = "运行中"
+CANCELLING = "取消中"
+DONE = "完成"
+FAILED = "失败"
+CANCELLED = "已取消"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+ACTIVE_STATES = (QUEUED, RUNNING, CANCELLING)
+# 请求取消后等待子进程自行退出的秒数
+CANCEL_TIMEOUT = 10.0
+# 子进程报告进度的最短间隔（秒）
+PROGRESS_INTERVAL = 0.2
+# 子进程合并发送日志的间隔（秒），大工作簿每张图片一行日志，逐行发送会占满界面线程
+LOG_INTERVAL = 0.2
+
+
+class _QueueWriter:
+    """把子进程的输出按行收集，每隔 LOG_INTERVAL 秒合并成一条事件发送给界面"""
+
+    def __init__(self, job_id, events, interval=LOG_INTERVAL):
+        self.job_id = job_id
+        self.events = events
+        self.interval = interval
+        self._buffer = ""
+        self._lines = []
+        self._last_sent = time.monotonic()
+
+    def write(self, text):
+        self._buffer += text
+        if "\n" in self._buffer:
+            *lines, self._buffer = self._buffer.split("\n")
+            self._lines.extend(line for line in lines if line.strip())
+            if time.monotonic() - self._last_sent >= self.interval:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        """发送已收集的完整行"""
+        self._last_sent = time.monotonic()
+        if self._lines:
+            self.events.put((self.job_id, "log", "\n".join(self._lines)))
+            self._lines = []
+
+
+def _run_job(job_id, excel_file, output_dir, options, events, cancel_event):
+    """子进程入口：提取一个工作簿，通过 events 报告临时目录、日志、进度和结果"""
+    writer = _QueueWriter(job_id, events)
+
+    def report_progress(progress):
+        # 报告进度时顺便发出积攒的日志，长时间没有输出时日志也不会滞后
+        writer.flush()
+        events.put((job_id, "progress", progress))
+
+    try:
+        with redirect_stdout(writer):
+            from simple_excel_image_extractor import SimpleExcelImageExtractor
+            extractor = SimpleExcelImageExtractor(
+                excel_file, output_dir, progress_callback=report_progress,
+                progress_interval=PROGRESS_INTERVAL, cancel_token=cancel_event, **options)
+            events.put((job_id, "temp_dir", str(extractor.temp_dir)))
+            extractor.extract_images()
+        writer.flush()
+        error = str(extractor.error) if extractor.error else None
+        events.put((job_id, "finished", extractor.saved_count, error, extractor.cancelled))
+    except Exception as e:
+        writer.flush()
+        events.put((job_id, "finished", 0, str(e), False))
+
+
+class Job:
+    """一个工作簿的提取任务"""
+
+    def __init__(self, job_id, excel_file, output_dir, options):
+        self.id = job_id
+        self.excel_file = excel_file
+        self.output_dir = output_dir
+        self.options = options
+        self.status = QUEUED
+        self.images = 0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        # 每个任务使用独立的队列：终止子进程可能损坏它正在写入的队列，不能影响其他任务
+        self.events = None
+        self.cancel_event = None
+        self.cancel_requested_at = None
+        self.temp_dir = None
+        # 子进程最近一次报告的进度
+        self.progress = None
+
+    @property
+    def name(self):
+        return Path(self.excel_file).name
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self):
+        """图片/秒"""
+        elapsed = self.elapsed
+        return self.images / elapsed if elapsed > 0 and self.status == DONE else 0.0
+
+    @property
+    def fraction(self):
+        """完成比例（0~1），按已处理的图片位置计算"""
+        if self.status in FINISHED_STATES:
+            return 1.0
+        progress = self.progress
+        if not progress or not progress['total']:
+            return 0.0
+        return min(1.0, progress['done'] / progress['total'])
+
+
+class JobQueue:
+    """有上限的多进程任务队列"""
+
+    def __init__(self, workers=2):
+        self.workers = max(1, workers)
+        self.jobs = {}
+        self._next_id = 1
+        self._context = multiprocessing.get_context()
+
+    def add(self, excel_file, output_dir, **options):
+        """添加任务，返回任务ID"""
+        job = Job(self._next_id, str(excel_file), str(output_dir), options)
+        self.jobs[job.id] = job
+        self._next_id += 1
+        return job.id
+
+    def set_workers(self, workers):
+        self.workers = max(1, int(workers))
+
+    def cancel(self, job_id):
+        """
+        取消任务：排队中的任务直接取消；运行中的任务设置取消令牌，
+        由子进程在两张图片之间停下（状态为“取消中”，poll() 收到结果后变为“已取消”）
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in (QUEUED, RUNNING):
+            return False
+        if job.status == RUNNING:
+            job.cancel_event.set()
+            job.cancel_requested_at = time.monotonic()
+            job.status = CANCELLING
+            return True
+        job.status = CANCELLED
+        job.finished_at = time.monotonic()
+        return True
+
+    def cancel_all(self, timeout=CANCEL_TIMEOUT):
+        """取消全部任务并等待子进程退出（关闭窗口时调用）"""
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        deadline = time.monotonic() + timeout
+        while any(job.status == CANCELLING for job in self.jobs.values()):
+            if time.monotonic() >= deadline:
+                for job in self.jobs.values():
+                    if job.status == CANCELLING:
+                        self._terminate(job)
+                break
+            self.poll()
+            time.sleep(0.05)
+
+    def remove_finished(self):
+        for job_id in [j.id for j in self.jobs.values() if j.status in FINISHED_STATES]:
+            del self.jobs[job_id]
+
+    @property
+    def active(self):
+        """是否还有排队或运行中的任务"""
+        return any(job.status in ACTIVE_STATES for job in self.jobs.values())
+
+    def poll(self):
+        """
+        处理子进程发来的事件并启动排队的任务（由界面线程定期调用）
+
+        不会阻塞界面线程：结束的子进程在之后的调用中检查到已退出时才回收
+
+        Returns:
+            list: (任务ID, 事件类型, 数据...) 列表，包含日志（多行合并为一条）和状态变化
+        """
+        events = []
+        for job in self.jobs.values():
+            while job.status in (RUNNING, CANCELLING):
+                try:
+                    event = job.events.get_nowait()
+                except queue.Empty:
+                    break
+                if event[1] == "temp_dir":
+                    job.temp_dir = event[2]
+                    continue
+                if event[1] == "progress":
+                    job.progress = event[2]
+                elif event[1] == "finished":
+                    job.images, job.error = event[2], event[3]
+                    if event[4]:
+                        job.status, job.error = CANCELLED, None
+                    else:
+                        job.status = FAILED if job.error else DONE
+                    job.finished_at = time.monotonic()
+                    job.events = None
+                events.append(event)
+
+        now = time.monotonic()
+        for job in self.jobs.values():
+            if job.status == CANCELLING and now - job.cancel_requested_at > CANCEL_TIMEOUT:
+                # 子进程没有响应取消令牌（例如正在解压一个很大的文件）
+                self._terminate(job)
+                events.append((job.id, "finished", job.images, None, True))
+            elif job.status in (RUNNING, CANCELLING) and job.process is not None \
+                    and not job.process.is_alive() and job.process.exitcode not in (0, None):
+                # 意外退出（没有发来结果）的子进程
+                job.status = FAILED
+                job.error = f"子进程异常退出（{job.process.exitcode}）"
+                job.finished_at = now
+                self._remove_temp(job)
+                events.append((job.id, "finished", 0, job.error, False))
+
+        self._reap()
+        self._start_queued()
+        return events
+
+    def _start_queued(self):
+        running = sum(1 for job in self.jobs.values() if job.status == RUNNING)
+        for job in self.jobs.values():
+            if running >= self.workers:
+                break
+            if job.status != QUEUED:
+                continue
+            job.events = self._context.Queue()
+            job.cancel_event = self._context.Event()
+            job.process = self._context.Process(
+                target=_run_job,
+                args=(job.id, job.excel_file, job.output_dir, job.options, job.events, job.cancel_event))
+            job.process.start()
+            job.status = RUNNING
+            job.started_at = time.monotonic()
+            running += 1
+
+    def _reap(self):
+        """回收已经退出的子进程（is_alive() 不等待）"""
+        for job in self.jobs.values():
+            if job.status in FINISHED_STATES and job.process is not None and not job.process.is_alive():
+                job.process.close()
+                job.process = None
+
+    def _terminate(self, job):
+        """强制终止子进程并清理它的临时目录（进程由 _reap 回收）"""
+        job.process.terminate()
+        self._remove_temp(job)
+        job.events = None
+        job.status = CANCELLED
+        job.finished_at = time.monotonic()
+
+    def _remove_temp(self, job):
+        if job.temp_dir and os.path.isdir(job.temp_dir):
+            shutil.rmtree(job.temp_dir, ignore_errors=True)
+
+
+def workbook_output_dir(output_root, excel_file):
+    """工作簿在输出目录下的子目录 <工作簿名>_<扩展名>，同名不同格式的工作簿（如 a.xlsx 和 a.xlsm）互不覆盖"""
+    path = Path(excel_file)
+    return Path(output_root) / f"{path.stem}_{path.suffix[1:].lower()}"
+
+
+def collect_workbooks(paths):
+    """展开文件和文件夹，返回其中的工作簿路径（忽略 Excel 的锁文件）"""
+    workbooks = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            workbooks.extend(sorted(p for p in path.iterdir()
+                                    if p.suffix.lower() in WORKBOOK_SUFFIXES and not p.name.startswith("~$")))
+        elif path.is_file():
+            workbooks.append(path)
+    return workbooks
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨工作簿图片目录（catalog）
+持久化到本地 SQLite，按工作簿增量更新，记录图片内容哈希、位置与关键列值，
+支持按哈希、关键值、工作表、列名查询
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+DEFAULT_CATALOG = "image_catalog.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workbooks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER,
+    mtime_ns INTEGER,
+    output_dir TEXT,
+    placements INTEGER DEFAULT 0,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS images (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER,
+    width INTEGER,
+    height INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS placements (
+    workbook_id INTEGER NOT NULL REFERENCES workbooks(id),
+    sheet TEXT,
+    header TEXT,
+    row INTEGER,
+    col INTEGER,
+    anchor TEXT,
+    media TEXT,
+    output TEXT,
+    key TEXT,
+    sha256 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_placements_workbook ON placements (workbook_id);
+CREATE INDEX IF NOT EXISTS idx_placements_sha256 ON placements (sha256);
+CREATE INDEX IF NOT EXISTS idx_placements_key ON placements (key);
+CREATE INDEX IF NOT EXISTS idx_placements_sheet_header ON placements (sheet, header);
+CREATE INDEX IF NOT EXISTS idx_placements_header ON placements (header);
+"""
+
+_QUERY_COLUMNS = ('workbook', 'sheet', 'header', 'row', 'col', 'key', 'sha256', 'output_dir', 'output')
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """分块计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def workbook_identity(path):
+    """工作簿标识：绝对路径（远程工作簿为地址）、大小、修改时间"""
+    from remote_workbook import is_remote, remote_identity
+    if is_remote(path):
+        return remote_identity(path)[:3]
+    resolved = Path(path).resolve()
+    stat = resolved.stat()
+    return str(resolved), stat.st_size, stat.st_mtime_ns
+
+
+class ImageCatalog:
+    """SQLite 图片目录，每个工作簿的记录在一个事务中整体替换"""
+
+    def __init__(self, db_path=DEFAULT_CATALOG, batch_size=10000):
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self._workbook = None
+        self._images = {}
+        self._placements = []
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # 多个进程共享同一目录时，等待其他进程的写事务而不是立即报错
+        self.conn = sqlite3.connect(str(self.db_path), isolation_level=None, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.abort_workbook()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def begin_workbook(self, workbook_path, output_dir=None):
+        """开始（重新）登记一个工作簿，记录先缓存在内存中，提交时在一个短事务里整体替换"""
+        self._workbook = workbook_identity(workbook_path) + (
+            str(Path(output_dir).resolve()) if output_dir else None,)
+        self._images = {}
+        self._placements = []
+
+    def add(self, record):
+        """追加一条位置记录（字段与图片清单相同）"""
+        self._images.setdefault(record['sha256'], (record.get('size'), record.get('width'), record.get('height')))
+        self._placements.append((record.get('sheet'), record.get('header'), record.get('row'), record.get('col'),
+                                 record.get('anchor'), record.get('media'), record.get('output'),
+                                 record.get('key'), record['sha256']))
+
+    def commit_workbook(self):
+        """写入并提交当前工作簿，返回记录数"""
+        path, size, mtime_ns, output_dir = self._workbook
+        # 写锁只在这里持有，多个进程同时提取时互不阻塞
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT INTO workbooks (path, size, mtime_ns, output_dir) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                "output_dir = excluded.output_dir",
+                (path, size, mtime_ns, output_dir))
+            workbook_id = self.conn.execute("SELECT id FROM workbooks WHERE path = ?", (path,)).fetchone()[0]
+            self.conn.execute("DELETE FROM placements WHERE workbook_id = ?", (workbook_id,))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO images (sha256, size, width, height) VALUES (?, ?, ?, ?)",
+                [(sha256,) + info for sha256, info in self._images.items()])
+            for start in range(0, len(self._placements), self.batch_size):
+                self.conn.executemany(
+                    "INSERT INTO placements (workbook_id, sheet, header, row, col, anchor, media, output, key, sha256) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(workbook_id,) + p for p in self._placements[start:start + self.batch_size]])
+            self.conn.execute("UPDATE workbooks SET placements = ?, indexed_at = ? WHERE id = ?",
+                              (len(self._placements), time.time(), workbook_id))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        count = len(self._placements)
+        self.abort_workbook()
+        return count
+
+    def abort_workbook(self):
+        """放弃当前工作簿的更新，保留之前的记录"""
+        self._workbook = None
+        self._images = {}
+        self._placements = []
+
+    def query(self, sha256=None, key=None, sheet=None, header=None, workbook=None, limit=None):
+        """按条件组合查询位置记录，条件均为精确匹配（工作簿按路径子串匹配）"""
+        conditions = []
+        params = []
+        for column, value in (('p.sha256', sha256), ('p.key', key), ('p.sheet', sheet), ('p.header', header)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if workbook is not None:
+            conditions.append("w.path LIKE ?")
+            params.append(f"%{workbook}%")
+
+        sql = ("SELECT w.path, p.sheet, p.header, p.row, p.col, p.key, p.sha256, w.output_dir, p.output "
+               "FROM placements p JOIN workbooks w ON w.id = p.workbook_id")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY w.path, p.sheet, p.row, p.col"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(zip(_QUERY_COLUMNS, row)) for row in self.conn.execute(sql, params)]
+
+    def stats(self):
+        """目录统计：工作簿数、位置数、不同图片数"""
+        workbooks, = self.conn.execute("SELECT COUNT(*) FROM workbooks WHERE indexed_at IS NOT NULL").fetchone()
+        placements, = self.conn.execute("SELECT COUNT(*) FROM placements").fetchone()
+        images, = self.conn.execute("SELECT COUNT(*) FROM images").fetchone()
+        return {'workbooks': workbooks, 'placements': placements, 'images': images}
+
+
+def query_main(argv=None):
+    """query 子命令：查询图片目录"""
+    parser = argparse.ArgumentParser(prog="simple_excel_image_extractor.py query",
+                                     description="查询跨工作簿图片目录")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG, help="目录数据库路径")
+    parser.add_argument("--image", help="按图片文件内容查询（计算其 SHA-256）")
+    parser.add_argument("--sha256", help="按内容哈希查询")
+    parser.add_argument("--key", help="按关键列值查询")
+    parser.add_argument("--sheet", help="按工作表名查询")
+    parser.add_argument("--header", help="按列名查询")
+    parser.add_argument("--workbook", help="按工作簿路径（子串）过滤")
+    parser.add_argument("--limit", type=int, help="最多返回的记录数")
+    parser.add_argument("--stats", action="store_true", help="只显示目录统计")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.catalog):
+        print(f"错误: 找不到目录 {args.catalog}")
+        return 1
+
+    with ImageCatalog(args.catalog) as catalog:
+        if args.stats:
+            stats = catalog.stats()
+            print(f"工作簿: {stats['workbooks']}  位置: {stats['placements']}  图片: {stats['images']}")
+            return 0
+
+        sha256 = file_sha256(args.image) if args.image else args.sha256
+        start = time.perf_counter()
+        results = catalog.query(sha256=sha256, key=args.key, sheet=args.sheet, header=args.header,
+                                workbook=args.workbook, limit=args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+
+    for r in results:
+        output = os.path.join(r['output_dir'], r['output']) if r['output_dir'] and r['output'] else r['output']
+        row = f"第{r['row']}行" if r['row'] else ''
+        print(f"{r['workbook']}\t{r['sheet']}\t{r['header']}\t{row}\t{r['key'] or ''}\t{output}")
+    print(f"共 {len(results)} 条，用时 {elapsed:.1f} ms")
+    return 0
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片数据集导出
+把每个图片位置连同图片字节写成 Parquet 分片（需要 pyarrow），供机器学习流程直接读取：
+按行组攒批写出，分片按大小切分；图片本身已经压缩，默认不再压缩，读取时可以零拷贝切片。
+多个工作簿可以写入同一个目录，每个工作簿的分片以 <工作簿名>-<路径哈希>- 开头，
+重新提取同一工作簿时替换它之前的分片
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+# 数据集字段，顺序即列顺序
+DATASET_FIELDS = ('workbook', 'sheet', 'header', 'row', 'col', 'key', 'content_type', 'sha256', 'bytes')
+DATASET_COMPRESSIONS = ('none', 'snappy', 'zstd', 'gzip', 'lz4')
+# 一个行组在内存中最多攒的图片字节数（同时远小于 binary 列 2GB 的上限）
+MAX_GROUP_BYTES = 256 * 1024 * 1024
+
+_CONTENT_TYPES = {
+    '.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.gif': 'image/gif',
+    '.bmp': 'image/bmp', '.webp': 'image/webp', '.tif': 'image/tiff', '.tiff': 'image/tiff',
+    '.emf': 'image/emf', '.wmf': 'image/wmf', '.svg': 'image/svg+xml',
+}
+
+
+def content_type(data, name):
+    """图片的 MIME 类型：优先按文件头判断，其次按扩展名"""
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[:2] == b'BM':
+        return 'image/bmp'
+    return _CONTENT_TYPES.get(Path(name).suffix.lower(), 'application/octet-stream')
+
+
+def shard_prefix(workbook):
+    """工作簿的分片文件名前缀，不同目录下的同名工作簿互不覆盖"""
+    path = str(workbook)
+    stem = Path(path.split('?', 1)[0]).stem or "workbook"
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8') if '://' not in path
+                          else path.encode('utf-8')).hexdigest()[:8]
+    return f"{stem}-{digest}"
+
+
+class DatasetWriter:
+    """按行组写出图片数据集分片"""
+
+    def __init__(self, directory, workbook, rows_per_group=256, shard_size=512 * 1024 * 1024,
+                 compression='none'):
+        """
+        Args:
+            directory (str): 数据集目录
+            workbook (str): 工作簿路径（决定分片文件名）
+            rows_per_group (int): 每个行组的行数
+            shard_size (int): 单个分片的目标字节数，写满后开始下一个分片
+            compression (str): Parquet 压缩方式，默认不压缩
+        """
+        if compression not in DATASET_COMPRESSIONS:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        import pyarrow as pa
+
+        self.directory = Path(directory)
+        self.prefix = shard_prefix(workbook)
+        self.rows_per_group = max(1, rows_per_group)
+        self.shard_size = shard_size
+        self.compression = compression
+        self.count = 0
+        self.shards = []
+        self.schema = pa.schema([
+            ('workbook', pa.string()), ('sheet', pa.string()), ('header', pa.string()),
+            ('row', pa.int32()), ('col', pa.int32()), ('key', pa.string()),
+            ('content_type', pa.string()), ('sha256', pa.string()), ('bytes', pa.binary()),
+        ])
+        self._batch = []
+        self._batch_bytes = 0
+        self._writer = None
+        self._shard_path = None
+        self._shard_bytes = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # 重新提取时替换该工作簿之前的分片（包括中断留下的临时文件）
+        for old in self.directory.glob(f"{self.prefix}-*.parquet*"):
+            old.unlink()
+
+    def add(self, record, data):
+        """追加一条记录（字段见 DATASET_FIELDS，data 为图片字节），攒满一个行组后写出"""
+        self._batch.append(dict(record, bytes=data))
+        self._batch_bytes += len(data)
+        if len(self._batch) >= self.rows_per_group or self._batch_bytes >= MAX_GROUP_BYTES:
+            self.flush()
+
+    def flush(self):
+        """把当前批次写成一个行组"""
+        if not self._batch:
+            return
+        import pyarrow as pa
+
+        batch, self._batch = self._batch, []
+        batch_bytes, self._batch_bytes = self._batch_bytes, 0
+        if self._writer is None:
+            self._open_shard()
+        table = pa.Table.from_pydict({f: [r.get(f) for r in batch] for f in DATASET_FIELDS}, schema=self.schema)
+        self._writer.write_table(table, row_group_size=len(batch))
+        self.count += len(batch)
+        self._shard_bytes += batch_bytes
+        if self._shard_bytes >= self.shard_size:
+            self._close_shard()
+
+    def close(self):
+        """写出剩余记录并完成当前分片"""
+        try:
+            self.flush()
+        finally:
+            self._close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open_shard(self):
+        import pyarrow.parquet as pq
+
+        self._shard_path = self.directory / f"{self.prefix}-{len(self.shards):05d}.parquet"
+        # 先写临时文件，完成后再改名，读取数据集的程序不会看到写了一半的分片
+        self._writer = pq.ParquetWriter(
+            str(self._shard_path) + ".tmp", self.schema,
+            compression=self.compression,
+            # 图片字节既不适合字典编码，也不需要最小/最大值统计
+            use_dictionary=['workbook', 'sheet', 'header', 'content_type'],
+            write_statistics=['workbook', 'sheet', 'header', 'row', 'col', 'key', 'sha256'])
+        self._shard_bytes = 0
+
+    def _close_shard(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        os.replace(str(self._shard_path) + ".tmp", self._shard_path)
+        self.shards.append(self._shard_path)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片清单（manifest）
+提取过程中逐条记录每张输出图片的来源与属性，按批写入 JSONL，并可选写入 Parquet / SQLite
+"""
+
+import json
+import struct
+from pathlib import Path
+
+# 清单字段，顺序即 Parquet / SQLite 的列顺序
+MANIFEST_FIELDS = (
+    'workbook', 'sheet', 'header', 'row', 'col', 'anchor', 'media',
+    'output', 'key', 'size', 'sha256', 'width', 'height'
+)
+MANIFEST_FORMATS = ('parquet', 'sqlite')
+
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_image_size(data):
+    """
+    只解析文件头获取图片尺寸，不解码像素
+
+    支持 PNG/JPEG/GIF/BMP/WebP，无法识别时返回 (None, None)
+    """
+    try:
+        if data[:8] == b'\x89PNG\r\n\x1a\n' and data[12:16] == b'IHDR':
+            return struct.unpack('>II', data[16:24])
+        if data[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', data[6:10])
+        if data[:2] == b'BM':
+            header_size = struct.unpack('<I', data[14:18])[0]
+            if header_size == 12:
+                return struct.unpack('<HH', data[18:22])
+            width, height = struct.unpack('<ii', data[18:26])
+            return width, abs(height)
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            return _read_webp_size(data)
+        if data[:2] == b'\xff\xd8':
+            return _read_jpeg_size(data)
+    except struct.error:
+        pass
+    return None, None
+
+
+def _read_webp_size(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3fff, height & 0x3fff
+    if chunk == b'VP8L':
+        bits = struct.unpack('<I', data[21:25])[0]
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    if chunk == b'VP8X':
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        return width, height
+    return None, None
+
+
+def _read_jpeg_size(data):
+    pos = 2
+    length = len(data)
+    while pos + 4 <= length:
+        if data[pos] != 0xFF:
+            pos += 1
+            continue
+        marker = data[pos + 1]
+        # 填充字节与无长度的标记
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        segment_length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + segment_length
+    return None, None
+
+
+class ManifestWriter:
+    """按批写入图片清单，JSONL 总是写出，Parquet / SQLite 可选"""
+
+    def __init__(self, jsonl_path, formats=(), batch_size=1000):
+        """
+        Args:
+            jsonl_path (str): JSONL 清单路径，其他格式使用相同文件名、不同扩展名
+            formats (iterable): 额外格式，可选 "parquet"、"sqlite"
+            batch_size (int): 每批写入的记录数
+        """
+        self.jsonl_path = Path(jsonl_path)
+        self.formats = tuple(formats)
+        self.batch_size = batch_size
+        self.count = 0
+        self._batch = []
+        self._parquet_writer = None
+        self._sqlite = None
+
+        unknown = set(self.formats) - set(MANIFEST_FORMATS)
+        if unknown:
+            raise ValueError(f"不支持的清单格式: {', '.join(sorted(unknown))}")
+
+        self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+        # 先打开 Parquet 写入器：缺少 pyarrow 时在提取开始前就报错，而不是写到一半才失败
+        if 'parquet' in self.formats:
+            self._open_parquet(self.jsonl_path.with_suffix('.parquet'))
+        self._jsonl = open(self.jsonl_path, 'w', encoding='utf-8')
+        if 'sqlite' in self.formats:
+            self._open_sqlite(self.jsonl_path.with_suffix('.sqlite'))
+
+    def add(self, record):
+        """追加一条记录，攒满一批后写出"""
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """写出当前批次"""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+
+        self._jsonl.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in batch))
+        self._jsonl.flush()
+        if self._parquet_writer is not None:
+            self._write_parquet(batch)
+        if self._sqlite is not None:
+            placeholders = ', '.join('?' for _ in MANIFEST_FIELDS)
+            with self._sqlite:
+                self._sqlite.executemany(
+                    f"INSERT INTO images ({', '.join(MANIFEST_FIELDS)}) VALUES ({placeholders})",
+                    [tuple(r.get(f) for f in MANIFEST_FIELDS) for r in batch])
+        self.count += len(batch)
+
+    def close(self):
+        """写出剩余记录并关闭所有文件"""
+        try:
+            self.flush()
+        finally:
+            self._jsonl.close()
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+            if self._sqlite is not None:
+                self._sqlite.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open_sqlite(self, path):
+        import sqlite3
+
+        if path.exists():
+            path.unlink()
+        self._sqlite = sqlite3.connect(str(path))
+        self._sqlite.executescript("""
+            CREATE TABLE images (
+                workbook TEXT, sheet TEXT, header TEXT, row INTEGER, col INTEGER,
+                anchor TEXT, media TEXT, output TEXT, key TEXT, size INTEGER,
+                sha256 TEXT, width INTEGER, height INTEGER
+            );
+            CREATE INDEX idx_images_sha256 ON images (sha256);
+            CREATE INDEX idx_images_key ON images (key);
+            CREATE INDEX idx_images_sheet_header ON images (sheet, header);
+        """)
+
+    def _open_parquet(self, path):
+        # pyarrow 只在需要 Parquet 时导入
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ('workbook', pa.string()), ('sheet', pa.string()), ('header', pa.string()),
+            ('row', pa.int64()), ('col', pa.int64()), ('anchor', pa.string()),
+            ('media', pa.string()), ('output', pa.string()), ('key', pa.string()),
+            ('size', pa.int64()), ('sha256', pa.string()),
+            ('width', pa.int64()), ('height', pa.int64()),
+        ])
+        self._parquet_writer = pq.ParquetWriter(str(path), schema)
+
+    def _write_parquet(self, batch):
+        import pyarrow as pa
+
+        columns = {f: [r.get(f) for r in batch] for f in MANIFEST_FIELDS}
+        table = pa.Table.from_pydict(columns, schema=self._parquet_writer.schema)
+        self._parquet_writer.write_table(table)
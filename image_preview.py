@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导出前的图片预览网格
+只建立工作簿的图片索引（不导出图片），按 工作表/列 分组显示。只为可见的格子解码缩略图：
+后台线程从压缩包中读取媒体字节并缩小，结果放入按字节数限制大小的 LRU 缓存，
+界面线程只为可见格子创建 PhotoImage。内存占用由缓存大小决定，与图片总数无关
+"""
+
+import os
+import queue
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from pathlib import Path
+from tkinter import ttk
+
+ALL_GROUPS = "全部"
+# 无法解码的图片在缓存中的标记
+DECODE_FAILED = object()
+
+
+class WorkbookPreview:
+    """工作簿中的图片：(分组, 媒体路径) 列表，以及按媒体路径读取压缩包中的图片字节"""
+
+    def __init__(self, excel_file_path, password=None):
+        """
+        Args:
+            excel_file_path (str): 工作簿路径或地址
+            password (str): 加密工作簿的打开密码（在内存中解密）
+        """
+        from simple_excel_image_extractor import SimpleExcelImageExtractor
+
+        self.excel_file_path = excel_file_path
+        self._extractor = SimpleExcelImageExtractor(excel_file_path, os.curdir, password=password)
+        try:
+            self.items = self._extractor.preview_items()
+        except Exception:
+            self._extractor.close_preview()
+            raise
+
+    def read(self, name):
+        return self._extractor.read_preview_media(name)
+
+    def close(self):
+        self._extractor.close_preview()
+
+
+class ThumbnailCache:
+    """按字节数限制大小的 LRU 缓存（线程安全）"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def get(self, key):
+        """返回缓存的值并标记为最近使用，不存在时返回None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._items[key] = (value, nbytes)
+            self.size += nbytes
+            # 淘汰最久未使用的项，至少保留刚放入的一项
+            while self.size > self.max_bytes and len(self._items) > 1:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= evicted
+
+
+def _image_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class ThumbnailLoader:
+    """后台解码线程：只处理最近一次请求（当前可见格子）中尚未缓存的图片"""
+
+    def __init__(self, cache, size=128, read=_read_file):
+        """
+        Args:
+            cache (ThumbnailCache): 缩略图缓存，以请求的键为键
+            size (int): 缩略图最长边像素
+            read (callable): 键 -> 图片字节，只在后台线程中调用
+        """
+        self.cache = cache
+        self.size = size
+        self.read = read
+        # 解码完成（或失败）的路径，由界面线程取走
+        self.results = queue.Queue()
+        self._pending = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="thumbnail-loader", daemon=True)
+        self._thread.start()
+
+    def request(self, paths):
+        """用 paths（图片的键）替换待解码列表（按顺序处理），滚动后不再可见的旧请求被丢弃"""
+        with self._cond:
+            self._pending = [p for p in reversed(paths) if p not in self.cache]
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = []
+            self._cond.notify()
+
+    def _run(self):
+        from image_thumbnails import decode_thumbnail
+
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                path = self._pending.pop()
+            if path in self.cache:
+                continue
+            try:
+                image = decode_thumbnail(self.read(path), self.size)
+                self.cache.put(path, image, _image_bytes(image))
+            except Exception:
+                self.cache.put(path, DECODE_FAILED, 0)
+            self.results.put(path)
+
+
+class PreviewGrid(ttk.Frame):
+    """虚拟化的缩略图网格：只为可见的格子创建画布元素和 PhotoImage"""
+
+    def __init__(self, master, cell_size=128, cache_bytes=64 * 1024 * 1024, read=_read_file, **kwargs):
+        super().__init__(master, **kwargs)
+        self.cell_size = cell_size
+        self.cell_width = cell_size + 16
+        self.cell_height = cell_size + 36
+        self.items = []
+        self._columns = 1
+        # 索引 -> (PhotoImage 或 None, 画布元素标签)
+        self._cells = {}
+        # 图片的键 -> 索引列表（同一张图片可以出现在多个位置）
+        self._indexes_by_path = {}
+        self.cache = ThumbnailCache(cache_bytes)
+        self._loader = ThumbnailLoader(self.cache, cell_size, read)
+
+        self.canvas = tk.Canvas(self, background="white", highlightthickness=0)
+        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self._layout())
+        self.canvas.bind("<MouseWheel>", lambda e: self._scroll(-1 if e.delta > 0 else 1))
+        self.canvas.bind("<Button-4>", lambda e: self._scroll(-1))
+        self.canvas.bind("<Button-5>", lambda e: self._scroll(1))
+        self._poll_id = self.after(50, self._poll)
+
+    def set_items(self, items):
+        """设置要显示的 (分组, 图片的键) 列表"""
+        self.items = list(items)
+        self._indexes_by_path = {}
+        for i, (_, path) in enumerate(self.items):
+            self._indexes_by_path.setdefault(path, []).append(i)
+        self._clear_cells()
+        self.canvas.yview_moveto(0)
+        self._layout()
+
+    def destroy(self):
+        self._loader.close()
+        self.after_cancel(self._poll_id)
+        super().destroy()
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self._render()
+
+    def _scroll(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self._render()
+
+    def _layout(self):
+        width = max(1, self.canvas.winfo_width())
+        columns = max(1, width // self.cell_width)
+        rows = -(-len(self.items) // columns)
+        self.canvas.configure(scrollregion=(0, 0, width, rows * self.cell_height),
+                              yscrollincrement=self.cell_height // 4)
+        if columns != self._columns:
+            self._columns = columns
+            self._clear_cells()
+        self._render()
+
+    def _visible_range(self):
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first = max(0, int(top // self.cell_height)) * self._columns
+        last = (int(bottom // self.cell_height) + 1) * self._columns
+        return range(first, min(len(self.items), last))
+
+    def _render(self):
+        visible = self._visible_range()
+        for index in [i for i in self._cells if i not in visible]:
+            self.canvas.delete(self._cells.pop(index)[1])
+
+        missing = []
+        for index in visible:
+            if index not in self._cells:
+                self._draw_cell(index)
+            if self._cells[index][0] is None:
+                missing.append(self.items[index][1])
+        self._loader.request(missing)
+
+    def _draw_cell(self, index):
+        group, path = self.items[index]
+        row, column = divmod(index, self._columns)
+        x = column * self.cell_width + self.cell_width // 2
+        y = row * self.cell_height + 4
+        tag = f"cell{index}"
+        self.canvas.create_rectangle(x - self.cell_size // 2, y, x + self.cell_size // 2, y + self.cell_size,
+                                     outline="#dddddd", tags=tag)
+        self.canvas.create_text(x, y + self.cell_size + 4, anchor=tk.N, width=self.cell_width - 4,
+                                text=f"{group}\n{os.path.basename(path)}", font=("TkDefaultFont", 8), tags=tag)
+        self._cells[index] = (None, tag)
+        self._show_image(index)
+
+    def _show_image(self, index):
+        """缓存中已有缩略图时显示到格子中"""
+        path = self.items[index][1]
+        image = self.cache.get(path)
+        if image is None:
+            return
+        tag = self._cells[index][1]
+        row, column = divmod(index, self._columns)
+        x = column * self.cell_width + self.cell_width // 2
+        y = row * self.cell_height + 4 + self.cell_size // 2
+        if image is DECODE_FAILED:
+            self.canvas.create_text(x, y, text="无法预览", fill="gray", tags=tag)
+            self._cells[index] = (False, tag)
+            return
+        from PIL import ImageTk
+        photo = ImageTk.PhotoImage(image)
+        self.canvas.create_image(x, y, image=photo, tags=tag)
+        self._cells[index] = (photo, tag)
+
+    def _clear_cells(self):
+        self.canvas.delete("all")
+        self._cells.clear()
+
+    def _poll(self):
+        """把后台线程解码完成的缩略图显示到仍然可见的格子中"""
+        try:
+            while True:
+                path = self._loader.results.get_nowait()
+                for index in self._indexes_by_path.get(path, ()):
+                    cell = self._cells.get(index)
+                    if cell is not None and cell[0] is None:
+                        self._show_image(index)
+        except queue.Empty:
+            pass
+        self._poll_id = self.after(50, self._poll)
+
+
+class PreviewWindow(tk.Toplevel):
+    """按 工作表/列 筛选的预览窗口（导出前预览工作簿中的图片）"""
+
+    def __init__(self, master, preview):
+        """preview 为 WorkbookPreview，窗口关闭时一并关闭"""
+        super().__init__(master)
+        self.title(f"预览 - {Path(preview.excel_file_path).name}")
+        self.geometry("820x600")
+        self.preview = preview
+        self.all_items = preview.items
+
+        toolbar = ttk.Frame(self, padding="5")
+        toolbar.pack(fill=tk.X)
+        ttk.Label(toolbar, text="工作表/列").pack(side=tk.LEFT)
+        groups = sorted({group for group, _ in self.all_items})
+        self.group = tk.StringVar(value=ALL_GROUPS)
+        selector = ttk.Combobox(toolbar, textvariable=self.group, values=[ALL_GROUPS] + groups,
+                                state="readonly", width=40)
+        selector.pack(side=tk.LEFT, padx=5)
+        selector.bind("<<ComboboxSelected>>", lambda e: self._apply_filter())
+        self.count_label = ttk.Label(toolbar)
+        self.count_label.pack(side=tk.LEFT, padx=10)
+
+        self.grid_view = PreviewGrid(self, read=preview.read)
+        self.grid_view.pack(fill=tk.BOTH, expand=True)
+        self._apply_filter()
+
+    def destroy(self):
+        super().destroy()
+        self.preview.close()
+
+    def _apply_filter(self):
+        group = self.group.get()
+        items = self.all_items if group == ALL_GROUPS else [i for i in self.all_items if i[0] == group]
+        self.count_label.configure(text=f"{len(items)} 张图片")
+        self.grid_view.set_items(items)
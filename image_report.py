@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片报表
+提取时逐行写出报表：每个原始行一行（工作表、行号、关键值、列名），
+后面是该行各张图片按列排列的相对路径链接。提取器按 (行, 列) 顺序输出每个工作表的图片，
+行号变化时立即写出上一行，内存中只保留当前行。.xlsx 用 openpyxl 的只写模式流式写出，
+链接使用 HYPERLINK 公式（普通超链接对象要到保存时才写出，会随行数占用内存）；也可以写成 CSV
+"""
+
+import csv
+from pathlib import Path
+
+REPORT_FORMATS = ('xlsx', 'csv')
+REPORT_HEADER = ("工作表", "行号", "关键值", "列名", "图片")
+# Excel 中 HYPERLINK 的链接地址最长 255 个字符，更长的路径只写文本
+_MAX_LINK_LENGTH = 255
+
+
+class ReportWriter:
+    """流式写出图片报表，同一原始行的图片（按行列顺序输出）合并为一行"""
+
+    def __init__(self, path, fmt='xlsx'):
+        """
+        Args:
+            path (str): 报表路径，链接相对于报表所在目录
+            fmt (str): "xlsx" 或 "csv"
+        """
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f"不支持的报表格式: {fmt}")
+        self.path = Path(path)
+        self.format = fmt
+        self.rows = 0
+        # 当前原始行：(工作表, 行号, 关键值, [列名], [输出路径])
+        self._current = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == 'xlsx':
+            self._open_xlsx()
+        else:
+            # 带 BOM，Excel 直接打开时中文不乱码
+            self._file = open(self.path, 'w', encoding='utf-8-sig', newline='')
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(REPORT_HEADER)
+
+    def add(self, sheet, row, key, header, output):
+        """
+        追加一张图片；output 为相对报表目录的输出路径。
+        图片按工作表内 (行, 列) 的顺序追加；与上一张图片属于同一工作表的同一行（有行号）时
+        写在同一行中，行号变化时立即写出上一行
+        """
+        current = self._current
+        if current is not None and row is not None and current[:2] == (sheet, row):
+            if header not in current[3]:
+                current[3].append(header)
+            current[4].append(output)
+            return
+        self._write_current()
+        self._current = (sheet, row, key, [header], [output])
+
+    def close(self):
+        """写出最后一行并保存"""
+        try:
+            self._write_current()
+        finally:
+            if self.format == 'xlsx':
+                self._workbook.save(self.path)
+                self._workbook.close()
+            else:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open_xlsx(self):
+        # openpyxl 只在需要 .xlsx 报表时导入
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet("图片")
+        self._cell = WriteOnlyCell
+        self._link_font = Font(color="0563C1", underline="single")
+        header_font = Font(bold=True)
+        self._sheet.append([self._styled(value, header_font) for value in REPORT_HEADER])
+
+    def _styled(self, value, font):
+        cell = self._cell(self._sheet, value=value)
+        cell.font = font
+        return cell
+
+    def _write_current(self):
+        if self._current is None:
+            return
+        sheet, row, key, headers, outputs = self._current
+        self._current = None
+        values = [sheet, row, key, "、".join(h for h in headers if h)]
+        if self.format == 'csv':
+            self._csv.writerow(values + outputs)
+        else:
+            self._sheet.append([self._text(v) for v in values] + [self._link(output) for output in outputs])
+        self.rows += 1
+
+    def _text(self, value):
+        """以 = 开头的文本（例如关键值）按文本写入，而不是公式"""
+        if not isinstance(value, str) or not value.startswith('='):
+            return value
+        cell = self._cell(self._sheet, value=value)
+        cell.data_type = 's'
+        return cell
+
+    def _link(self, output):
+        if len(output) > _MAX_LINK_LENGTH:
+            return self._text(output)
+        quoted = output.replace('"', '""')
+        return self._styled(f'=HYPERLINK("{quoted}","{quoted}")', self._link_font)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似重复图片检测
+用 Pillow 计算 64 位感知哈希（dHash / pHash，先缩略解码），
+用 NumPy 数组保存哈希，汉明距离查询通过向量化的异或 + 位计数完成
+"""
+
+import os
+
+HASH_METHODS = ('dhash', 'phash')
+# 少于该数量的图片直接在当前进程计算，避免启动进程池的开销
+_POOL_THRESHOLD = 32
+_POPCOUNT_TABLE = None
+
+
+def _open_small(data, size):
+    """以尽量小的代价解码出不小于 size 的灰度图"""
+    import io
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    # JPEG 可直接按 1/2、1/4、1/8 比例解码
+    img.draft('L', (size, size))
+    factor = min(img.size) // (size * 2)
+    if factor > 1:
+        img = img.reduce(factor)
+    return img.convert('L')
+
+
+def dhash(data, hash_size=8):
+    """差值哈希：比较相邻像素的明暗，返回 hash_size*hash_size 位整数"""
+    from PIL import Image
+
+    img = _open_small(data, hash_size + 1).resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = img.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def phash(data, hash_size=8, highfreq_factor=4):
+    """感知哈希：对缩略图做二维 DCT，取低频系数与中位数比较"""
+    import numpy as np
+    from PIL import Image
+
+    size = hash_size * highfreq_factor
+    img = _open_small(data, size).resize((size, size), Image.BILINEAR)
+    pixels = np.asarray(img, dtype=np.float64)
+
+    n = np.arange(size)
+    dct = np.cos(np.pi / size * (n[None, :] + 0.5) * n[:, None])
+    coeffs = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+    bits = (coeffs > np.median(coeffs.ravel()[1:])).ravel()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _hash_file(args):
+    """进程池任务：返回 (路径, 哈希)，无法解码时哈希为 None；没有传入图片字节时从文件读取"""
+    path, method, data = args
+    try:
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        return path, (phash if method == 'phash' else dhash)(data)
+    except Exception:
+        return path, None
+
+
+def compute_hashes(paths, method='dhash', workers=None, read=None):
+    """
+    并行计算图片文件的感知哈希，返回 {路径: 哈希}
+
+    read 为 路径 -> 图片字节 的函数时由它读取图片（图片不在磁盘上时使用）
+    """
+    if method not in HASH_METHODS:
+        raise ValueError(f"不支持的哈希算法: {method}")
+    tasks = [(str(p), method, read(p) if read else None) for p in paths]
+    if len(tasks) < _POOL_THRESHOLD or workers == 1:
+        results = map(_hash_file, tasks)
+        return {path: value for path, value in results if value is not None}
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_hash_file, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+        return {path: value for path, value in results if value is not None}
+
+
+def popcount64(values):
+    """uint64 数组逐元素位计数"""
+    import numpy as np
+
+    global _POPCOUNT_TABLE
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    if _POPCOUNT_TABLE is None:
+        _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    values = np.ascontiguousarray(values)
+    return _POPCOUNT_TABLE[values.view(np.uint8).reshape(values.shape + (8,))].sum(axis=-1, dtype=np.uint8)
+
+
+class HashIndex:
+    """64 位感知哈希索引，所有查询都是对整个数组的向量化运算"""
+
+    def __init__(self, hashes):
+        import numpy as np
+
+        self._np = np
+        self.hashes = np.asarray(list(hashes), dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def distances(self, value):
+        """给定哈希到索引中每个哈希的汉明距离"""
+        return popcount64(self.hashes ^ self._np.uint64(value))
+
+    def query(self, value, max_distance):
+        """返回距离不超过 max_distance 的哈希下标"""
+        return self._np.nonzero(self.distances(value) <= max_distance)[0]
+
+    def pairs(self, max_distance, max_block=1 << 22):
+        """枚举所有距离不超过 max_distance 的下标对 (i, j)，i < j"""
+        np = self._np
+        count = len(self.hashes)
+        # 每次比较一块行，控制临时矩阵大小
+        rows = max(1, max_block // max(count, 1))
+        for start in range(0, count, rows):
+            stop = min(count, start + rows)
+            block = self.hashes[start:stop, None] ^ self.hashes[None, start + 1:]
+            close = popcount64(block) <= max_distance
+            i, j = np.nonzero(close)
+            j = j + start + 1
+            i = i + start
+            keep = j > i
+            yield from zip(i[keep].tolist(), j[keep].tolist())
+
+    def clusters(self, max_distance):
+        """按距离阈值做单链接聚类，只返回成员数大于1的簇（下标列表）"""
+        parent = list(range(len(self.hashes)))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for i, j in self.pairs(max_distance):
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+
+        groups = {}
+        for i in range(len(parent)):
+            groups.setdefault(find(i), []).append(i)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+def find_near_duplicates(paths, max_distance=6, method='dhash', workers=None, read=None):
+    """
+    对一组图片文件做近似重复聚类
+
+    Returns:
+        (hashes, clusters): hashes 为 {路径: 哈希}，clusters 为路径列表的列表
+    """
+    hashes = compute_hashes(paths, method, workers, read)
+    keys = list(hashes)
+    index = HashIndex(hashes[k] for k in keys)
+    clusters = [[keys[i] for i in members] for members in index.clusters(max_distance)]
+    return hashes, clusters
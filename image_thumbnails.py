@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缩略图与格式统一
+在进程池中直接处理媒体字节：每个媒体文件只解码一次，同时生成缩略图和/或统一格式的副本。
+只需要缩略图时使用 JPEG draft 模式和 reduce 快速缩小
+"""
+
+import io
+import os
+
+# 格式名 -> (Pillow 格式, 扩展名)
+IMAGE_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'png': ('PNG', '.png'),
+    'webp': ('WEBP', '.webp'),
+}
+
+
+def _prepare_mode(img, pil_format):
+    """转换为目标格式支持的颜色模式，JPEG 的透明背景填充为白色"""
+    from PIL import Image
+
+    if pil_format == 'JPEG':
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            return background
+        return img.convert('RGB') if img.mode != 'RGB' else img
+    if img.mode not in ('RGB', 'RGBA', 'L'):
+        return img.convert('RGBA')
+    return img
+
+
+def _encode(img, fmt, quality):
+    pil_format, ext = IMAGE_FORMATS[fmt]
+    buf = io.BytesIO()
+    options = {'quality': quality} if pil_format in ('JPEG', 'WEBP') else {'optimize': False}
+    _prepare_mode(img, pil_format).save(buf, pil_format, **options)
+    return buf.getvalue(), ext
+
+
+def _shrink(img, size):
+    """先用 reduce 按整数倍快速缩小，再用高质量滤波缩放到 size 以内"""
+    from PIL import Image
+
+    factor = min(img.size[0] // size, img.size[1] // size)
+    if factor >= 2:
+        img = img.reduce(factor)
+    img.thumbnail((size, size), Image.LANCZOS)
+    return img
+
+
+def decode_thumbnail(data, size):
+    """
+    解码媒体字节并缩小到 size 以内，返回可直接显示的 RGB/RGBA 图片（供界面预览）
+    """
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(data))
+    img.draft('RGB', (size, size))
+    img = _shrink(ImageOps.exif_transpose(img), size)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() or img.mode == 'P' else 'RGB')
+    return img
+
+
+def render_variants(data, thumbnail_size=None, thumbnail_format='jpeg', normalize_format=None, quality=85):
+    """
+    解码一次媒体字节，生成所需的派生图片
+
+    Returns:
+        dict: {"thumbnail": (字节, 扩展名), "normalized": (字节, 扩展名)}，只包含请求的项
+    """
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(data))
+    if normalize_format is None and thumbnail_size:
+        # 只要缩略图：JPEG 直接按 1/2~1/8 解码
+        img.draft('RGB', (thumbnail_size, thumbnail_size))
+    img = ImageOps.exif_transpose(img)
+
+    variants = {}
+    if normalize_format:
+        variants['normalized'] = _encode(img, normalize_format, quality)
+    if thumbnail_size:
+        variants['thumbnail'] = _encode(_shrink(img, thumbnail_size), thumbnail_format, quality)
+    return variants
+
+
+def _render_task(args):
+    """进程池任务：返回 (媒体标识, 派生图片或错误信息)"""
+    key, data, options = args
+    try:
+        return key, render_variants(data, **options)
+    except Exception as e:
+        return key, e
+
+
+def render_all(items, workers=None, window=None, **options):
+    """
+    并行处理 (媒体标识, 字节) 序列，按完成顺序产出 (媒体标识, 派生图片或异常)
+
+    同时在途的任务数不超过 window，避免把所有媒体字节一次性放进内存
+    """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
+    items = iter(items)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for key, data in items:
+            yield _render_task((key, data, options))
+        return
+
+    window = window or workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for key, data in items:
+            pending.add(pool.submit(_render_task, (key, data, options)))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+远程工作簿
+通过 HTTP Range 请求读取文件服务器上的工作簿，无需下载整个文件：
+第一次请求取回文件末尾（压缩包的中央目录），之后只请求提取需要的部件
+（工作簿、关系、绘图、媒体）所在的字节范围。相邻的范围合并为一次请求，
+所有请求复用同一个 HTTP 连接。读到的数据按块缓存在内存中（LRU，有大小上限）
+"""
+
+import hashlib
+import io
+import re
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlsplit
+
+REMOTE_SCHEMES = ('http://', 'https://')
+# 缓存和请求的对齐单位
+BLOCK_SIZE = 64 * 1024
+# 第一次请求读取的文件末尾长度，通常包含整个中央目录
+TAIL_SIZE = 256 * 1024
+# 两个范围之间的空隙不超过该值时合并为一次请求（多读一些字节比多一次往返便宜）
+MERGE_GAP = 256 * 1024
+# 单次请求的最大长度
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+# 估算部件字节范围时为本地文件头中的文件名和扩展字段预留的长度
+LOCAL_HEADER_SLACK = 1024
+# 最多跟随的重定向次数
+MAX_REDIRECTS = 5
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class RemoteWorkbookError(OSError):
+    """远程工作簿读取失败（服务器不支持 Range 请求、文件在读取过程中变化等）"""
+
+
+def is_remote(path):
+    """路径是否为 http(s) 地址"""
+    return isinstance(path, str) and path.lower().startswith(REMOTE_SCHEMES)
+
+
+def _connect(url, timeout):
+    import http.client
+
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme.lower() == 'https' else http.client.HTTPConnection
+    target = parts.path or '/'
+    if parts.query:
+        target += '?' + parts.query
+    return connection_class(parts.netloc, timeout=timeout), target
+
+
+def _redirect_location(url, response):
+    """重定向响应的目标地址（相对地址按当前地址解析），不是重定向时返回None"""
+    location = response.getheader('Location')
+    if response.status not in _REDIRECT_STATUSES or not location:
+        return None
+    location = urljoin(url, location)
+    if not is_remote(location):
+        raise RemoteWorkbookError(f"{url} 重定向到了不支持的地址: {location}")
+    return location
+
+
+def _last_modified_ns(value):
+    try:
+        return int(parsedate_to_datetime(value).timestamp()) * 1_000_000_000
+    except (TypeError, ValueError):
+        return 0
+
+
+def remote_identity(url, timeout=30):
+    """
+    远程工作簿标识：(地址, 大小, 修改时间, ETag)，用 HEAD 请求获取
+
+    Raises:
+        RemoteWorkbookError: 请求失败，或服务器既不返回 ETag 也不返回 Last-Modified（无法判断文件是否变化）
+    """
+    location = url
+    for _ in range(MAX_REDIRECTS + 1):
+        connection, target = _connect(location, timeout)
+        try:
+            connection.request('HEAD', target)
+            response = connection.getresponse()
+            response.read()
+        except OSError as e:
+            raise RemoteWorkbookError(f"请求 {url} 失败: {e}")
+        finally:
+            connection.close()
+        location = _redirect_location(location, response)
+        if location is None:
+            break
+    else:
+        raise RemoteWorkbookError(f"{url} 重定向次数过多")
+    if response.status != 200:
+        raise RemoteWorkbookError(f"请求 {url} 失败: HTTP {response.status}")
+    etag = response.getheader('ETag')
+    last_modified = response.getheader('Last-Modified')
+    if not etag and not last_modified:
+        raise RemoteWorkbookError(f"{url} 没有 ETag 或 Last-Modified，无法判断文件是否变化")
+    return url, int(response.getheader('Content-Length') or 0), _last_modified_ns(last_modified), etag
+
+
+def remote_digest(url):
+    """远程工作簿的缓存键（由标识计算，不下载文件内容）"""
+    return hashlib.sha256(repr(remote_identity(url)).encode('utf-8')).hexdigest()
+
+
+class HttpRangeFile(io.RawIOBase):
+    """只读、可寻址的远程文件，供 zipfile/openpyxl 直接读取"""
+
+    def __init__(self, url, cache_size=64 * 1024 * 1024, timeout=30):
+        """
+        Args:
+            url (str): 文件地址
+            cache_size (int): 内存中缓存的最大字节数
+            timeout (float): 连接和读取的超时（秒）
+        """
+        super().__init__()
+        self.url = url
+        self.cache_size = max(cache_size, 4 * BLOCK_SIZE)
+        self.timeout = timeout
+        self.requests = 0
+        self.bytes_received = 0
+        self.size = None
+        self.etag = None
+        self._connection = None
+        self._target = None
+        self._position = 0
+        # 块序号 -> 数据
+        self._blocks = OrderedDict()
+        self._cached = 0
+        self._fetch_tail()
+
+    # ---- 文件接口 ----
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("负的文件位置")
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer):
+        start = self._position
+        end = min(start + len(buffer), self.size)
+        if end <= start:
+            return 0
+        self._ensure(start, end)
+        view = memoryview(buffer)
+        written = 0
+        for index in range(start // BLOCK_SIZE, (end - 1) // BLOCK_SIZE + 1):
+            block = self._blocks.get(index)
+            if block is None:
+                # 一次读取超过缓存大小时，前面的块可能已被淘汰
+                self._fetch_blocks(index, index)
+                block = self._blocks[index]
+            self._blocks.move_to_end(index)
+            block_start = index * BLOCK_SIZE
+            piece = block[max(start, block_start) - block_start:min(end, block_start + len(block)) - block_start]
+            view[written:written + len(piece)] = piece
+            written += len(piece)
+        self._position += written
+        return written
+
+    def close(self):
+        self._close_connection()
+        self._blocks.clear()
+        super().close()
+
+    # ---- 预取 ----
+
+    def prefetch(self, ranges):
+        """
+        预取一组字节范围 [(起始, 结束), ...]：缺少的块按位置排序，
+        空隙不超过 MERGE_GAP 的相邻范围合并为一次请求
+        """
+        missing = sorted({index for start, end in ranges if end > start
+                          for index in range(start // BLOCK_SIZE, (min(end, self.size) - 1) // BLOCK_SIZE + 1)
+                          if index not in self._blocks})
+        if not missing:
+            return
+        gap = MERGE_GAP // BLOCK_SIZE
+        limit = MAX_REQUEST_SIZE // BLOCK_SIZE
+        first = last = missing[0]
+        for index in missing[1:]:
+            if index - last <= gap + 1 and index - first < limit:
+                last = index
+                continue
+            self._fetch_blocks(first, last)
+            first = last = index
+        self._fetch_blocks(first, last)
+
+    def _ensure(self, start, end):
+        """读取前确保 [start, end) 所在的块都已缓存"""
+        self.prefetch([(start, end)])
+
+    # ---- HTTP ----
+
+    def _close_connection(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _request(self, byte_range):
+        """
+        发送一个 Range 请求，跟随重定向（之后的请求直接发往新地址），连接断开时重连一次；
+        返回 (响应, 起始偏移, 文件大小, 数据)
+        """
+        import http.client
+
+        headers = {'Range': f'bytes={byte_range}'}
+        if self.etag and not self.etag.startswith('W/'):
+            # 文件在读取过程中被替换时服务器返回 412，而不是拼出一个损坏的压缩包。
+            # If-Match 使用强比较，弱 ETag 永远不匹配，只依靠 Content-Range 中的文件大小检查
+            headers['If-Match'] = self.etag
+        for _ in range(MAX_REDIRECTS + 1):
+            for attempt in range(2):
+                if self._connection is None:
+                    self._connection, self._target = _connect(self.url, self.timeout)
+                try:
+                    self._connection.request('GET', self._target, headers=headers)
+                    response = self._connection.getresponse()
+                    break
+                except (http.client.HTTPException, OSError) as e:
+                    self._close_connection()
+                    if attempt:
+                        raise RemoteWorkbookError(f"请求 {self.url} 失败: {e}")
+            self.requests += 1
+            location = _redirect_location(self.url, response)
+            if location is None:
+                break
+            # 不读取重定向的响应体，也不把它当作文件内容
+            self._close_connection()
+            self.url = location
+        else:
+            self._close_connection()
+            raise RemoteWorkbookError(f"{self.url} 重定向次数过多")
+        if response.status != 206:
+            # 不读取响应体：不支持 Range 的服务器会返回整个文件
+            self._close_connection()
+            if response.status == 412:
+                raise RemoteWorkbookError(f"{self.url} 在读取过程中已变化")
+            raise RemoteWorkbookError(f"{self.url} 不支持 Range 请求（HTTP {response.status}）")
+        try:
+            data = response.read()
+        except (http.client.HTTPException, OSError) as e:
+            self._close_connection()
+            raise RemoteWorkbookError(f"读取 {self.url} 失败: {e}")
+        self.bytes_received += len(data)
+        if response.will_close:
+            self._close_connection()
+        match = _CONTENT_RANGE.match(response.getheader('Content-Range', ''))
+        if not match or match.group(3) == '*':
+            raise RemoteWorkbookError(f"{self.url} 返回的 Content-Range 无效")
+        start, end, total = (int(g) for g in match.groups())
+        if len(data) != end - start + 1:
+            raise RemoteWorkbookError(f"{self.url} 返回的数据不完整")
+        return response, start, total, data
+
+    def _fetch_tail(self):
+        """读取文件末尾，同时得到文件大小"""
+        response, start, self.size, data = self._request(f'-{TAIL_SIZE}')
+        self.etag = response.getheader('ETag')
+        # 只缓存完整的块（文件最后一块可以不完整）
+        first = -(-start // BLOCK_SIZE)
+        self._store(first, data[first * BLOCK_SIZE - start:])
+
+    def _fetch_blocks(self, first, last):
+        end = min((last + 1) * BLOCK_SIZE, self.size)
+        _, start, total, data = self._request(f'{first * BLOCK_SIZE}-{end - 1}')
+        if total != self.size or start != first * BLOCK_SIZE:
+            raise RemoteWorkbookError(f"{self.url} 在读取过程中已变化")
+        self._store(first, data)
+
+    def _store(self, first, data):
+        for offset in range(0, len(data), BLOCK_SIZE):
+            index = first + offset // BLOCK_SIZE
+            old = self._blocks.pop(index, None)
+            if old is not None:
+                self._cached -= len(old)
+            block = data[offset:offset + BLOCK_SIZE]
+            self._blocks[index] = block
+            self._cached += len(block)
+        while self._cached > self.cache_size and len(self._blocks) > 1:
+            _, evicted = self._blocks.popitem(last=False)
+            self._cached -= len(evicted)
+
+
+def member_span(info):
+    """压缩包部件（ZipInfo）在文件中的字节范围（本地文件头按估算长度计算）"""
+    start = info.header_offset
+    return start, start + 30 + len(info.filename.encode('utf-8')) + len(info.extra) \
+        + info.compress_size + LOCAL_HEADER_SLACK
+
+
+def entry_span(entry):
+    """缓存的媒体偏移信息（见 workbook_index.media_entries）对应的字节范围"""
+    return entry[0], entry[0] + 30 + entry[2] + LOCAL_HEADER_SLACK
+
+
+def prefetched(source, items, span):
+    """
+    按文件中的位置依次产出 items；source 是远程文件时先分批预取每批 items 的字节范围，
+    每批不超过缓存大小的一半，避免预取的块在使用前被淘汰
+
+    Args:
+        span (callable): item -> (起始偏移, 结束偏移)
+    """
+    if not isinstance(source, HttpRangeFile):
+        yield from items
+        return
+    batch = []
+    size = 0
+    for item in sorted(items, key=lambda i: span(i)[0]):
+        start, end = span(item)
+        if batch and size + end - start > source.cache_size // 2:
+            source.prefetch([span(i) for i in batch])
+            yield from batch
+            batch, size = [], 0
+        batch.append(item)
+        size += end - start
+    if batch:
+        source.prefetch([span(i) for i in batch])
+        yield from batch
@@ -6,226 +6,647 @@
 """
 
 import os
+import re
+import io
+import sys
+import contextlib
+import hashlib
+import json
 import zipfile
 import shutil
+import struct
+import argparse
+import tempfile
+import time
+import uuid
 from pathlib import Path
-import xml.etree.ElementTree as ET
+
+from image_dataset import content_type
+from image_manifest import ManifestWriter, read_image_size
+from workbook_backends import ExtractedParts, ZipParts, column_letter_to_index, detect_format, open_backend
+from workbook_crypto import decrypt_workbook, is_compound_file
+from remote_workbook import HttpRangeFile, entry_span, is_remote, member_span, prefetched
+from workbook_index import StructureCache, media_entries, new_structure, read_media, shared_structure_cache
+
+# 可选功能（图片目录、近似重复、缩略图）及 openpyxl/Pillow/NumPy 都在首次使用时才导入，
+# 保证导入本模块和启动界面足够快
+
+# 文件名中不允许出现的字符
+_UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+class ExtractionCancelled(Exception):
+    """提取被取消令牌中止"""
+
 
 class SimpleExcelImageExtractor:
-    def __init__(self, excel_file_path, output_dir="extracted_images"):
+    def __init__(self, excel_file_path, output_dir="extracted_images", key_column=None,
+                 manifest=False, manifest_formats=(), catalog=None,
+                 near_duplicates=False, near_duplicate_distance=6, hash_method='dhash',
+                 keep_one_duplicate=False, workers=None,
+                 thumbnail_size=None, thumbnail_format='jpeg', normalize_format=None,
+                 progress_callback=None, progress_interval=0.2, cancel_token=None, structure_cache=None,
+                 password=None, report=None, dataset=None, dataset_rows_per_group=256,
+                 dataset_shard_mb=512, dataset_compression='none', write_files=True):
         """
         初始化Excel图片提取器
         
         Args:
-            excel_file_path (str): Excel文件路径
+            excel_file_path (str): Excel文件路径，或 http(s) 地址（通过 Range 请求只下载需要的部件）
             output_dir (str): 输出目录
+            key_column (str): 关键列（表头名称或列字母，如 "款号" 或 "B"），
+                指定后图片以同一行该列的值命名
+            manifest (bool): 是否在输出目录写出图片清单 <工作簿名>_manifest.jsonl
+            manifest_formats (iterable): 清单的额外格式，可选 "parquet"、"sqlite"
+            catalog (str): 跨工作簿图片目录（SQLite）路径，指定后本次结果会增量写入目录
+            near_duplicates (bool): 是否检测近似重复图片（需要 Pillow 和 NumPy）
+            near_duplicate_distance (int): 感知哈希汉明距离不超过该值视为近似重复
+            hash_method (str): 感知哈希算法，"dhash" 或 "phash"
+            keep_one_duplicate (bool): 每组近似重复图片只保存代表图（分辨率最高者）
+            workers (int): 并行计算时的进程数，默认使用全部CPU
+            thumbnail_size (int): 生成缩略图的最长边像素，写入 输出目录/_thumbnails/<图片路径>.<格式>（需要 Pillow）
+            thumbnail_format (str): 缩略图格式，"jpeg" 或 "webp"
+            normalize_format (str): 把所有图片统一转换为该格式，写入 输出目录/_normalized
+            progress_callback (callable): 进度回调，参数为进度字典
+                {'stage', 'total', 'done', 'total_bytes', 'done_bytes'}；
+                建立索引后报告一次总数，之后按 progress_interval 限频报告已处理数量
+            progress_interval (float): 两次进度回调之间的最短间隔（秒）
+            cancel_token: 取消令牌（threading.Event、multiprocessing.Event 等有 is_set() 的对象），
+                在每张图片之间检查；取消后已保存的图片与清单保持一致，图片目录不更新
+            structure_cache: 工作簿结构缓存：StructureCache 实例、磁盘缓存目录，或 True（只缓存在内存中）；
+                同一工作簿再次提取时跳过解压和XML解析
+            password (str): 加密工作簿的打开密码；加密的工作簿在内存中解密，不写出解密后的文件
+            report (str): 在输出目录写出图片报表 <工作簿名>_report.xlsx 或 .csv（"xlsx" 或 "csv"），
+                每个原始行一行，链接到该行的图片
+            dataset (str): 图片数据集目录，每个图片位置连同图片字节写入 Parquet 分片（需要 pyarrow）
+            dataset_rows_per_group (int): 数据集每个行组的行数
+            dataset_shard_mb (int): 数据集单个分片的目标大小（MB）
+            dataset_compression (str): 数据集的压缩方式，默认不压缩（图片本身已压缩）
+            write_files (bool): 是否把图片写成单独的文件；为 False 时只写入数据集（以及清单、图片目录）
         """
         self.excel_file_path = excel_file_path
         self.output_dir = Path(output_dir)
-        self.temp_dir = Path("temp_excel_extract")
+        # 每个提取器使用独立的临时目录，多个提取任务可以并行运行
+        self.temp_dir = Path(tempfile.gettempdir()) / f"temp_excel_extract_{uuid.uuid4().hex[:12]}"
+        self.key_column = key_column
+        # 输出目录 -> 已占用的文件名（小写），避免每次保存都重新扫描目录
+        self._used_names = {}
+        # (输出目录, 文件名前缀) -> 下一个可用序号
+        self._name_counters = {}
+        self.manifest = manifest or bool(manifest_formats)
+        self.manifest_formats = tuple(manifest_formats)
+        self._manifest_writer = None
+        self.report = report
+        self._report_writer = None
+        self.dataset = dataset
+        self.dataset_rows_per_group = dataset_rows_per_group
+        self.dataset_shard_mb = dataset_shard_mb
+        self.dataset_compression = dataset_compression
+        self._dataset_writer = None
+        self.write_files = write_files
+        self.catalog = catalog
+        self._catalog = None
+        # 媒体文件 -> (字节数, SHA-256, 宽, 高)，同一媒体多次引用时只计算一次
+        self._media_info = {}
+        self.near_duplicates = near_duplicates or keep_one_duplicate
+        self.near_duplicate_distance = near_duplicate_distance
+        self.hash_method = hash_method
+        self.keep_one_duplicate = keep_one_duplicate
+        self.workers = workers
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_format = thumbnail_format
+        self.normalize_format = normalize_format
+        # 近似重复簇（代表图在前）、被跳过的媒体文件
+        self._near_dup_clusters = []
+        self._near_dup_hashes = {}
+        self._near_dup_skip = set()
+        # 媒体文件 -> 输出路径列表（相对输出目录）
+        self._outputs_by_media = {}
+        # 本次保存的图片数量与错误（供批量/监控任务统计）
+        self.saved_count = 0
+        self.error = None
+        # 处理工作表或保存图片时出错的次数（出错时不更新图片目录，保留上一次完整的记录）
+        self.failures = 0
+        # 进度与取消
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.cancel_token = cancel_token
+        self.cancelled = False
+        self.progress = {'stage': 'indexing', 'total': 0, 'done': 0, 'total_bytes': 0, 'done_bytes': 0}
+        self._last_progress = 0.0
+        # 媒体文件 -> 字节数
+        self._media_sizes = {}
+        # 工作簿结构（见 workbook_index.new_structure），有新解析的内容时需要写回缓存
+        self.structure_cache = structure_cache
+        self._structure = None
+        self._structure_dirty = False
+        # 容器后端（按工作簿格式选择：xlsx/xlsm、xlsb、ods）
+        self._backend = None
+        # 工作簿容器：文件路径、远程文件，或加密工作簿解密后的内存缓冲区
+        self.password = password
+        self._package = None
+        # 工作簿是否解密到了内存中（解密后的部件和媒体都不写到磁盘）
+        self._decrypted = False
+        self._zip = None
+        # 部件存储：解压到临时目录的文件，或内存中解密后的压缩包
+        self._parts = ExtractedParts(self.temp_dir)
+        # 压缩包中的部件名称（远程工作簿只下载了其中一部分）
+        self._members = set()
         
     def extract_images(self):
         """提取Excel中的所有图片"""
         print(f"开始从 {self.excel_file_path} 提取图片...")
         
         # 创建输出目录
-        self.output_dir.mkdir(exist_ok=True)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.saved_count = 0
+        self.error = None
+        self.failures = 0
+        self.cancelled = False
         
         try:
-            # 解压Excel文件
-            self._extract_excel()
+            if self.manifest:
+                manifest_path = self.output_dir / f"{Path(self.excel_file_path).stem}_manifest.jsonl"
+                self._manifest_writer = ManifestWriter(manifest_path, self.manifest_formats)
+            if self.report and not self.write_files:
+                print("不写出图片文件时不生成报表（报表链接到图片文件）")
+            elif self.report:
+                from image_report import ReportWriter
+                report_path = self.output_dir / f"{Path(self.excel_file_path).stem}_report.{self.report}"
+                self._report_writer = ReportWriter(report_path, self.report)
+            if self.dataset:
+                from image_dataset import DatasetWriter
+                self._dataset_writer = DatasetWriter(self.dataset, self.excel_file_path,
+                                                     rows_per_group=self.dataset_rows_per_group,
+                                                     shard_size=self.dataset_shard_mb * 1024 * 1024,
+                                                     compression=self.dataset_compression)
+            if self.catalog:
+                from image_catalog import ImageCatalog
+                self._catalog = ImageCatalog(self.catalog)
+                self._catalog.begin_workbook(self.excel_file_path, self.output_dir)
+            
+            # 解压Excel文件（结构已缓存时只按偏移读取媒体文件）
+            cache = self._get_structure_cache()
+            self._structure = cache.get(self.excel_file_path) if cache else None
+            self._structure_dirty = False
+            if self._structure is None or not self._extract_cached_media():
+                self._extract_excel()
             
             # 提取图片
             self._extract_images_from_media()
             
             print("图片提取完成！")
+            self._close_catalog(commit=self.failures == 0)
+            if cache and self._structure_dirty:
+                # 加密工作簿的表头和关键值不以明文写入磁盘缓存
+                cache.put(self.excel_file_path, self._structure, persist=not self._decrypted)
+            self._report_progress('finished', force=True)
             
+        except ExtractionCancelled as e:
+            # 已保存的图片都已写入清单；图片目录保留上一次完整提取的结果
+            self.cancelled = True
+            self.error = e
+            print(f"提取已取消，已保存 {self.saved_count} 张图片")
+            self._report_progress('cancelled', force=True)
         except Exception as e:
+            self.error = e
             print(f"提取过程中出现错误: {e}")
         finally:
+            self._close_catalog(commit=False)
+            self._close_manifest()
+            self._close_report()
+            self._close_dataset()
+            self._close_package()
             # 清理临时文件
             self._cleanup_temp()
     
+    def preview_items(self):
+        """
+        导出前预览：只建立图片索引，不解压、不写出图片，部件直接从压缩包中读取。
+        之后用 read_preview_media 读取图片字节，预览结束时调用 close_preview
+
+        Returns:
+            list: (分组, 媒体路径) 列表，分组为 "工作表/列名"（与输出目录相同），
+            媒体路径为压缩包内的路径；没有解析到位置的工作簿分组为 "未定位"
+        """
+        package = self._open_package()
+        zip_ref = self._open_zip_parts(package)
+        names = zip_ref.namelist()
+        self._members = set(names)
+        fmt = detect_format(names)
+        self._backend = open_backend(fmt, package, self.temp_dir, self._parts)
+        self._structure = structure = new_structure(fmt)
+        structure['media'] = media_entries(zip_ref, self._backend.media_prefix)
+        self._index_workbook(structure)
+        items = []
+        for sheet in structure['sheets']:
+            if not sheet['positions']:
+                continue
+            column_names = self._sheet_columns(sheet['name'])
+            for media, row, col, anchor in sheet['positions']:
+                items.append((f"{sheet['name']}/{self._get_column_name_by_index(col, column_names)}", media))
+        return items or [("未定位", name) for name in structure['media']]
+    
+    def read_preview_media(self, name):
+        """读取压缩包中一个媒体文件的字节（name 为 preview_items 返回的媒体路径）"""
+        return self._parts.read_bytes(self.temp_dir / name)
+    
+    def close_preview(self):
+        self._close_package()
+    
     def _extract_excel(self):
-        """解压Excel文件"""
+        """解压Excel文件（解密到内存中的工作簿不解压，部件直接从压缩包读取）"""
         print("正在解压Excel文件...")
+        self._check_cancelled()
         
-        # 创建临时目录
-        self.temp_dir.mkdir(exist_ok=True)
-        
-        # 解压Excel文件
-        with zipfile.ZipFile(self.excel_file_path, 'r') as zip_ref:
+        package = self._open_package()
+        zip_ref = self._open_zip_parts(package)
+        if not self._decrypted:
+            # 创建临时目录
+            self.temp_dir.mkdir(parents=True, exist_ok=True)
+        names = zip_ref.namelist()
+        self._members = set(names)
+        fmt = detect_format(names)
+        self._backend = open_backend(fmt, package, self.temp_dir, self._parts)
+        if isinstance(package, HttpRangeFile):
+            # 远程工作簿只下载建立索引需要的部件，按位置合并请求
+            infos = [zip_ref.getinfo(name) for name in self._backend.index_parts(names)]
+            for info in prefetched(package, infos, member_span):
+                zip_ref.extract(info, self.temp_dir)
+        elif not self._decrypted:
             zip_ref.extractall(self.temp_dir)
+        self._structure = new_structure(fmt)
+        self._structure['media'] = media_entries(zip_ref, self._backend.media_prefix)
+        self._structure_dirty = True
         
         print("Excel文件解压完成")
     
+    def _open_zip_parts(self, package):
+        """
+        打开工作簿压缩包作为部件来源，返回压缩包（随工作簿容器一起关闭）。
+        解密到内存中的工作簿只从压缩包读取；其他工作簿优先读取解压到临时目录的部件，
+        没有解压的部件（例如远程工作簿读取列名时只需要工作表开头）从压缩包流式读取
+        """
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(package, 'r')
+            zip_parts = ZipParts(self._zip, self.temp_dir)
+            self._parts = zip_parts if self._decrypted else ExtractedParts(self.temp_dir, zip_parts)
+        return self._zip
+    
+    def _open_package(self):
+        """工作簿容器：普通工作簿返回文件路径；加密的工作簿解密到内存缓冲区（只解密一次）"""
+        if self._package is None:
+            source = self.excel_file_path
+            if is_remote(source):
+                print("正在读取远程工作簿的目录...")
+                source = HttpRangeFile(source)
+            if is_compound_file(source):
+                print("工作簿已加密，正在解密...")
+                try:
+                    self._package = decrypt_workbook(source, self.password, cancel_check=self._check_cancelled)
+                    self._decrypted = True
+                finally:
+                    if source is not self.excel_file_path:
+                        self._close_package(source)
+                print("解密完成")
+            else:
+                self._package = source
+        return self._package
+    
+    def _close_package(self, package=None):
+        package = package or self._package
+        if isinstance(package, HttpRangeFile):
+            print(f"远程工作簿: {package.requests} 次请求，下载 {package.bytes_received / 1024 / 1024:.1f} MB"
+                  f"（文件共 {package.size / 1024 / 1024:.1f} MB）")
+        if package is self._package and self._zip is not None:
+            self._zip.close()
+            self._zip = None
+            self._parts = ExtractedParts(self.temp_dir)
+        if hasattr(package, 'close'):
+            package.close()
+        if package is self._package:
+            self._package = None
+            self._decrypted = False
+    
+    def _get_structure_cache(self):
+        cache = self.structure_cache
+        if not cache:
+            return None
+        if isinstance(cache, StructureCache):
+            return cache
+        return shared_structure_cache(None if cache is True else cache)
+    
+    def _extract_cached_media(self):
+        """按缓存的偏移直接读取媒体文件，无需解压整个工作簿；失败时返回False"""
+        try:
+            package = self._open_package()
+            if self._decrypted:
+                # 解密后的工作簿在内存中，媒体直接从压缩包读取，不写到临时目录
+                self._open_zip_parts(package)
+                self._backend = open_backend(self._structure['format'], package, self.temp_dir, self._parts)
+                print("使用缓存的工作簿结构")
+                return True
+            self._backend = open_backend(self._structure['format'], package, self.temp_dir)
+            self.temp_dir.mkdir(parents=True, exist_ok=True)
+            with contextlib.nullcontext(package) if hasattr(package, 'read') else open(package, 'rb') as f:
+                media = self._structure['media'].items()
+                for name, entry in prefetched(f, media, lambda item: entry_span(item[1])):
+                    target = self.temp_dir / name
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    target.write_bytes(read_media(f, entry))
+        except (OSError, ValueError, struct.error) as e:
+            print(f"工作簿结构缓存不可用，重新解析: {e}")
+            self._structure = None
+            return False
+        print(f"使用缓存的工作簿结构，直接读取 {len(self._structure['media'])} 个媒体文件")
+        return True
+    
+    def _extract_members(self, paths):
+        """从工作簿中补充解压缓存运行时需要的部件（例如新的关键列需要的工作表XML）"""
+        if self._decrypted:
+            # 解密后的部件直接从内存中的压缩包读取
+            return
+        missing = [p.relative_to(self.temp_dir).as_posix() for p in paths if not p.exists()]
+        if not missing:
+            return
+        package = self._open_package()
+        with zipfile.ZipFile(package, 'r') as zip_ref:
+            names = set(zip_ref.namelist())
+            infos = [zip_ref.getinfo(name) for name in missing if name in names]
+            for info in prefetched(package, infos, member_span):
+                zip_ref.extract(info, self.temp_dir)
+    
     def _extract_images_from_media(self):
         """从媒体目录提取图片"""
-        media_dir = self.temp_dir / "xl" / "media"
-        
-        if not media_dir.exists():
+        structure = self._structure
+        if not structure['media']:
             print("未找到媒体目录，可能没有图片")
             return
         
-        print(f"找到媒体目录: {media_dir}")
-        
-        # 获取所有图片文件
-        image_files = list(media_dir.glob("*"))
+        # 获取所有图片文件（按工作簿中的顺序）
+        image_files = [self.temp_dir / name for name in structure['media']]
         print(f"发现 {len(image_files)} 个媒体文件")
         
-        # 获取工作表信息
-        sheet_names = self._get_sheet_names()
+        self._check_cancelled()
+        if self.near_duplicates:
+            self._detect_near_duplicates(image_files)
+        
+        # 建立索引：先解析所有工作表的图片位置，得到总数和总字节数后再开始保存
+        if not structure['sheets']:
+            self._index_workbook(structure)
+        sheet_names = [sheet['name'] for sheet in structure['sheets']]
+        sheets = []
+        for sheet in structure['sheets']:
+            if sheet['positions']:
+                # 按 (行, 列) 顺序保存，报表可以逐行写出，不必缓存整个工作表
+                positions = [{'image_file': self.temp_dir / media, 'row': row, 'col': col, 'anchor': anchor}
+                             for media, row, col, anchor in sorted(sheet['positions'],
+                                                                   key=lambda p: (p[1], p[2]))]
+                sheets.append((sheet['name'], self.temp_dir / sheet['part'], positions))
+        
+        self._media_sizes = {self.temp_dir / name: entry[3] for name, entry in structure['media'].items()}
+        if sheets:
+            placements = [pos['image_file'] for _, _, positions in sheets for pos in positions]
+        else:
+            # 所有工作表都没有解析到图片位置时，退回到按列平均分配（每个工作表分配全部图片）
+            placements = image_files * len(sheet_names)
+        self.progress.update(total=len(placements),
+                             total_bytes=sum(self._media_sizes.get(f, 0) for f in placements))
+        self._report_progress('indexed', force=True)
+        self.progress['stage'] = 'saving'
         
-        # 处理每个工作表
-        for sheet_name in sheet_names:
-            print(f"处理工作表: {sheet_name}")
-            self._process_sheet_images(sheet_name, image_files)
+        if sheets:
+            for sheet_name, sheet_xml, positions in sheets:
+                print(f"处理工作表: {sheet_name}")
+                self._categorize_and_save_images(sheet_name, sheet_xml, positions)
+        else:
+            print("未解析到图片位置信息，使用智能分配")
+            for sheet_name in sheet_names:
+                self._smart_categorize_all_images(sheet_name, self._sheet_columns(sheet_name), image_files)
+        self._check_cancelled()
+        
+        if self._near_dup_clusters:
+            self._write_near_duplicate_report()
+        
+        if self.thumbnail_size or self.normalize_format:
+            self._render_variants()
     
-    def _get_sheet_names(self):
-        """获取工作表名称"""
+    def _detect_near_duplicates(self, image_files):
+        """计算感知哈希并聚类近似重复图片"""
         try:
-            workbook_xml = self.temp_dir / "xl" / "workbook.xml"
-            if not workbook_xml.exists():
-                return ["Sheet1"]  # 默认工作表名
-            
-            tree = ET.parse(workbook_xml)
-            root = tree.getroot()
-            
-            # 解析XML命名空间
-            namespaces = {'w': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
-            
-            sheet_names = []
-            for sheet in root.findall('.//w:sheet', namespaces):
-                name = sheet.get('name')
-                if name:
-                    sheet_names.append(name)
-            
-            return sheet_names if sheet_names else ["Sheet1"]
-            
+            from image_similarity import find_near_duplicates
+            hashes, clusters = find_near_duplicates(
+                image_files, self.near_duplicate_distance, self.hash_method, self.workers,
+                read=self._parts.read_bytes if self._decrypted else None)
+        except ImportError as e:
+            print(f"近似重复检测需要安装 Pillow 和 NumPy，已跳过: {e}")
+            return
         except Exception as e:
-            print(f"获取工作表名称失败: {e}")
-            return ["Sheet1"]
+            print(f"近似重复检测失败: {e}")
+            return
+        
+        self._near_dup_hashes = hashes
+        for members in clusters:
+            # 分辨率最高（其次文件最大）的图片作为代表
+            members = sorted((Path(m) for m in members), key=self._representative_rank, reverse=True)
+            self._near_dup_clusters.append(members)
+            if self.keep_one_duplicate:
+                self._near_dup_skip.update(members[1:])
+        print(f"近似重复检测: {len(hashes)} 张图片，{len(self._near_dup_clusters)} 组近似重复")
     
-    def _process_sheet_images(self, sheet_name, image_files):
-        """处理工作表中的图片"""
+    def _render_variants(self):
+        """
+        生成缩略图/统一格式副本：每个媒体文件只读取、解码一次，
+        结果写到它的每一个输出位置对应的 _thumbnails / _normalized 路径。
+        副本名保留原扩展名（A.png -> A.png.jpg），A.png 与 A.jpeg 的副本不会互相覆盖
+        """
+        outputs = self._outputs_by_media
+        if not outputs:
+            return
         try:
-            # 获取工作表XML文件
-            sheet_index = self._get_sheet_index(sheet_name)
-            sheet_xml = self.temp_dir / "xl" / "worksheets" / f"sheet{sheet_index}.xml"
-            
-            if not sheet_xml.exists():
-                print(f"  工作表XML文件不存在: {sheet_xml}")
-                return
-            
-            # 解析工作表XML，获取图片位置信息
-            image_positions = self._parse_sheet_xml(sheet_xml)
-            
-            # 根据图片位置信息分类存储
-            self._categorize_and_save_images(sheet_name, image_files, image_positions)
-            
-        except Exception as e:
-            print(f"  处理工作表 {sheet_name} 失败: {e}")
+            import PIL  # noqa: F401
+        except ImportError as e:
+            print(f"生成缩略图需要安装 Pillow，已跳过: {e}")
+            return
+        print(f"正在生成缩略图/统一格式: {len(outputs)} 个媒体文件")
+        from image_thumbnails import render_all
+        
+        targets = [('thumbnail', self.output_dir / "_thumbnails"), ('normalized', self.output_dir / "_normalized")]
+        options = {'thumbnail_size': self.thumbnail_size, 'thumbnail_format': self.thumbnail_format,
+                   'normalize_format': self.normalize_format}
+        # 媒体较少时不值得启动进程池
+        workers = 1 if len(outputs) < 16 else self.workers
+        items = ((image_file, self._parts.read_bytes(image_file)) for image_file in outputs)
+        
+        done = failed = 0
+        self._report_progress('variants', force=True)
+        for image_file, variants in render_all(items, workers=workers, **options):
+            self._check_cancelled()
+            if isinstance(variants, Exception):
+                failed += 1
+                print(f"    无法处理图片 {image_file.name}: {variants}")
+                continue
+            for name, root in targets:
+                if name not in variants:
+                    continue
+                data, ext = variants[name]
+                for relative in outputs[image_file]:
+                    target = root / (relative + ext)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    target.write_bytes(data)
+            done += 1
+        print(f"缩略图/统一格式完成: {done} 个成功，{failed} 个失败")
+    
+    def _representative_rank(self, image_file):
+        data = self._parts.read_bytes(image_file)
+        width, height = read_image_size(data)
+        return (width or 0) * (height or 0), len(data)
     
-    def _get_sheet_index(self, sheet_name):
-        """获取工作表索引"""
+    def _write_near_duplicate_report(self):
+        """写出近似重复簇报告 <工作簿名>_near_duplicates.json"""
+        report = []
+        for members in self._near_dup_clusters:
+            report.append({
+                'representative': members[0].relative_to(self.temp_dir).as_posix(),
+                'members': [{
+                    'media': m.relative_to(self.temp_dir).as_posix(),
+                    'hash': f"{self._near_dup_hashes[str(m)]:016x}",
+                    'skipped': m in self._near_dup_skip,
+                    'outputs': self._outputs_by_media.get(m, [])
+                } for m in members]
+            })
+        report_file = self.output_dir / f"{Path(self.excel_file_path).stem}_near_duplicates.json"
         try:
-            workbook_xml = self.temp_dir / "xl" / "workbook.xml"
-            tree = ET.parse(workbook_xml)
-            root = tree.getroot()
-            
-            namespaces = {'w': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
-            
-            for i, sheet in enumerate(root.findall('.//w:sheet', namespaces)):
-                if sheet.get('name') == sheet_name:
-                    return i + 1
-            
-            return 1  # 默认返回第一个工作表
-            
-        except:
-            return 1
+            with open(report_file, 'w', encoding='utf-8') as f:
+                json.dump({'method': self.hash_method, 'max_distance': self.near_duplicate_distance,
+                           'clusters': report}, f, ensure_ascii=False, indent=2)
+            print(f"近似重复报告已写入: {report_file}")
+        except Exception as e:
+            print(f"写入近似重复报告失败: {e}")
+    
+    def _index_workbook(self, structure):
+        """解析所有工作表的图片位置，写入工作簿结构"""
+        for sheet_name in self._backend.sheet_names():
+            self._check_cancelled()
+            print(f"索引工作表: {sheet_name}")
+            sheet_part, positions = self._index_sheet_images(sheet_name)
+            structure['sheets'].append({
+                'name': sheet_name,
+                'part': sheet_part.relative_to(self.temp_dir).as_posix() if sheet_part else None,
+                'positions': [[pos['image_file'].relative_to(self.temp_dir).as_posix(),
+                               pos['row'], pos['col'], pos['anchor']] for pos in positions]
+            })
+        self._structure_dirty = True
     
-    def _parse_sheet_xml(self, sheet_xml):
-        """解析工作表XML，获取图片位置信息"""
+    def _index_sheet_images(self, sheet_name):
+        """
+        解析工作表中的图片位置（同一位置重复引用时只保留一次）
+
+        Returns:
+            (工作表部件路径, 位置列表)，工作表部件不存在时路径为None
+        """
         try:
-            tree = ET.parse(sheet_xml)
-            root = tree.getroot()
+            # 获取工作表部件
+            sheet_part = self._backend.sheet_part(sheet_name)
             
-            # 解析XML命名空间
-            namespaces = {
-                'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-                'xdr': 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing'
-            }
+            if not self._parts.exists(sheet_part) and not self._has_member(sheet_part):
+                print(f"  工作表文件不存在: {sheet_part}")
+                return None, []
             
+            # 由后端解析图片位置信息
             image_positions = []
-            
-            # 查找图片元素
-            for drawing in root.findall('.//xdr:drawing', namespaces):
-                for pic in drawing.findall('.//xdr:pic', namespaces):
-                    # 获取图片引用
-                    blip = pic.find('.//a:blip', namespaces)
-                    if blip is not None:
-                        embed = blip.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed')
-                        if embed:
-                            # 获取图片位置信息
-                            anchor = pic.find('.//xdr:from', namespaces)
-                            if anchor is not None:
-                                col = anchor.find('xdr:col', namespaces)
-                                row = anchor.find('xdr:row', namespaces)
-                                
-                                if col is not None and row is not None:
-                                    col_idx = int(col.text) if col.text else 0
-                                    row_idx = int(row.text) if row.text else 0
-                                    
-                                    image_positions.append({
-                                        'embed_id': embed,
-                                        'col': col_idx,
-                                        'row': row_idx
-                                    })
-            
-            return image_positions
+            seen = set()
+            for pos in self._backend.placements(sheet_name, sheet_part):
+                placement = (pos['image_file'], pos['row'], pos['col'])
+                if placement not in seen:
+                    seen.add(placement)
+                    image_positions.append(pos)
+            return sheet_part, image_positions
             
         except Exception as e:
-            print(f"    解析工作表XML失败: {e}")
-            return []
+            print(f"  处理工作表 {sheet_name} 失败: {e}")
+            self.failures += 1
+            return None, []
+    
+    def _has_member(self, path):
+        """部件是否在压缩包中（远程工作簿的工作表数据在读取关键列时才下载）"""
+        try:
+            return path.relative_to(self.temp_dir).as_posix() in self._members
+        except ValueError:
+            return False
     
-    def _categorize_and_save_images(self, sheet_name, image_files, image_positions):
+    def _categorize_and_save_images(self, sheet_name, sheet_xml, image_positions):
         """根据位置信息分类并保存图片"""
         try:
             # 获取列名信息
-            column_names = self._get_column_names(sheet_name)
+            column_names = self._sheet_columns(sheet_name)
             print(f"    检测到的列名: {column_names}")
             
-            # 记录已处理的图片
-            processed_images = set()
+            # 关键列：为有图片的行建立 行号 -> 关键值 索引
+            key_values = {}
+            key_col = self._resolve_key_column(column_names)
+            if key_col is not None:
+                image_rows = {pos['row'] + 1 for pos in image_positions}
+                key_values = self._sheet_key_index(sheet_name, sheet_xml, key_col, image_rows)
+                print(f"    关键列 {self.key_column}: {len(key_values)} 行有值")
             
             # 处理每个图片位置
             for pos in image_positions:
-                # 获取对应的图片文件
-                image_file = self._get_image_file_by_embed_id(pos['embed_id'])
-                if image_file and image_file not in processed_images:
-                    # 获取列名
-                    col_name = self._get_column_name_by_index(pos['col'], column_names)
-                    
-                    # 保存图片
-                    self._save_image_to_category(image_file, sheet_name, col_name)
-                    processed_images.add(image_file)
-                    print(f"    图片 {image_file.name} -> {col_name}")
-            
-            # 使用更智能的方法处理所有图片
-            self._smart_categorize_all_images(sheet_name, column_names)
+                self._check_cancelled()
+                image_file = pos['image_file']
+                
+                # 获取列名
+                col_name = self._get_column_name_by_index(pos['col'], column_names)
+                
+                # 保存图片
+                key = key_values.get(pos['row'] + 1)
+                output_file = self._save_image_to_category(image_file, sheet_name, col_name, key)
+                self._record_placement(output_file, image_file, sheet_name, col_name,
+                                       pos['row'] + 1, pos['col'] + 1, pos['anchor'], key)
+                print(f"    图片 {image_file.name} -> {col_name}")
+                self._advance_progress(image_file)
             
+        except ExtractionCancelled:
+            raise
         except Exception as e:
             print(f"    分类保存图片失败: {e}")
+            self.failures += 1
+    
+    def _resolve_key_column(self, column_names):
+        """将关键列（表头名称或列字母）解析为从0开始的列索引"""
+        if not self.key_column:
+            return None
+        
+        key = str(self.key_column).strip()
+        # 优先按表头名称匹配，其次按列字母
+        for idx, name in enumerate(column_names):
+            if name.strip() == key:
+                return idx
+        lowered = key.casefold()
+        for idx, name in enumerate(column_names):
+            if name.strip().casefold() == lowered:
+                return idx
+        if re.fullmatch(r'[A-Za-z]{1,3}', key):
+            return column_letter_to_index(key)
+        
+        print(f"    未找到关键列: {key}")
+        return None
+    
+    def _sheet_key_index(self, sheet_name, sheet_xml, key_col, rows):
+        """关键列索引，优先使用工作簿结构中缓存的结果"""
+        cache_key = f"{sheet_name}\t{key_col}"
+        cached = self._structure['keys'].get(cache_key)
+        if cached is not None:
+            return {row: value for row, value in cached}
+        self._extract_members(self._backend.key_parts(sheet_xml))
+        key_values = self._backend.key_index(sheet_name, sheet_xml, key_col, rows)
+        self._structure['keys'][cache_key] = sorted(key_values.items())
+        self._structure_dirty = True
+        return key_values
     
-    def _smart_categorize_all_images(self, sheet_name, column_names):
+    def _smart_categorize_all_images(self, sheet_name, column_names, image_files):
         """智能分类所有图片"""
         try:
-            # 获取所有图片文件
-            media_dir = self.temp_dir / "xl" / "media"
-            if not media_dir.exists():
-                return
-                
-            image_files = list(media_dir.glob("*"))
             if not image_files:
                 return
                 
@@ -247,8 +668,11 @@ class SimpleExcelImageExtractor:
                     # 为这一列分配图片
                     for i in range(col_image_count):
                         if current_idx < len(image_files):
+                            self._check_cancelled()
                             image_file = image_files[current_idx]
-                            self._save_image_to_category(image_file, sheet_name, col_name)
+                            output_file = self._save_image_to_category(image_file, sheet_name, col_name)
+                            self._record_placement(output_file, image_file, sheet_name, col_name)
+                            self._advance_progress(image_file)
                             current_idx += 1
                             
                 print(f"    智能分配完成，共处理 {current_idx} 个图片")
@@ -256,33 +680,24 @@ class SimpleExcelImageExtractor:
                 # 备用方案：全部放到第一列或"其他"
                 col_name = column_names[0] if column_names else "其他"
                 for image_file in image_files:
-                    self._save_image_to_category(image_file, sheet_name, col_name)
+                    self._check_cancelled()
+                    output_file = self._save_image_to_category(image_file, sheet_name, col_name)
+                    self._record_placement(output_file, image_file, sheet_name, col_name)
+                    self._advance_progress(image_file)
                     
+        except ExtractionCancelled:
+            raise
         except Exception as e:
             print(f"    智能分类失败: {e}")
+            self.failures += 1
     
-    def _get_column_names(self, sheet_name):
-        """获取列名信息"""
-        try:
-            # 尝试使用openpyxl读取第一行作为列名
-            from openpyxl import load_workbook
-            wb = load_workbook(self.excel_file_path, data_only=True)
-            if sheet_name in wb.sheetnames:
-                ws = wb[sheet_name]
-                column_names = []
-                for cell in ws[1]:  # 读取第一行
-                    if cell.value:
-                        column_names.append(str(cell.value))
-                    else:
-                        column_names.append(f"列{len(column_names)+1}")
-                wb.close()
-                return column_names
-            wb.close()
-        except Exception as e:
-            print(f"    读取列名失败: {e}")
-        
-        # 备用方案：使用默认列名
-        return [f"列{i+1}" for i in range(26)]
+    def _sheet_columns(self, sheet_name):
+        """工作表的列名，优先使用工作簿结构中缓存的结果"""
+        column_names = self._structure['columns'].get(sheet_name)
+        if column_names is None:
+            column_names = self._structure['columns'][sheet_name] = self._backend.column_names(sheet_name)
+            self._structure_dirty = True
+        return column_names
     
     def _get_column_name_by_index(self, col_idx, column_names):
         """根据列索引获取列名"""
@@ -291,55 +706,212 @@ class SimpleExcelImageExtractor:
         else:
             return f"列{col_idx + 1}"
     
-    def _get_image_file_by_embed_id(self, embed_id):
-        """根据嵌入ID获取图片文件"""
-        try:
-            # 解析关系文件来找到对应的图片
-            rels_file = self.temp_dir / "xl" / "worksheets" / "_rels" / f"sheet{self._get_sheet_index()}.xml.rels"
-            if rels_file.exists():
-                tree = ET.parse(rels_file)
-                root = tree.getroot()
-                
-                # 查找对应的关系
-                for rel in root.findall('.//{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'):
-                    if rel.get('Id') == embed_id:
-                        target = rel.get('Target')
-                        if target:
-                            # 构建完整的图片路径
-                            image_path = self.temp_dir / "xl" / "worksheets" / target.replace('../', '')
-                            if image_path.exists():
-                                return image_path
-            
-            # 备用方案：返回media目录中的图片文件
-            media_dir = self.temp_dir / "xl" / "media"
-            if media_dir.exists():
-                image_files = list(media_dir.glob("*"))
-                if image_files:
-                    return image_files[0]
-            return None
-        except Exception as e:
-            print(f"    查找图片文件失败: {e}")
-            return None
+    def _safe_filename(self, value):
+        """把单元格值转换为可用作文件名的字符串，无效时返回None"""
+        name = _UNSAFE_FILENAME_CHARS.sub('_', str(value)).strip().strip('.')
+        return name[:100] or None
     
+    def _allocate_output_file(self, col_dir, stem, file_ext):
+        """
+        为图片分配不重名的输出路径
+        
+        stem 为关键值时命名为 <key>.ext、<key>_2.ext ...；
+        否则沿用 image_<n>.ext。每个目录只扫描一次已有文件，保证总体线性时间。
+        """
+        used = self._used_names.get(col_dir)
+        if used is None:
+            used = {p.name.lower() for p in col_dir.iterdir()}
+            self._used_names[col_dir] = used
+        
+        counter_key = (col_dir, stem)
+        if stem is None:
+            n = self._name_counters.get(counter_key, len(used) + 1)
+            name = f"image_{n}{file_ext}"
+        else:
+            n = self._name_counters.get(counter_key, 1)
+            name = f"{stem}{file_ext}" if n == 1 else f"{stem}_{n}{file_ext}"
+        
+        while name.lower() in used:
+            n += 1
+            name = f"image_{n}{file_ext}" if stem is None else f"{stem}_{n}{file_ext}"
+        
+        self._name_counters[counter_key] = n + 1
+        used.add(name.lower())
+        return col_dir / name
 
-    def _save_image_to_category(self, image_file, sheet_name, col_name):
-        """保存图片到分类目录"""
+    def _save_image_to_category(self, image_file, sheet_name, col_name, key=None):
+        """保存图片到分类目录，key 为关键列的值（可选），返回输出路径，失败时返回None"""
+        if image_file in self._near_dup_skip:
+            print(f"    跳过近似重复图片: {image_file.name}")
+            return None
+        if not self.write_files:
+            # 只写入数据集：图片字节由 _record_placement 写入，不复制文件
+            return None
+        
         try:
-            if image_file and image_file.exists():
+            if image_file and self._parts.exists(image_file):
                 # 创建分类目录
                 col_dir = self.output_dir / sheet_name / col_name
                 col_dir.mkdir(parents=True, exist_ok=True)
                 
                 # 生成输出文件名
                 file_ext = image_file.suffix
-                output_file = col_dir / f"image_{len(list(col_dir.glob('*'))) + 1}{file_ext}"
+                stem = self._safe_filename(key) if key is not None else None
+                output_file = self._allocate_output_file(col_dir, stem, file_ext)
                 
                 # 复制文件
-                shutil.copy2(image_file, output_file)
+                self._parts.copy(image_file, output_file)
                 print(f"    已保存图片到 {col_name}: {output_file.name}")
+                self.saved_count += 1
+                self._outputs_by_media.setdefault(image_file, []).append(
+                    output_file.relative_to(self.output_dir).as_posix())
+                return output_file
                 
         except Exception as e:
             print(f"    保存图片失败: {e}")
+            self.failures += 1
+        return None
+    
+    def _record_placement(self, output_file, image_file, sheet_name, col_name,
+                          row=None, col=None, anchor=None, key=None):
+        """向报表、清单、数据集和图片目录追加一条记录（行列从1开始，智能分配的图片没有位置信息）"""
+        if output_file is None and (self.write_files or image_file in self._near_dup_skip
+                                    or not self._parts.exists(image_file)):
+            return
+        output = output_file.relative_to(self.output_dir).as_posix() if output_file is not None else None
+        if self._report_writer is not None:
+            self._report_writer.add(sheet_name, row, key, col_name, output)
+        if self._manifest_writer is None and self._catalog is None and self._dataset_writer is None:
+            return
+        
+        data = None
+        info = self._media_info.get(image_file)
+        if info is None:
+            data = self._parts.read_bytes(image_file)
+            width, height = read_image_size(data)
+            info = (len(data), hashlib.sha256(data).hexdigest(), width, height)
+            self._media_info[image_file] = info
+        size, sha256, width, height = info
+        
+        if self._dataset_writer is not None:
+            if data is None:
+                data = self._parts.read_bytes(image_file)
+            self._dataset_writer.add({
+                'workbook': str(self.excel_file_path),
+                'sheet': sheet_name,
+                'header': col_name,
+                'row': row,
+                'col': col,
+                'key': key,
+                'content_type': content_type(data, image_file.name),
+                'sha256': sha256
+            }, data)
+            if output_file is None:
+                print(f"    已写入数据集 {col_name}: {image_file.name}")
+                self.saved_count += 1
+        if self._manifest_writer is None and self._catalog is None:
+            return
+        
+        record = {
+            'workbook': str(self.excel_file_path),
+            'sheet': sheet_name,
+            'header': col_name,
+            'row': row,
+            'col': col,
+            'anchor': anchor,
+            'media': image_file.relative_to(self.temp_dir).as_posix(),
+            'output': output,
+            'key': key,
+            'size': size,
+            'sha256': sha256,
+            'width': width,
+            'height': height
+        }
+        if self._manifest_writer is not None:
+            self._manifest_writer.add(record)
+        if self._catalog is not None:
+            self._catalog.add(record)
+    
+    def _check_cancelled(self):
+        """取消令牌被设置时抛出 ExtractionCancelled（只在两张图片之间调用）"""
+        if self.cancel_token is not None and self.cancel_token.is_set():
+            raise ExtractionCancelled("提取已取消")
+    
+    def _advance_progress(self, image_file):
+        """记录处理完一个图片位置"""
+        progress = self.progress
+        progress['done'] += 1
+        progress['done_bytes'] += self._media_sizes.get(image_file, 0)
+        if self.progress_callback is not None:
+            self._report_progress()
+    
+    def _report_progress(self, stage=None, force=False):
+        """调用进度回调；未强制时按 progress_interval 限频"""
+        if stage is not None:
+            self.progress['stage'] = stage
+        if self.progress_callback is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        try:
+            self.progress_callback(dict(self.progress))
+        except Exception as e:
+            print(f"进度回调失败: {e}")
+    
+    def _close_catalog(self, commit):
+        """提交（或放弃）本工作簿在图片目录中的更新"""
+        if self._catalog is None:
+            return
+        try:
+            if commit:
+                count = self._catalog.commit_workbook()
+                print(f"图片目录已更新: {self._catalog.db_path}（{count} 条）")
+            elif self.failures:
+                print(f"提取过程中有 {self.failures} 处错误，图片目录保留上一次的记录")
+            self._catalog.close()
+        except Exception as e:
+            print(f"更新图片目录失败: {e}")
+        finally:
+            self._catalog = None
+    
+    def _close_report(self):
+        """写出报表的最后一行并保存"""
+        if self._report_writer is None:
+            return
+        try:
+            self._report_writer.close()
+            print(f"报表已写入: {self._report_writer.path}（{self._report_writer.rows} 行）")
+        except Exception as e:
+            print(f"写入报表失败: {e}")
+        finally:
+            self._report_writer = None
+    
+    def _close_dataset(self):
+        """写出数据集的剩余行组并完成分片"""
+        if self._dataset_writer is None:
+            return
+        try:
+            self._dataset_writer.close()
+            print(f"数据集已写入: {self._dataset_writer.directory}"
+                  f"（{self._dataset_writer.count} 条，{len(self._dataset_writer.shards)} 个分片）")
+        except Exception as e:
+            print(f"写入数据集失败: {e}")
+        finally:
+            self._dataset_writer = None
+    
+    def _close_manifest(self):
+        """写出清单的剩余批次"""
+        if self._manifest_writer is None:
+            return
+        try:
+            self._manifest_writer.close()
+            print(f"清单已写入: {self._manifest_writer.jsonl_path}（{self._manifest_writer.count} 条）")
+        except Exception as e:
+            print(f"写入清单失败: {e}")
+        finally:
+            self._manifest_writer = None
     
 
     
@@ -352,22 +924,115 @@ class SimpleExcelImageExtractor:
         except Exception as e:
             print(f"清理临时文件失败: {e}")
 
-def main():
+def extract_workbook(excel_file, output_dir, quiet=True, **options):
+    """
+    提取一个工作簿（供批量、监控等任务在子进程中调用）
+    
+    Returns:
+        (保存的图片数, 错误信息或None)
+    """
+    extractor = SimpleExcelImageExtractor(excel_file, output_dir, **options)
+    if quiet:
+        with contextlib.redirect_stdout(io.StringIO()):
+            extractor.extract_images()
+    else:
+        extractor.extract_images()
+    return extractor.saved_count, str(extractor.error) if extractor.error else None
+
+def main(argv=None):
     """主函数"""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # query 子命令：查询跨工作簿图片目录
+    if argv and argv[0] == "query":
+        from image_catalog import query_main
+        return query_main(argv[1:])
+    # watch 子命令：监控文件夹
+    if argv and argv[0] == "watch":
+        from watch_folder import watch_main
+        return watch_main(argv[1:])
+    # batch 子命令：通过共享任务表进行多机批量提取
+    if argv and argv[0] == "batch":
+        from batch_lease import batch_main
+        return batch_main(argv[1:])
+    
+    from image_catalog import DEFAULT_CATALOG
+    from image_dataset import DATASET_COMPRESSIONS
+    from image_manifest import MANIFEST_FORMATS
+    from image_report import REPORT_FORMATS
+    from image_similarity import HASH_METHODS
+    from image_thumbnails import IMAGE_FORMATS
+    
+    parser = argparse.ArgumentParser(description="从Excel文件中提取图片并按工作表/列名分类保存")
+    parser.add_argument("excel_file", nargs="?", default="副本夹克试标找图.xlsx", help="Excel文件路径")
+    parser.add_argument("-o", "--output-dir", default="extracted_images", help="输出目录")
+    parser.add_argument("-k", "--key-column", help="关键列（表头名称或列字母），图片以该列的值命名")
+    parser.add_argument("--manifest", action="store_true", help="写出图片清单（JSONL）")
+    parser.add_argument("--manifest-format", action="append", default=[], choices=MANIFEST_FORMATS,
+                        help="清单的额外格式，可重复指定")
+    parser.add_argument("--near-duplicates", action="store_true", help="检测近似重复图片")
+    parser.add_argument("--near-distance", type=int, default=6, help="近似重复的汉明距离阈值（默认6）")
+    parser.add_argument("--hash-method", choices=HASH_METHODS, default="dhash", help="感知哈希算法")
+    parser.add_argument("--keep-one", action="store_true", help="每组近似重复图片只保存一张代表图")
+    parser.add_argument("-j", "--workers", type=int, help="并行进程数，默认使用全部CPU")
+    parser.add_argument("--thumbnail-size", type=int, help="生成缩略图（最长边像素，如 256）")
+    parser.add_argument("--thumbnail-format", choices=("jpeg", "webp"), default="jpeg", help="缩略图格式")
+    parser.add_argument("--normalize", choices=sorted(IMAGE_FORMATS), help="把所有图片统一转换为该格式")
+    parser.add_argument("--catalog", nargs="?", const=DEFAULT_CATALOG,
+                        help=f"把结果增量写入跨工作簿图片目录（默认 {DEFAULT_CATALOG}），"
+                             "可用 query 子命令查询")
+    parser.add_argument("--structure-cache", metavar="DIR",
+                        help="工作簿结构缓存目录，再次提取同一工作簿时跳过解压和XML解析")
+    parser.add_argument("--report", choices=REPORT_FORMATS,
+                        help="在输出目录写出图片报表，每个原始行一行，链接到该行的图片")
+    parser.add_argument("--password", nargs="?", const="",
+                        help="加密工作簿的打开密码；只写 --password 时在终端中输入")
+    parser.add_argument("--dataset", metavar="DIR",
+                        help="把图片连同位置信息写入 Parquet 数据集目录（需要 pyarrow），供机器学习流程读取")
+    parser.add_argument("--dataset-rows-per-group", type=int, default=256, help="数据集每个行组的行数（默认256）")
+    parser.add_argument("--dataset-shard-mb", type=int, default=512, help="数据集单个分片的大小（MB，默认512）")
+    parser.add_argument("--dataset-compression", choices=DATASET_COMPRESSIONS, default="none",
+                        help="数据集的压缩方式（默认不压缩）")
+    parser.add_argument("--no-files", action="store_true", help="不写出单独的图片文件，只写入数据集")
+    args = parser.parse_args(argv)
+    if args.no_files and not args.dataset:
+        parser.error("--no-files 需要同时指定 --dataset")
+    
+    password = args.password
+    if password == "":
+        import getpass
+        password = getpass.getpass("工作簿密码: ")
+    
     # Excel文件路径
-    excel_file = "副本夹克试标找图.xlsx"
+    excel_file = args.excel_file
     
-    # 检查文件是否存在
-    if not os.path.exists(excel_file):
+    # 检查文件是否存在（远程工作簿在提取时检查）
+    if not is_remote(excel_file) and not os.path.exists(excel_file):
         print(f"错误: 找不到文件 {excel_file}")
-        return
+        return 1
     
     # 创建提取器并执行提取
-    extractor = SimpleExcelImageExtractor(excel_file)
+    extractor = SimpleExcelImageExtractor(excel_file, args.output_dir, key_column=args.key_column,
+                                          manifest=args.manifest, manifest_formats=args.manifest_format,
+                                          catalog=args.catalog,
+                                          near_duplicates=args.near_duplicates,
+                                          near_duplicate_distance=args.near_distance,
+                                          hash_method=args.hash_method, keep_one_duplicate=args.keep_one,
+                                          workers=args.workers, thumbnail_size=args.thumbnail_size,
+                                          thumbnail_format=args.thumbnail_format,
+                                          normalize_format=args.normalize,
+                                          structure_cache=args.structure_cache, password=password,
+                                          report=args.report, dataset=args.dataset,
+                                          dataset_rows_per_group=args.dataset_rows_per_group,
+                                          dataset_shard_mb=args.dataset_shard_mb,
+                                          dataset_compression=args.dataset_compression,
+                                          write_files=not args.no_files)
     extractor.extract_images()
     
     print(f"\n图片已保存到: {extractor.output_dir.absolute()}")
     print("目录结构: 输出目录/工作表名/列名/图片文件")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    import multiprocessing
+    # 打包后的程序使用进程池时需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动性能基准
+在全新的解释器中测量导入界面模块、显示第一个窗口所需的时间，
+并检查导入时没有加载重型依赖、没有文件系统副作用。测试会按这里的预算执行检查
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# 预算（秒），在较慢的 CI 机器上也应能满足
+IMPORT_BUDGET = 0.5
+FIRST_WINDOW_BUDGET = 1.5
+# 导入界面模块时不应被加载的重型模块
+HEAVY_MODULES = ('openpyxl', 'PIL', 'numpy', 'pyarrow', 'pandas', 'sqlite3', 'concurrent.futures.process')
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import excel_image_extractor_gui
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'heavy': [m for m in %r if m in sys.modules]}))
+"""
+
+_WINDOW_PROBE = """
+import json, time
+start = time.perf_counter()
+import tkinter as tk
+import excel_image_extractor_gui
+try:
+    root = tk.Tk()
+except tk.TclError as e:
+    print(json.dumps({'error': str(e)}))
+    raise SystemExit(0)
+excel_image_extractor_gui.ExcelImageExtractorGUI(root)
+root.update()
+elapsed = time.perf_counter() - start
+root.destroy()
+print(json.dumps({'seconds': elapsed}))
+"""
+
+
+def _run_probe(code, home):
+    """在独立进程中运行探测代码，HOME 指向临时目录以便检查副作用"""
+    env = dict(os.environ, HOME=home, USERPROFILE=home, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR, env=env,
+                            capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_import():
+    """
+    测量导入界面模块的耗时
+
+    Returns:
+        dict: seconds（耗时）、heavy（已加载的重型模块）、created（HOME 下新建的文件）
+    """
+    with tempfile.TemporaryDirectory() as home:
+        result = _run_probe(_IMPORT_PROBE % (HEAVY_MODULES,), home)
+        result['created'] = sorted(os.listdir(home))
+    return result
+
+
+def measure_first_window():
+    """测量从启动到第一个窗口完成绘制的耗时，没有图形环境时返回 {'error': ...}"""
+    with tempfile.TemporaryDirectory() as home:
+        return _run_probe(_WINDOW_PROBE, home)
+
+
+def main():
+    failed = False
+    result = measure_import()
+    print(f"导入界面模块: {result['seconds'] * 1000:.1f} ms（预算 {IMPORT_BUDGET * 1000:.0f} ms）")
+    if result['heavy']:
+        print(f"  导入时加载了重型模块: {', '.join(result['heavy'])}")
+    if result['created']:
+        print(f"  导入时创建了文件: {', '.join(result['created'])}")
+    failed |= result['seconds'] > IMPORT_BUDGET or bool(result['heavy']) or bool(result['created'])
+
+    result = measure_first_window()
+    if 'error' in result:
+        print(f"第一个窗口: 跳过（{result['error']}）")
+    else:
+        print(f"第一个窗口: {result['seconds'] * 1000:.1f} ms（预算 {FIRST_WINDOW_BUDGET * 1000:.0f} ms）")
+        failed |= result['seconds'] > FIRST_WINDOW_BUDGET
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+测试用的最小 .xlsx/.xlsb/.ods 构造工具
+直接写入各个部件，不依赖 openpyxl/Pillow（加密工作簿需要 cryptography）
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
+
+
+def make_png(width=2, height=2, color=(255, 0, 0)):
+    """生成一张纯色 PNG 图片的字节"""
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    raw = b''.join(b'\x00' + bytes(color) * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw))
+            + chunk(b'IEND', b''))
+
+
+def _col_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+
+def _write_drawing(zf, sheet_rels, i, images):
+    """写入工作表的关系文件、绘图部件及其关系文件（.xlsx 和 .xlsb 相同）"""
+    zf.writestr(sheet_rels,
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                f'<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/drawing" Target="../drawings/drawing{i}.xml"/>'
+                '</Relationships>')
+    anchors = []
+    drawing_rels = []
+    for n, (row, col, media_name) in enumerate(images, 1):
+        anchors.append(
+            '<xdr:oneCellAnchor>'
+            f'<xdr:from><xdr:col>{col}</xdr:col><xdr:colOff>0</xdr:colOff><xdr:row>{row}</xdr:row><xdr:rowOff>0</xdr:rowOff></xdr:from>'
+            '<xdr:ext cx="100" cy="100"/>'
+            f'<xdr:pic><xdr:nvPicPr><xdr:cNvPr id="{n}" name="Picture {n}"/><xdr:cNvPicPr/></xdr:nvPicPr>'
+            f'<xdr:blipFill><a:blip r:embed="rId{n}"/></xdr:blipFill><xdr:spPr/></xdr:pic>'
+            '<xdr:clientData/></xdr:oneCellAnchor>')
+        drawing_rels.append(f'<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" Target="../media/{media_name}"/>')
+    zf.writestr(f'xl/drawings/drawing{i}.xml',
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<xdr:wsDr xmlns:xdr="http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing" '
+                'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+                'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                + ''.join(anchors) + '</xdr:wsDr>')
+    zf.writestr(f'xl/drawings/_rels/drawing{i}.xml.rels',
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                + ''.join(drawing_rels) + '</Relationships>')
+
+
+def build_workbook(path, sheets):
+    """
+    写入一个最小的 .xlsx 文件
+
+    sheets: [{'name': 工作表名, 'rows': [[单元格值, ...], ...],
+              'images': [(行, 列, 媒体文件名), ...],
+              'media': {媒体文件名: 字节}}]，行列均从0开始
+    """
+    media = {}
+    for sheet in sheets:
+        media.update(sheet.get('media', {}))
+
+    shared = []
+    shared_index = {}
+
+    def sst(value):
+        if value not in shared_index:
+            shared_index[value] = len(shared)
+            shared.append(value)
+        return shared_index[value]
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        overrides = [
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>',
+            '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>',
+        ]
+        sheet_entries = []
+        workbook_rels = []
+        for i, sheet in enumerate(sheets, 1):
+            overrides.append(f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>')
+            sheet_entries.append(f'<sheet name="{escape(sheet["name"])}" sheetId="{i}" r:id="rId{i}"/>')
+            workbook_rels.append(f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet{i}.xml"/>')
+
+            rows_xml = []
+            for r, row in enumerate(sheet.get('rows', []), 1):
+                cells = []
+                for c, value in enumerate(row):
+                    if value is None:
+                        continue
+                    ref = f'{_col_letter(c)}{r}'
+                    if isinstance(value, (int, float)):
+                        cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+                    else:
+                        cells.append(f'<c r="{ref}" t="s"><v>{sst(str(value))}</v></c>')
+                rows_xml.append(f'<row r="{r}">{"".join(cells)}</row>')
+
+            drawing_xml = ''
+            images = sheet.get('images', [])
+            if images:
+                overrides.append(f'<Override PartName="/xl/drawings/drawing{i}.xml" ContentType="application/vnd.openxmlformats-officedocument.drawing+xml"/>')
+                drawing_xml = '<drawing r:id="rId1"/>'
+                _write_drawing(zf, f'xl/worksheets/_rels/sheet{i}.xml.rels', i, images)
+
+            zf.writestr(f'xl/worksheets/sheet{i}.xml',
+                        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                        f'<sheetData>{"".join(rows_xml)}</sheetData>{drawing_xml}</worksheet>')
+
+        for name, data in media.items():
+            zf.writestr(f'xl/media/{name}', data)
+
+        zf.writestr('[Content_Types].xml',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                    '<Default Extension="xml" ContentType="application/xml"/>'
+                    '<Default Extension="png" ContentType="image/png"/>'
+                    '<Default Extension="jpeg" ContentType="image/jpeg"/>'
+                    + ''.join(overrides) + '</Types>')
+        zf.writestr('_rels/.rels',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+                    '</Relationships>')
+        zf.writestr('xl/workbook.xml',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                    f'<sheets>{"".join(sheet_entries)}</sheets></workbook>')
+        zf.writestr('xl/_rels/workbook.xml.rels',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    + ''.join(workbook_rels) + '</Relationships>')
+        zf.writestr('xl/sharedStrings.xml',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="{len(shared)}" uniqueCount="{len(shared)}">'
+                    + ''.join(f'<si><t>{escape(v)}</t></si>' for v in shared) + '</sst>')
+
+
+def _biff12_record(rec_type, data=b''):
+    """BIFF12 记录：变长的类型和长度 + 数据"""
+    header = bytearray()
+    for value in (rec_type, len(data)):
+        while True:
+            byte = value & 0x7F
+            value >>= 7
+            header.append(byte | (0x80 if value else 0))
+            if not value:
+                break
+    return bytes(header) + data
+
+
+def _wide(text):
+    return struct.pack('<I', len(text)) + text.encode('utf-16-le')
+
+
+def build_xlsb(path, sheets):
+    """写入一个最小的 .xlsb 文件，sheets 的格式与 build_workbook 相同（整数写为 RK，小数写为双精度）"""
+    shared = []
+    shared_index = {}
+
+    def sst(value):
+        if value not in shared_index:
+            shared_index[value] = len(shared)
+            shared.append(value)
+        return shared_index[value]
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        bundles = []
+        workbook_rels = []
+        for i, sheet in enumerate(sheets, 1):
+            bundles.append(_biff12_record(156, struct.pack('<II', 0, i) + _wide(f'rId{i}') + _wide(sheet['name'])))
+            workbook_rels.append(f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet{i}.bin"/>')
+
+            rows = sheet.get('rows', [])
+            last_col = max((len(row) for row in rows), default=1) - 1
+            records = [_biff12_record(129), _biff12_record(148, struct.pack('<4i', 0, max(len(rows) - 1, 0), 0, last_col)),
+                       _biff12_record(145)]
+            for r, row in enumerate(rows):
+                records.append(_biff12_record(0, struct.pack('<IIHBB', r, 0, 300, 0, 0) + b'\x00' * 5))
+                for c, value in enumerate(row):
+                    cell = struct.pack('<II', c, 0)
+                    if value is None:
+                        continue
+                    if isinstance(value, int):
+                        records.append(_biff12_record(2, cell + struct.pack('<I', (value << 2 | 2) & 0xFFFFFFFF)))
+                    elif isinstance(value, float):
+                        records.append(_biff12_record(5, cell + struct.pack('<d', value)))
+                    else:
+                        records.append(_biff12_record(7, cell + struct.pack('<I', sst(str(value)))))
+            records += [_biff12_record(146), _biff12_record(130)]
+            zf.writestr(f'xl/worksheets/sheet{i}.bin', b''.join(records))
+
+            images = sheet.get('images', [])
+            if images:
+                _write_drawing(zf, f'xl/worksheets/_rels/sheet{i}.bin.rels', i, images)
+            for name, data in sheet.get('media', {}).items():
+                zf.writestr(f'xl/media/{name}', data)
+
+        zf.writestr('xl/workbook.bin', b''.join([_biff12_record(131), _biff12_record(143)] + bundles
+                                                + [_biff12_record(144), _biff12_record(132)]))
+        zf.writestr('xl/_rels/workbook.bin.rels',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    + ''.join(workbook_rels) + '</Relationships>')
+        zf.writestr('xl/sharedStrings.bin', b''.join(
+            [_biff12_record(159, struct.pack('<ii', len(shared), len(shared)))]
+            + [_biff12_record(19, b'\x00' + _wide(v)) for v in shared] + [_biff12_record(160)]))
+
+
+def build_ods(path, sheets):
+    """
+    写入一个最小的 .ods 文件，sheets 的格式与 build_workbook 相同；
+    图片写为锚定在单元格上的 draw:frame，媒体放在 Pictures/ 下
+    """
+    tables = []
+    media = {}
+    for sheet in sheets:
+        media.update(sheet.get('media', {}))
+        rows = sheet.get('rows', [])
+        frames = {}
+        for row, col, media_name in sheet.get('images', []):
+            frames.setdefault((row, col), []).append(
+                f'<draw:frame table:end-cell-address="{escape(sheet["name"])}.A1" svg:width="1cm" svg:height="1cm">'
+                f'<draw:image xlink:href="Pictures/{media_name}" xlink:type="simple"/></draw:frame>')
+        row_count = max([len(rows)] + [r + 1 for r, _ in frames])
+        rows_xml = []
+        for r in range(row_count):
+            values = rows[r] if r < len(rows) else []
+            col_count = max([len(values)] + [c + 1 for rr, c in frames if rr == r])
+            cells = []
+            for c in range(col_count):
+                value = values[c] if c < len(values) else None
+                attrs = ''
+                content = ''.join(frames.get((r, c), []))
+                if isinstance(value, (int, float)):
+                    attrs = f' office:value-type="float" office:value="{value}"'
+                    content += f'<text:p>{value}</text:p>'
+                elif value is not None:
+                    attrs = ' office:value-type="string"'
+                    content += f'<text:p>{escape(str(value))}</text:p>'
+                cells.append(f'<table:table-cell{attrs}>{content}</table:table-cell>')
+            cells.append('<table:table-cell table:number-columns-repeated="1000"/>')
+            rows_xml.append(f'<table:table-row>{"".join(cells)}</table:table-row>')
+        rows_xml.append('<table:table-row table:number-rows-repeated="1048000">'
+                        '<table:table-cell table:number-columns-repeated="1024"/></table:table-row>')
+        tables.append(f'<table:table table:name="{escape(sheet["name"])}">'
+                      '<table:table-column table:number-columns-repeated="1024"/>'
+                      + ''.join(rows_xml) + '</table:table>')
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(zipfile.ZipInfo('mimetype'), 'application/vnd.oasis.opendocument.spreadsheet')
+        zf.writestr('content.xml',
+                    '<?xml version="1.0" encoding="UTF-8"?>'
+                    '<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+                    'xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0" '
+                    'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+                    'xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0" '
+                    'xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0" '
+                    'xmlns:xlink="http://www.w3.org/1999/xlink" office:version="1.2">'
+                    '<office:body><office:spreadsheet>' + ''.join(tables)
+                    + '</office:spreadsheet></office:body></office:document-content>')
+        for name, data in media.items():
+            zf.writestr(f'Pictures/{name}', data)
+        zf.writestr('META-INF/manifest.xml',
+                    '<?xml version="1.0" encoding="UTF-8"?>'
+                    '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">'
+                    '<manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.spreadsheet"/>'
+                    '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+                    '</manifest:manifest>')
+
+
+def build_compound_file(path, streams):
+    """
+    写入最小的 OLE2 复合文档（版本 3，512 字节扇区），streams 为 {流名称: 字节}；
+    小于 4096 字节的流放在迷你流中
+    """
+    end, free, fat_sector = 0xFFFFFFFE, 0xFFFFFFFF, 0xFFFFFFFD
+    names = list(streams)
+    mini_data = bytearray()
+    mini_fat = []
+    starts = {}
+    for name in names:
+        data = streams[name]
+        if len(data) < 4096:
+            count = -(-len(data) // 64)
+            starts[name] = len(mini_fat)
+            mini_fat.extend(range(len(mini_fat) + 1, len(mini_fat) + count))
+            mini_fat.append(end)
+            mini_data += data.ljust(count * 64, b'\x00')
+
+    def sectors(size):
+        return -(-size // 512)
+
+    big = [name for name in names if name not in starts]
+    body = (sectors((len(names) + 1) * 128) + sectors(len(mini_fat) * 4) + sectors(len(mini_data))
+            + sum(sectors(len(streams[name])) for name in big))
+    fat_count = 1
+    while fat_count * 128 < body + fat_count:
+        fat_count += 1
+    fat = [fat_sector] * fat_count
+
+    def chain(size):
+        count = sectors(size)
+        if not count:
+            return end
+        start = len(fat)
+        fat.extend(range(start + 1, start + count))
+        fat.append(end)
+        return start
+
+    dir_start = chain((len(names) + 1) * 128)
+    mini_fat_start = chain(len(mini_fat) * 4)
+    mini_stream_start = chain(len(mini_data))
+    for name in big:
+        starts[name] = chain(len(streams[name]))
+
+    def entry(name, kind, right, child, start, size):
+        encoded = name.encode('utf-16-le') + b'\x00\x00'
+        return struct.pack('<64sHBBIII16sIQQIQ', encoded, len(encoded), kind, 1, free, right, child,
+                           b'\x00' * 16, 0, 0, 0, start, size)
+
+    directory = entry('Root Entry', 5, free, 1 if names else free, mini_stream_start, len(mini_data))
+    for i, name in enumerate(names, 1):
+        directory += entry(name, 2, i + 1 if i < len(names) else free, free, starts[name], len(streams[name]))
+
+    def padded(data):
+        return bytes(data).ljust(sectors(len(data)) * 512, b'\x00')
+
+    difat = list(range(fat_count)) + [free] * (109 - fat_count)
+    header = struct.pack('<8s16sHHHHH6sIIIIIIIII109I', b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', b'\x00' * 16,
+                         0x3E, 3, 0xFFFE, 9, 6, b'\x00' * 6, 0, fat_count, dir_start, 0, 4096,
+                         mini_fat_start, sectors(len(mini_fat) * 4), end, 0, *difat)
+    fat += [free] * (fat_count * 128 - len(fat))
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(struct.pack(f'<{len(fat)}I', *fat))
+        f.write(padded(directory))
+        f.write(padded(struct.pack(f'<{len(mini_fat)}I', *mini_fat)))
+        f.write(padded(mini_data))
+        for name in big:
+            f.write(padded(streams[name]))
+
+
+def build_encrypted_workbook(path, package, password, spin_count=1000):
+    """用 Agile 加密（AES-256、SHA-512）把工作簿 package（字节）写为加密工作簿，需要 cryptography"""
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    def encrypt(key, iv, data):
+        encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+        return encryptor.update(data + b'\x00' * (-len(data) % 16)) + encryptor.finalize()
+
+    def sha512(*parts):
+        return hashlib.sha512(b''.join(parts)).digest()
+
+    def b64(data):
+        return base64.b64encode(data).decode('ascii')
+
+    key, key_salt, password_salt = os.urandom(32), os.urandom(16), os.urandom(16)
+    encrypted = struct.pack('<Q', len(package))
+    for segment, offset in enumerate(range(0, len(package), 4096)):
+        encrypted += encrypt(key, sha512(key_salt, struct.pack('<I', segment))[:16], package[offset:offset + 4096])
+
+    hmac_key = os.urandom(64)
+    hmac_value = hmac.new(hmac_key, encrypted, 'sha512').digest()
+    encrypted_hmac_key = encrypt(key, sha512(key_salt, bytes.fromhex('5fb2ad010cb9e1f6'))[:16], hmac_key)
+    encrypted_hmac_value = encrypt(key, sha512(key_salt, bytes.fromhex('a0677f02b22c8433'))[:16], hmac_value)
+
+    digest = sha512(password_salt, password.encode('utf-16-le'))
+    for i in range(spin_count):
+        digest = sha512(struct.pack('<I', i), digest)
+
+    def encrypt_with_password(block_key, data):
+        return encrypt(sha512(digest, bytes.fromhex(block_key))[:32], password_salt, data)
+
+    verifier = os.urandom(16)
+    params = ('saltSize="16" blockSize="16" keyBits="256" hashSize="64" cipherAlgorithm="AES" '
+              'cipherChaining="ChainingModeCBC" hashAlgorithm="SHA512"')
+    info = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<encryption xmlns="http://schemas.microsoft.com/office/2006/encryption" '
+        'xmlns:p="http://schemas.microsoft.com/office/2006/keyEncryptor/password">'
+        f'<keyData {params} saltValue="{b64(key_salt)}"/>'
+        f'<dataIntegrity encryptedHmacKey="{b64(encrypted_hmac_key)}" encryptedHmacValue="{b64(encrypted_hmac_value)}"/>'
+        '<keyEncryptors><keyEncryptor uri="http://schemas.microsoft.com/office/2006/keyEncryptor/password">'
+        f'<p:encryptedKey spinCount="{spin_count}" {params} saltValue="{b64(password_salt)}" '
+        f'encryptedVerifierHashInput="{b64(encrypt_with_password("fea7d2763b4b9e79", verifier))}" '
+        f'encryptedVerifierHashValue="{b64(encrypt_with_password("d7aa0f6d3061344e", hashlib.sha512(verifier).digest()))}" '
+        f'encryptedKeyValue="{b64(encrypt_with_password("146e0be7abacd0d6", key))}"/>'
+        '</keyEncryptor></keyEncryptors></encryption>')
+    build_compound_file(path, {'EncryptionInfo': struct.pack('<HHI', 4, 4, 0x40) + info.encode('utf-8'),
+                               'EncryptedPackage': encrypted})
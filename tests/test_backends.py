@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+.xlsb / .ods 容器后端测试
+"""
+
+import unittest
+import json
+import os
+import sys
+import zipfile
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_excel_image_extractor import SimpleExcelImageExtractor
+from workbook_backends import _ODS_ROW, _ODS_TABLE, OdsBackend, _rk_number, detect_format
+from workbook_index import StructureCache
+from tests.fixtures import build_ods, build_xlsb, make_png
+from tests.test_extractor import ExtractorTestCase
+
+SHEETS = [
+    {'name': '夹克', 'rows': [["款号", "图片", "价格"], ["J-001", None, 199], [1002, None, 12.5]],
+     'images': [(1, 1, "image1.png"), (2, 1, "image2.png"), (2, 1, "image2.png")],
+     'media': {"image1.png": make_png(), "image2.png": make_png(color=(0, 0, 255))}},
+    {'name': '裤子', 'rows': [["编号", None, "照片"], ["P-9"]],
+     'images': [(1, 2, "image3.png")], 'media': {"image3.png": make_png(color=(0, 255, 0))}},
+]
+
+
+class BackendTests:
+    """各个后端共用的测试：输出、去重、关键列和清单与 .xlsx 相同"""
+
+    builder = None
+    suffix = None
+
+    def setUp(self):
+        super().setUp()
+        self.book = self.tmp / f"book{self.suffix}"
+        type(self).builder(self.book, SHEETS)
+
+    def extract(self, **options):
+        extractor = SimpleExcelImageExtractor(str(self.book), "out", **options)
+        extractor.extract_images()
+        self.assertIsNone(extractor.error)
+        return extractor
+
+    def test_placements_and_headers(self):
+        extractor = self.extract()
+        self.assertEqual(extractor.saved_count, 3)
+        self.assertEqual(self.files("out/夹克/图片"), ["image_1.png", "image_2.png"])
+        self.assertEqual(self.files("out/裤子/照片"), ["image_1.png"])
+
+    def test_key_column_and_manifest(self):
+        self.extract(key_column="款号", manifest=True)
+        self.assertEqual(self.files("out/夹克/图片"), ["1002.png", "J-001.png"])
+        with open("out/book_manifest.jsonl", encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([(r['sheet'], r['row'], r['col'], r['key']) for r in records],
+                         [('夹克', 2, 2, 'J-001'), ('夹克', 3, 2, '1002'), ('裤子', 2, 3, None)])
+        self.assertTrue(all(r['width'] == 2 for r in records))
+
+    def test_key_column_by_letter_with_cached_structure(self):
+        cache = StructureCache()
+        self.extract(structure_cache=cache)
+        self.extract(structure_cache=cache, key_column="C")
+        self.assertEqual(cache.hits, 1)
+        self.assertIn("12.5.png", self.files("out/夹克/图片"))
+        self.assertIn("199.png", self.files("out/夹克/图片"))
+
+
+class TestXlsbBackend(BackendTests, ExtractorTestCase):
+    builder = build_xlsb
+    suffix = ".xlsb"
+
+    def test_rk_number(self):
+        self.assertEqual(_rk_number(1002 << 2 | 2), 1002)
+        self.assertEqual(_rk_number((-5 << 2 | 2) & 0xFFFFFFFF), -5)
+        self.assertEqual(_rk_number(1250 << 2 | 3), 12.5)
+
+
+class TestOdsBackend(BackendTests, ExtractorTestCase):
+    builder = build_ods
+    suffix = ".ods"
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format(["content.xml", "mimetype"]), "ods")
+        self.assertEqual(detect_format(["xl/workbook.bin"]), "xlsb")
+        self.assertEqual(detect_format(["xl/workbook.xml"]), "xlsx")
+
+    def test_processed_rows_are_detached(self):
+        rows = [["款号", "图片"]] + [[f"K{i}"] for i in range(500)]
+        build_ods(self.tmp / "long.ods", [{'name': 'S', 'rows': rows, 'images': [(400, 1, "image1.png")],
+                                           'media': {"image1.png": make_png()}}])
+        with zipfile.ZipFile(self.tmp / "long.ods") as zip_ref:
+            zip_ref.extractall(self.tmp / "long")
+        backend = OdsBackend(None, self.tmp / "long")
+        content = self.tmp / "long" / "content.xml"
+        # 表格结束时已经处理过的行都不再挂在表格上
+        remaining = [sum(1 for _ in elem.iter(_ODS_ROW))
+                     for event, elem in backend._iter_content(content)
+                     if event == 'end' and elem.tag == _ODS_TABLE]
+        self.assertEqual(remaining, [0])
+        self.assertEqual([(p['row'], p['col']) for p in backend.placements('S', content)], [(400, 1)])
+        self.assertEqual(backend.key_index('S', content, 0, [401]), {401: "K399"})
+
+        # 重复的行（number-rows-repeated）对范围内的每个图片行都有效
+        xml = content.read_text(encoding='utf-8')
+        content.write_text(xml.replace('<table:table-row><table:table-cell office:value-type="string"><text:p>K10<',
+                                       '<table:table-row table:number-rows-repeated="5"><table:table-cell '
+                                       'office:value-type="string"><text:p>K10<', 1), encoding='utf-8')
+        backend = OdsBackend(None, self.tmp / "long")
+        self.assertEqual(backend.key_index('S', content, 0, {2, 12, 14, 16, 17, 405}),
+                         {2: "K0", 12: "K10", 14: "K10", 16: "K10", 17: "K11", 405: "K399"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享任务表批量提取测试
+"""
+
+import unittest
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_lease import WorkTable, output_dir_for, run_worker
+from simple_excel_image_extractor import extract_workbook
+from tests.fixtures import build_workbook, make_png
+from tests.test_extractor import ExtractorTestCase
+
+
+def _work(index):
+    return run_worker("jobs.sqlite", "out", f"test:{index}", lease_seconds=5, poll_interval=0.1)
+
+
+class TestBatchLease(ExtractorTestCase):
+    """多个工作进程共享同一任务表"""
+
+    def add_books(self, count):
+        books = []
+        for i in range(count):
+            path = self.tmp / f"book{i}.xlsx"
+            build_workbook(path, [{'name': 'Sheet1', 'rows': [["款号", "图片"], [f"K{i}"]],
+                                   'images': [(1, 1, "image1.png")], 'media': {"image1.png": make_png()}}])
+            books.append(path)
+        with WorkTable("jobs.sqlite") as table:
+            self.assertEqual(table.add(books), count)
+            self.assertEqual(table.add(books), 0)
+        return books
+
+    def test_several_processes(self):
+        books = self.add_books(8)
+        (self.tmp / "broken.xlsx").write_bytes(b"not a zip")
+        with WorkTable("jobs.sqlite", max_attempts=2) as table:
+            table.add([self.tmp / "broken.xlsx"])
+
+        with ProcessPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(_work, range(3)))
+
+        self.assertEqual(sum(r[0] for r in results), 8)
+        with WorkTable("jobs.sqlite") as table:
+            stats = table.stats()
+        self.assertEqual((stats['done'], stats['failed'], stats['images']), (8, 1, 8))
+        for book in books:
+            self.assertEqual(self.files(output_dir_for("out", book) / "Sheet1" / "图片"), ["image_1.png"])
+        self.assertEqual(self.files("out/.staging"), [])
+
+    def test_expired_lease_is_retried(self):
+        book, = self.add_books(1)
+        with WorkTable("jobs.sqlite") as table:
+            # 模拟崩溃的工作进程：领取后不再续租
+            self.assertEqual(table.claim("crashed", lease_seconds=0.2), (str(book.resolve()), 1))
+            self.assertIsNone(table.claim("other", lease_seconds=5))
+            time.sleep(0.3)
+        stale = self.tmp / "out" / ".staging" / f"{output_dir_for('out', book).name}.deadbeef"
+        (stale / "Sheet1").mkdir(parents=True)
+        (stale / "Sheet1" / "half.png").write_bytes(b"x")
+
+        self.assertEqual(run_worker("jobs.sqlite", "out", "rescuer", lease_seconds=5), (1, 0))
+        with WorkTable("jobs.sqlite") as table:
+            row = table.conn.execute("SELECT worker, attempts FROM jobs").fetchone()
+            self.assertEqual(row, ("rescuer", 2))
+            self.assertFalse(table.complete("crashed", str(book.resolve()), 1))
+        self.assertEqual(self.files("out/.staging"), [])
+
+    def test_lease_expired_before_publish(self):
+        book, = self.add_books(1)
+        staged = []
+
+        def slow_extract(excel_file, output_dir, **options):
+            result = extract_workbook(excel_file, output_dir, **options)
+            staged.append(output_dir)
+            if len(staged) == 1:
+                # 模拟第一次提取耗时超过租约且心跳未能续租
+                with WorkTable("jobs.sqlite") as table:
+                    table.conn.execute("UPDATE jobs SET lease_until = ?", (time.time() - 1,))
+            else:
+                self.assertFalse(output_dir_for("out", book).exists())
+            return result
+
+        with mock.patch("batch_lease.extract_workbook", slow_extract):
+            self.assertEqual(run_worker("jobs.sqlite", "out", "slow", lease_seconds=5, wait=False), (1, 0))
+        # 第一次的结果没有发布，暂存目录已删除；重新领取后才发布
+        self.assertEqual(len(staged), 2)
+        self.assertFalse(os.path.exists(staged[0]))
+        self.assertEqual(self.files("out/.staging"), [])
+        self.assertEqual(self.files(output_dir_for("out", book) / "Sheet1" / "图片"), ["image_1.png"])
+        with WorkTable("jobs.sqlite") as table:
+            self.assertEqual(table.conn.execute("SELECT status, attempts FROM jobs").fetchone(), ("done", 2))
+
+    def test_rerun_is_idempotent(self):
+        book, = self.add_books(1)
+        run_worker("jobs.sqlite", "out", "first")
+        with WorkTable("jobs.sqlite") as table:
+            table.conn.execute("UPDATE jobs SET status = 'pending', attempts = 0")
+        run_worker("jobs.sqlite", "out", "second")
+        self.assertEqual(self.files(output_dir_for("out", book) / "Sheet1" / "图片"), ["image_1.png"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨工作簿图片目录测试
+"""
+
+import unittest
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+from unittest import mock
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_catalog import ImageCatalog
+from simple_excel_image_extractor import SimpleExcelImageExtractor, main
+from tests.fixtures import make_png
+from tests.test_extractor import ExtractorTestCase
+
+
+class TestImageCatalog(ExtractorTestCase):
+    """目录增量更新与查询测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.photo = make_png(color=(1, 2, 3))
+        self.spring = self.build("spring.xlsx", rows=[["款号", "图片"], ["J-100"], ["J-200"]],
+                                 images=[(1, 1, "image1.png"), (2, 1, "image2.png")],
+                                 media={"image1.png": self.photo, "image2.png": make_png()})
+        self.autumn = self.build("autumn.xlsx", rows=[["款号", "图片"], ["J-100"]],
+                                 images=[(1, 1, "image1.png")], media={"image1.png": self.photo})
+
+    def extract(self, book):
+        SimpleExcelImageExtractor(str(book), "out", key_column="款号", catalog="catalog.sqlite").extract_images()
+
+    def test_query_across_workbooks(self):
+        self.extract(self.spring)
+        self.extract(self.autumn)
+
+        with ImageCatalog("catalog.sqlite") as catalog:
+            by_key = catalog.query(key="J-100")
+            self.assertEqual(sorted(os.path.basename(r['workbook']) for r in by_key), ["autumn.xlsx", "spring.xlsx"])
+            self.assertEqual(len({r['sha256'] for r in by_key}), 1)
+            self.assertEqual(len(catalog.query(sheet="Sheet1", header="图片")), 3)
+            self.assertEqual(catalog.stats(), {'workbooks': 2, 'placements': 3, 'images': 2})
+
+    def test_rerun_replaces_workbook_rows(self):
+        self.extract(self.spring)
+        self.extract(self.spring)
+        with ImageCatalog("catalog.sqlite") as catalog:
+            self.assertEqual(catalog.stats()['placements'], 2)
+
+    def test_failed_rerun_keeps_previous_rows(self):
+        self.extract(self.spring)
+        extractor = SimpleExcelImageExtractor(str(self.spring), "out2", key_column="款号", catalog="catalog.sqlite")
+        with mock.patch.object(extractor, '_record_placement', side_effect=[None, OSError("磁盘已满")]):
+            extractor.extract_images()
+        self.assertEqual(extractor.failures, 1)
+        with ImageCatalog("catalog.sqlite") as catalog:
+            rows = catalog.query(workbook="spring.xlsx")
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(r['output_dir'].endswith("out") for r in rows))
+
+    def test_query_subcommand_by_image(self):
+        self.extract(self.spring)
+        self.extract(self.autumn)
+        (self.tmp / "photo.png").write_bytes(self.photo)
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            main(["query", "--catalog", "catalog.sqlite", "--image", "photo.png"])
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn("J-100", lines[0])
+        self.assertIn("共 2 条", lines[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+加密工作簿解密测试
+"""
+
+import unittest
+import os
+import sys
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_excel_image_extractor import SimpleExcelImageExtractor
+from workbook_crypto import CompoundFile, EncryptedWorkbookError, decrypt_workbook, is_compound_file
+from workbook_index import StructureCache
+from tests.fixtures import build_compound_file, build_encrypted_workbook, build_workbook, make_png
+from tests.test_extractor import ExtractorTestCase
+
+try:
+    import cryptography
+except ImportError:
+    cryptography = None
+
+
+class TestCompoundFile(ExtractorTestCase):
+    """复合文档读取：迷你流与普通扇区链"""
+
+    def test_read_streams(self):
+        streams = {'Small': b'abc' * 100, 'Large': os.urandom(70000), 'Edge': b'x' * 4095}
+        build_compound_file(self.tmp / "ole.bin", streams)
+        self.assertTrue(is_compound_file(self.tmp / "ole.bin"))
+        with open(self.tmp / "ole.bin", 'rb') as f:
+            ole = CompoundFile(f)
+            for name, data in streams.items():
+                self.assertEqual(ole.read_stream(name.lower()), data)
+            # 分段读取跨越扇区边界
+            stream = ole.open_stream('Large')
+            parts = [stream.read(size) for size in (8, 4096, 1000, 100000)]
+            self.assertEqual(b''.join(parts), streams['Large'])
+
+    def test_not_encrypted_compound_file(self):
+        build_compound_file(self.tmp / "old.xls", {'Workbook': b'\x00' * 100})
+        with self.assertRaisesRegex(EncryptedWorkbookError, "不是加密的工作簿"):
+            decrypt_workbook(self.tmp / "old.xls", "secret")
+
+
+@unittest.skipIf(cryptography is None, "需要 cryptography")
+class TestEncryptedWorkbook(ExtractorTestCase):
+    """加密工作簿在内存中解密后提取"""
+
+    def setUp(self):
+        super().setUp()
+        build_workbook(self.tmp / "plain.xlsx", [{
+            # 随机内容的行让加密数据包超过 4096 字节，存放在普通扇区中
+            'name': 'Sheet1',
+            'rows': [["款号", "图片"], ["A-1"], ["B-2"]] + [[os.urandom(8).hex()] for _ in range(1000)],
+            'images': [(1, 1, "image1.png"), (2, 1, "image2.png")],
+            'media': {"image1.png": make_png(), "image2.png": make_png(color=(0, 0, 255))}}])
+        self.package = (self.tmp / "plain.xlsx").read_bytes()
+        self.assertGreater(len(self.package), 8192)
+        self.book = self.tmp / "locked.xlsx"
+        build_encrypted_workbook(self.book, self.package, "密码123")
+
+    def extract(self, password, **options):
+        extractor = SimpleExcelImageExtractor(str(self.book), "out", password=password, **options)
+        extractor.extract_images()
+        return extractor
+
+    def test_decrypt_in_memory(self):
+        package = decrypt_workbook(self.book, "密码123")
+        self.assertEqual(package.read(), self.package)
+        self.assertFalse(package._rolled)
+
+    def test_extract_with_password(self):
+        extractor = self.extract("密码123", key_column="款号")
+        self.assertIsNone(extractor.error)
+        self.assertEqual(self.files("out/Sheet1/图片"), ["A-1.png", "B-2.png"])
+
+    def test_wrong_or_missing_password(self):
+        for password, message in (("wrong", "密码错误"), (None, "需要提供密码")):
+            extractor = self.extract(password)
+            self.assertIn(message, str(extractor.error))
+            self.assertEqual(extractor.saved_count, 0)
+
+    def test_cached_structure_reads_decrypted_package(self):
+        cache = StructureCache()
+        self.extract("密码123", structure_cache=cache)
+        extractor = self.extract("密码123", structure_cache=cache, key_column="款号")
+        self.assertEqual(cache.hits, 1)
+        self.assertIsNone(extractor.error)
+        self.assertIn("A-1.png", self.files("out/Sheet1/图片"))
+
+    def test_no_plaintext_on_disk(self):
+        seen = []
+
+        def snapshot(progress):
+            if extractor.temp_dir.exists():
+                seen.extend(p for p in extractor.temp_dir.rglob('*') if p.is_file())
+
+        cache = StructureCache(self.tmp / "cache")
+        for output in ("out", "out2"):
+            extractor = SimpleExcelImageExtractor(str(self.book), output, password="密码123", key_column="款号",
+                                                  structure_cache=cache, progress_callback=snapshot,
+                                                  progress_interval=0, near_duplicates=True)
+            extractor.extract_images()
+            self.assertIsNone(extractor.error)
+        # 解密后的部件从内存读取，不解压到临时目录；结构只缓存在内存中
+        self.assertEqual(seen, [])
+        self.assertEqual(list((self.tmp / "cache").glob("*.json.gz")), [])
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(self.files("out2/Sheet1/图片"), ["A-1.png", "B-2.png"])
+
+    def test_tampered_package_fails_integrity_check(self):
+        data = bytearray(self.book.read_bytes())
+        data[-600] ^= 0xFF
+        self.book.write_bytes(bytes(data))
+        with self.assertRaisesRegex(EncryptedWorkbookError, "完整性"):
+            decrypt_workbook(self.book, "密码123")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片数据集导出测试
+"""
+
+import unittest
+import hashlib
+import os
+import sys
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_dataset import DatasetWriter, content_type, shard_prefix
+from simple_excel_image_extractor import SimpleExcelImageExtractor, main
+from tests.fixtures import make_png
+from tests.test_extractor import ExtractorTestCase
+
+try:
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    ds = None
+
+
+class TestContentType(unittest.TestCase):
+    """MIME 类型判断测试"""
+
+    def test_magic_before_suffix(self):
+        self.assertEqual(content_type(make_png(), "image1.jpeg"), "image/png")
+        self.assertEqual(content_type(b'\xff\xd8\xff\xe0', "a.bin"), "image/jpeg")
+        self.assertEqual(content_type(b'\x01\x00\x00\x00', "image3.EMF"), "image/emf")
+        self.assertEqual(content_type(b'', "x.dat"), "application/octet-stream")
+
+
+@unittest.skipIf(ds is None, "需要 pyarrow")
+class TestDataset(ExtractorTestCase):
+    """提取时写出 Parquet 数据集测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.png1 = make_png(5, 4)
+        self.png2 = make_png(color=(0, 0, 255))
+        self.book = self.build(
+            rows=[["款号", "正面", "背面"], ["A-001"], ["B-002"]],
+            images=[(1, 1, "image1.png"), (1, 2, "image2.png"), (2, 1, "image1.png")],
+            media={"image1.png": self.png1, "image2.png": self.png2},
+        )
+
+    def read(self, directory="data"):
+        return ds.dataset(directory, format="parquet").to_table().sort_by([("row", "ascending"), ("col", "ascending")])
+
+    def test_rows_and_bytes(self):
+        extractor = SimpleExcelImageExtractor(str(self.book), "out", key_column="款号", dataset="data")
+        extractor.extract_images()
+        self.assertIsNone(extractor.error)
+        table = self.read()
+        self.assertEqual(table.num_rows, 3)
+        first = table.slice(0, 1).to_pylist()[0]
+        self.assertEqual((first['sheet'], first['header'], first['row'], first['col'], first['key']),
+                         ("Sheet1", "正面", 2, 2, "A-001"))
+        self.assertEqual((first['content_type'], first['bytes']), ("image/png", self.png1))
+        self.assertEqual(first['sha256'], hashlib.sha256(self.png1).hexdigest())
+        self.assertEqual(table.column('bytes')[1].as_py(), self.png2)
+        # 同时照常写出图片文件
+        self.assertTrue((self.tmp / "out/Sheet1/正面/A-001.png").exists())
+
+    def test_no_files(self):
+        extractor = SimpleExcelImageExtractor(str(self.book), "out", dataset="data", report="xlsx",
+                                              write_files=False)
+        extractor.extract_images()
+        self.assertIsNone(extractor.error)
+        self.assertEqual(extractor.saved_count, 3)
+        self.assertEqual(self.read().num_rows, 3)
+        self.assertFalse((self.tmp / "out/Sheet1").exists())
+        self.assertFalse((self.tmp / "out/book_report.xlsx").exists())
+
+    def test_row_groups_and_shards(self):
+        record = {'workbook': "w.xlsx", 'sheet': "S", 'header': "图片", 'row': 1, 'col': 1,
+                  'key': None, 'content_type': "image/png", 'sha256': ""}
+        writer = DatasetWriter("data", "w.xlsx", rows_per_group=2, shard_size=3000)
+        with writer:
+            for row in range(7):
+                writer.add(dict(record, row=row), os.urandom(1000))
+        # 第二个行组写完后分片超过 3000 字节，开始下一个分片
+        self.assertEqual(writer.count, 7)
+        self.assertEqual([path.name for path in writer.shards],
+                         [f"{shard_prefix('w.xlsx')}-{i:05d}.parquet" for i in range(2)])
+        rows = [pq.ParquetFile(path).metadata.num_rows for path in writer.shards]
+        self.assertEqual(rows, [4, 3])
+        self.assertEqual(pq.ParquetFile(writer.shards[0]).metadata.num_row_groups, 2)
+        self.assertEqual(pq.ParquetFile(writer.shards[0]).metadata.row_group(0).column(8).compression, "UNCOMPRESSED")
+
+    def test_reextract_replaces_shards(self):
+        SimpleExcelImageExtractor(str(self.book), "out", dataset="data", dataset_rows_per_group=1,
+                                  dataset_shard_mb=0).extract_images()
+        self.assertEqual(len(os.listdir("data")), 3)
+        SimpleExcelImageExtractor(str(self.book), "out2", dataset="data").extract_images()
+        self.assertEqual(len(os.listdir("data")), 1)
+        self.assertEqual(self.read().num_rows, 3)
+
+    def test_cli_requires_dataset_for_no_files(self):
+        with self.assertRaises(SystemExit):
+            main([str(self.book), "--no-files"])
+
+
+if __name__ == "__main__":
+    unittest.main()
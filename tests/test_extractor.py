@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提取器核心功能测试
+"""
+
+import unittest
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_excel_image_extractor import SimpleExcelImageExtractor, ExtractionCancelled, column_letter_to_index
+from tests.fixtures import build_workbook, make_png
+
+
+class ExtractorTestCase(unittest.TestCase):
+    """在临时目录中运行提取器的测试基类"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self._cwd = os.getcwd()
+        os.chdir(self.tmp)
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def build(self, name="book.xlsx", **sheet):
+        sheet.setdefault('name', 'Sheet1')
+        path = self.tmp / name
+        build_workbook(path, [sheet])
+        return path
+
+    def files(self, directory):
+        return sorted(p.name for p in Path(directory).iterdir())
+
+
+class TestKeyColumnNaming(ExtractorTestCase):
+    """关键列命名测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.book = self.build(
+            rows=[["款号", "图片", "备注"], ["A-001", None, "x"], ["B/002", None], ["A-001", None]],
+            images=[(1, 1, "image1.png"), (2, 1, "image2.png"), (3, 1, "image1.png")],
+            media={"image1.png": make_png(), "image2.png": make_png(color=(0, 255, 0))},
+        )
+
+    def test_column_letter_to_index(self):
+        self.assertEqual(column_letter_to_index("A"), 0)
+        self.assertEqual(column_letter_to_index("z"), 25)
+        self.assertEqual(column_letter_to_index("AB"), 27)
+
+    def test_images_placed_by_anchor(self):
+        extractor = SimpleExcelImageExtractor(str(self.book), "out")
+        extractor.extract_images()
+        self.assertEqual(self.files("out/Sheet1/图片"), ["image_1.png", "image_2.png", "image_3.png"])
+        self.assertEqual(extractor.saved_count, 3)
+        self.assertFalse(extractor.temp_dir.exists())
+
+    def test_key_column_by_header(self):
+        SimpleExcelImageExtractor(str(self.book), "out", key_column="款号").extract_images()
+        self.assertEqual(self.files("out/Sheet1/图片"), ["A-001.png", "A-001_2.png", "B_002.png"])
+
+    def test_key_column_by_letter(self):
+        SimpleExcelImageExtractor(str(self.book), "out", key_column="C").extract_images()
+        # 没有关键值的行回退到 image_<n>
+        self.assertEqual(self.files("out/Sheet1/图片"), ["image_2.png", "image_3.png", "x.png"])
+
+    def test_rerun_does_not_overwrite(self):
+        SimpleExcelImageExtractor(str(self.book), "out", key_column="款号").extract_images()
+        SimpleExcelImageExtractor(str(self.book), "out", key_column="款号").extract_images()
+        self.assertEqual(len(self.files("out/Sheet1/图片")), 6)
+
+
+class TestProgressAndCancel(ExtractorTestCase):
+    """进度回调与取消令牌测试"""
+
+    def setUp(self):
+        super().setUp()
+        media = {f"image{i}.png": make_png(color=(i, 0, 0)) for i in range(10)}
+        self.book = self.build(rows=[["款号", "图片"]] + [[f"K{i}"] for i in range(10)],
+                               images=[(i + 1, 1, f"image{i}.png") for i in range(10)], media=media)
+        self.total_bytes = sum(len(data) for data in media.values())
+
+    def test_progress(self):
+        reports = []
+        extractor = SimpleExcelImageExtractor(str(self.book), "out", progress_callback=reports.append,
+                                              progress_interval=3600)
+        extractor.extract_images()
+        # 限频：索引完成和结束时各报告一次，中间的报告被合并
+        self.assertEqual([r['stage'] for r in reports], ['indexed', 'finished'])
+        self.assertEqual((reports[0]['total'], reports[0]['done']), (10, 0))
+        self.assertEqual(reports[0]['total_bytes'], self.total_bytes)
+        self.assertEqual((reports[-1]['done'], reports[-1]['done_bytes']), (10, self.total_bytes))
+
+    def test_cancel_between_images(self):
+        token = threading.Event()
+
+        def progress(report):
+            if report['done'] >= 3:
+                token.set()
+
+        extractor = SimpleExcelImageExtractor(str(self.book), "out", manifest=True, progress_callback=progress,
+                                              progress_interval=0, cancel_token=token)
+        extractor.extract_images()
+        self.assertTrue(extractor.cancelled)
+        self.assertIsInstance(extractor.error, ExtractionCancelled)
+        self.assertEqual(extractor.saved_count, 3)
+        self.assertEqual(len(self.files("out/Sheet1/图片")), 3)
+        # 清单只包含已保存的图片
+        with open("out/book_manifest.jsonl", encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 3)
+        self.assertFalse(extractor.temp_dir.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图形界面任务队列测试（不需要显示器）
+"""
+
+import unittest
+import os
+import sys
+import queue
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gui_jobs import JobQueue, _QueueWriter, collect_workbooks, workbook_output_dir, DONE, FAILED, CANCELLED
+from tests.fixtures import make_png
+from tests.test_extractor import ExtractorTestCase
+
+
+class TestJobQueue(ExtractorTestCase):
+    """多工作簿并行提取测试"""
+
+    def book(self, name, key="A"):
+        return self.build(name, rows=[["款号", "图片"], [key]],
+                          images=[(1, 1, "image1.png")], media={"image1.png": make_png()})
+
+    def run_queue(self, jobs, timeout=30):
+        events = []
+        deadline = time.monotonic() + timeout
+        while jobs.active:
+            self.assertLess(time.monotonic(), deadline, "任务超时")
+            events.extend(jobs.poll())
+            time.sleep(0.05)
+        return events
+
+    def test_parallel_jobs(self):
+        (self.tmp / "books").mkdir()
+        for name in ("a.xlsx", "b.xlsx", "c.xlsx"):
+            self.book(os.path.join("books", name), key=name[0])
+        (self.tmp / "books" / "~$a.xlsx").write_bytes(b"lock")
+        workbooks = collect_workbooks([self.tmp / "books", self.tmp / "missing.xlsx"])
+        self.assertEqual([p.name for p in workbooks], ["a.xlsx", "b.xlsx", "c.xlsx"])
+
+        jobs = JobQueue(workers=2)
+        ids = [jobs.add(p, self.tmp / "out" / p.stem, key_column="款号") for p in workbooks]
+        jobs.add(self.tmp / "missing.xlsx", self.tmp / "out" / "missing")
+        events = self.run_queue(jobs)
+
+        for job_id, name in zip(ids, "abc"):
+            job = jobs.jobs[job_id]
+            self.assertEqual((job.status, job.images), (DONE, 1))
+            self.assertEqual(job.fraction, 1.0)
+            self.assertTrue((self.tmp / "out" / name / "Sheet1" / "图片" / f"{name}.png").exists())
+        self.assertEqual(jobs.jobs[4].status, FAILED)
+        self.assertTrue(any(e[1] == "log" and e[0] == ids[0] for e in events))
+        self.assertTrue(any(e[1] == "progress" and e[2]['stage'] == 'indexed' for e in events))
+
+        # 结束的子进程在之后的 poll() 中回收
+        deadline = time.monotonic() + 10
+        while any(job.process is not None for job in jobs.jobs.values()):
+            self.assertLess(time.monotonic(), deadline, "子进程未回收")
+            jobs.poll()
+            time.sleep(0.05)
+
+    def test_same_name_different_format(self):
+        self.book("a.xlsx", key="X")
+        self.book("a.xlsm", key="M")
+        workbooks = collect_workbooks([self.tmp / "a.xlsx", self.tmp / "a.xlsm"])
+        jobs = JobQueue(workers=2)
+        for workbook in workbooks:
+            jobs.add(workbook, workbook_output_dir(self.tmp / "out", workbook), key_column="款号")
+        self.run_queue(jobs)
+        self.assertTrue(all(job.status == DONE for job in jobs.jobs.values()))
+        self.assertEqual(self.files("out/a_xlsx/Sheet1/图片"), ["X.png"])
+        self.assertEqual(self.files("out/a_xlsm/Sheet1/图片"), ["M.png"])
+
+    def test_cancel(self):
+        jobs = JobQueue(workers=1)
+        first = jobs.add(self.book("a.xlsx"), "out_a")
+        second = jobs.add(self.book("b.xlsx"), "out_b")
+        jobs.poll()
+        self.assertTrue(jobs.cancel(second))
+        self.assertFalse(jobs.cancel(second))
+        self.run_queue(jobs)
+
+        self.assertEqual(jobs.jobs[first].status, DONE)
+        self.assertEqual(jobs.jobs[second].status, CANCELLED)
+        self.assertFalse((self.tmp / "out_b").exists())
+        jobs.remove_finished()
+        self.assertEqual(jobs.jobs, {})
+
+
+class TestQueueWriter(unittest.TestCase):
+    """子进程日志合并发送测试"""
+
+    def test_lines_are_coalesced(self):
+        events = queue.Queue()
+        writer = _QueueWriter(1, events, interval=60)
+        for i in range(500):
+            writer.write(f"第{i}行\n")
+        writer.write("\n未完成")
+        self.assertTrue(events.empty())
+        writer.flush()
+        event = events.get_nowait()
+        self.assertEqual(event[:2], (1, "log"))
+        self.assertEqual(event[2].split("\n"), [f"第{i}行" for i in range(500)])
+        self.assertTrue(events.empty())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片清单测试
+"""
+
+import unittest
+import json
+import os
+import sqlite3
+import struct
+import sys
+from contextlib import closing
+from unittest import mock
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_manifest import read_image_size
+from simple_excel_image_extractor import SimpleExcelImageExtractor
+from tests.fixtures import make_png
+from tests.test_extractor import ExtractorTestCase
+
+
+class TestReadImageSize(unittest.TestCase):
+    """文件头尺寸解析测试"""
+
+    def test_png(self):
+        self.assertEqual(tuple(read_image_size(make_png(7, 3))), (7, 3))
+
+    def test_gif(self):
+        self.assertEqual(tuple(read_image_size(b'GIF89a' + struct.pack('<HH', 640, 480) + b'\x00' * 8)), (640, 480))
+
+    def test_bmp(self):
+        header = b'BM' + b'\x00' * 12 + struct.pack('<Iii', 40, 120, -80)
+        self.assertEqual(tuple(read_image_size(header)), (120, 80))
+
+    def test_jpeg(self):
+        data = (b'\xff\xd8'
+                + b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+                + b'\xff\xc0' + struct.pack('>HBHH', 17, 8, 300, 400) + b'\x00' * 10)
+        self.assertEqual(tuple(read_image_size(data)), (400, 300))
+
+    def test_webp_vp8x(self):
+        data = b'RIFF' + b'\x00' * 4 + b'WEBPVP8X' + b'\x00' * 8 + (99).to_bytes(3, 'little') + (49).to_bytes(3, 'little')
+        self.assertEqual(tuple(read_image_size(data)), (100, 50))
+
+    def test_unknown(self):
+        self.assertEqual(tuple(read_image_size(b'\x01\x00\x00\x00 EMF')), (None, None))
+
+
+class TestManifest(ExtractorTestCase):
+    """提取时写出清单测试"""
+
+    def test_jsonl_and_sqlite(self):
+        book = self.build(
+            rows=[["款号", "图片"], ["A-001"], ["B-002"]],
+            images=[(1, 1, "image1.png"), (2, 1, "image1.png")],
+            media={"image1.png": make_png(5, 4)},
+        )
+        SimpleExcelImageExtractor(str(book), "out", key_column="款号",
+                                  manifest=True, manifest_formats=["sqlite"]).extract_images()
+
+        with open("out/book_manifest.jsonl", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 2)
+        first = records[0]
+        self.assertEqual((first['sheet'], first['header'], first['row'], first['col']), ("Sheet1", "图片", 2, 2))
+        self.assertEqual((first['anchor'], first['media'], first['output']),
+                         ("oneCellAnchor", "xl/media/image1.png", "Sheet1/图片/A-001.png"))
+        self.assertEqual((first['width'], first['height'], first['size']), (5, 4, len(make_png(5, 4))))
+        self.assertEqual(records[0]['sha256'], records[1]['sha256'])
+
+        with closing(sqlite3.connect("out/book_manifest.sqlite")) as conn:
+            rows = conn.execute("SELECT key FROM images WHERE sha256 = ? ORDER BY row",
+                                (first['sha256'],)).fetchall()
+        self.assertEqual(rows, [("A-001",), ("B-002",)])
+
+    def test_missing_pyarrow_fails_before_extraction(self):
+        book = self.build(
+            rows=[["图片"], [""]],
+            images=[(1, 0, "image1.png")],
+            media={"image1.png": make_png()},
+        )
+        extractor = SimpleExcelImageExtractor(str(book), "out", manifest_formats=["parquet"])
+        # 模拟没有安装 pyarrow
+        with mock.patch.dict(sys.modules, {'pyarrow': None, 'pyarrow.parquet': None}):
+            extractor.extract_images()
+        self.assertIsInstance(extractor.error, ImportError)
+        self.assertEqual(extractor.saved_count, 0)
+        self.assertFalse(os.path.exists("out/Sheet1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导出前预览：工作簿索引、缓存与后台解码测试（不需要显示器）
+"""
+
+import unittest
+import io
+import os
+import sys
+import time
+import tkinter as tk
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_preview import DECODE_FAILED, PreviewGrid, ThumbnailCache, ThumbnailLoader, WorkbookPreview
+from tests.test_extractor import ExtractorTestCase
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+class TestThumbnailCache(unittest.TestCase):
+    """LRU 缓存测试"""
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = ThumbnailCache(max_bytes=100)
+        cache.put("a", 1, 40)
+        cache.put("b", 2, 40)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3, 40)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((len(cache), cache.size), (2, 80))
+        cache.put("a", 4, 10)
+        self.assertEqual((cache.get("a"), cache.size), (4, 50))
+
+
+@unittest.skipIf(Image is None, "需要 Pillow")
+class TestThumbnailLoader(ExtractorTestCase):
+    """后台解码测试"""
+
+    def png(self, size):
+        buf = io.BytesIO()
+        Image.new('RGB', size, (10, 200, 10)).save(buf, 'PNG')
+        return buf.getvalue()
+
+    def test_workbook_media_without_export(self):
+        book = self.build(rows=[["款号", "正面", "背面"], ["A-001"], ["B-002"]],
+                          images=[(1, 1, "image1.png"), (1, 2, "image2.png"), (2, 1, "image1.png")],
+                          media={"image1.png": self.png((800, 400)), "image2.png": b"not an image"})
+        preview = WorkbookPreview(str(book))
+        self.addCleanup(preview.close)
+        self.assertEqual(preview.items, [("Sheet1/正面", "xl/media/image1.png"), ("Sheet1/背面", "xl/media/image2.png"),
+                                         ("Sheet1/正面", "xl/media/image1.png")])
+        # 不解压、不写出任何文件
+        self.assertFalse(preview._extractor.temp_dir.exists())
+        self.assertEqual(sorted(os.listdir(self.tmp)), [book.name])
+
+        cache = ThumbnailCache()
+        loader = ThumbnailLoader(cache, size=64, read=preview.read)
+        self.addCleanup(loader.close)
+        loader.request(sorted({name for _, name in preview.items}))
+        decoded = {loader.results.get(timeout=10), loader.results.get(timeout=10)}
+        self.assertEqual(decoded, {"xl/media/image1.png", "xl/media/image2.png"})
+        self.assertEqual(cache.get("xl/media/image1.png").size, (64, 32))
+        self.assertIs(cache.get("xl/media/image2.png"), DECODE_FAILED)
+        self.assertEqual(cache.size, 64 * 32 * 3)
+
+
+@unittest.skipIf(Image is None, "需要 Pillow")
+class TestPreviewGrid(unittest.TestCase):
+    """只为可见格子创建元素"""
+
+    def setUp(self):
+        try:
+            self.root = tk.Tk()
+        except tk.TclError as e:
+            self.skipTest(f"没有图形环境: {e}")
+        self.addCleanup(self.root.destroy)
+        self.root.geometry("600x400")
+
+    def test_only_visible_cells(self):
+        grid = PreviewGrid(self.root)
+        grid.pack(fill=tk.BOTH, expand=True)
+        grid.set_items([("Sheet1/图片", f"missing_{i}.png") for i in range(50000)])
+        deadline = time.monotonic() + 1
+        while time.monotonic() < deadline:
+            self.root.update()
+        self.assertLess(len(grid._cells), 100)
+        grid.canvas.yview_moveto(0.5)
+        grid._render()
+        self.assertTrue(all(i > 20000 for i in grid._cells))
+
+
+if __name__ == '__main__':
+    unittest.main()
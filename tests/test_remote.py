@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+远程工作簿（HTTP Range 请求）测试
+"""
+
+import unittest
+import os
+import re
+import sys
+import threading
+import zipfile
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from remote_workbook import HttpRangeFile, RemoteWorkbookError
+from simple_excel_image_extractor import SimpleExcelImageExtractor
+from workbook_index import StructureCache
+from tests.fixtures import build_workbook, make_png
+from tests.test_extractor import ExtractorTestCase
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """支持单个 Range 的静态文件服务（HTTP/1.1 长连接），记录请求和连接"""
+
+    protocol_version = 'HTTP/1.1'
+    log = None
+    ranges_supported = True
+    # 设置时在响应中返回 ETag；If-Match 按强比较处理（弱 ETag 永远不匹配）
+    etag = None
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.log['connections'] += 1
+
+    def do_GET(self):
+        if self.path.startswith('/moved/'):
+            # 重定向到真实地址（带一个不应被当作文件内容的响应体）
+            body = b"<html>moved</html>"
+            self.send_response(302)
+            self.send_header('Location', self.path[len('/moved'):])
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if_match = self.headers.get('If-Match')
+        if if_match and (if_match.startswith('W/') or if_match != self.etag):
+            self.send_response(412)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        path = self.translate_path(self.path)
+        match = re.fullmatch(r'bytes=(\d*)-(\d*)', self.headers.get('Range', ''))
+        if not self.ranges_supported or match is None or not os.path.isfile(path):
+            return super().do_GET()
+        with open(path, 'rb') as f:
+            data = f.read()
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), len(data) - 1) if last else len(data) - 1
+        else:
+            start, end = max(0, len(data) - int(last)), len(data) - 1
+        self.log['ranges'].append((start, end))
+        body = data[start:end + 1]
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Last-Modified', self.date_time_string(int(os.path.getmtime(path))))
+        if self.etag:
+            self.send_header('ETag', self.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class RemoteTestCase(ExtractorTestCase):
+    ranges_supported = True
+    etag = None
+
+    def setUp(self):
+        super().setUp()
+        self.log = {'connections': 0, 'ranges': []}
+        handler = type('Handler', (RangeRequestHandler,), {'log': self.log, 'etag': self.etag,
+                                                          'ranges_supported': self.ranges_supported})
+        self.handler = handler
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), partial(handler, directory=str(self.tmp)))
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+
+class TestHttpRangeFile(RemoteTestCase):
+    """可寻址的远程文件"""
+
+    def test_read_and_coalesce(self):
+        data = os.urandom(1_000_000)
+        (self.tmp / "blob.bin").write_bytes(data)
+        with HttpRangeFile(f"{self.base}/blob.bin") as remote:
+            self.assertEqual(remote.size, len(data))
+            remote.seek(-100, os.SEEK_END)
+            self.assertEqual(remote.read(), data[-100:])
+            remote.prefetch([(0, 10), (70_000, 70_010), (200_000, 200_010)])
+            # 三个相近的范围合并为一次请求
+            self.assertEqual(len(self.log['ranges']), 2)
+            remote.seek(70_000)
+            self.assertEqual(remote.read(300_000), data[70_000:370_000])
+        self.assertEqual(self.log['connections'], 1)
+
+    def test_zipfile_reads_members(self):
+        with zipfile.ZipFile(self.tmp / "a.zip", 'w') as zf:
+            zf.writestr("x.txt", "你好" * 1000)
+        with HttpRangeFile(f"{self.base}/a.zip") as remote, zipfile.ZipFile(remote) as zf:
+            self.assertEqual(zf.read("x.txt").decode('utf-8'), "你好" * 1000)
+
+
+class TestRemoteWorkbook(RemoteTestCase):
+    """只下载需要的部件"""
+
+    def setUp(self):
+        super().setUp()
+        build_workbook(self.tmp / "book.xlsx", [{
+            'name': 'Sheet1', 'rows': [["款号", "图片"], ["A-1"], ["B-2"]],
+            'images': [(1, 1, "image1.png"), (2, 1, "image2.png")],
+            'media': {"image1.png": make_png(), "image2.png": make_png(color=(0, 0, 255))}}])
+        # 与图片无关的大部件（例如嵌入对象）不应被下载
+        with zipfile.ZipFile(self.tmp / "book.xlsx", 'a', zipfile.ZIP_STORED) as zf:
+            zf.writestr("xl/embeddings/oleObject1.bin", os.urandom(2_000_000))
+        self.url = f"{self.base}/book.xlsx"
+
+    def downloaded(self):
+        return sum(end - start + 1 for start, end in self.log['ranges'])
+
+    def test_extract_without_downloading_everything(self):
+        extractor = SimpleExcelImageExtractor(self.url, "out", key_column="款号", manifest=True)
+        extractor.extract_images()
+        self.assertIsNone(extractor.error)
+        self.assertEqual(self.files("out/Sheet1/图片"), ["A-1.png", "B-2.png"])
+        self.assertTrue((self.tmp / "out" / "book_manifest.jsonl").exists())
+        self.assertLess(self.downloaded(), 1_000_000)
+        self.assertEqual(self.log['connections'], 1)
+
+    def test_structure_cache(self):
+        cache = StructureCache(self.tmp / "cache")
+        SimpleExcelImageExtractor(self.url, "out1", structure_cache=cache).extract_images()
+        extractor = SimpleExcelImageExtractor(self.url, "out2", structure_cache=cache)
+        extractor.extract_images()
+        self.assertIsNone(extractor.error)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(self.files("out2/Sheet1/图片"), ["image_1.png", "image_2.png"])
+
+
+class TestWeakEtag(RemoteTestCase):
+    etag = 'W/"abc"'
+
+    def test_weak_etag_is_not_sent_as_if_match(self):
+        data = os.urandom(300_000)
+        (self.tmp / "blob.bin").write_bytes(data)
+        with HttpRangeFile(f"{self.base}/blob.bin") as remote:
+            self.assertEqual(remote.etag, 'W/"abc"')
+            remote.seek(1000)
+            self.assertEqual(remote.read(10), data[1000:1010])
+
+
+class TestStrongEtag(RemoteTestCase):
+    etag = '"abc"'
+
+    def test_strong_etag_is_checked(self):
+        (self.tmp / "blob.bin").write_bytes(os.urandom(1_000_000))
+        with HttpRangeFile(f"{self.base}/blob.bin") as remote:
+            remote.seek(1000)
+            remote.read(10)
+            # 服务器上的文件被替换（ETag 变化）后返回 412
+            self.handler.etag = '"def"'
+            remote.seek(500_000)
+            with self.assertRaisesRegex(RemoteWorkbookError, "已变化"):
+                remote.read(10)
+
+
+class TestRedirect(RemoteTestCase):
+
+    def test_follow_redirect(self):
+        data = os.urandom(300_000)
+        (self.tmp / "blob.bin").write_bytes(data)
+        with HttpRangeFile(f"{self.base}/moved/blob.bin") as remote:
+            self.assertEqual(remote.size, len(data))
+            self.assertEqual(remote.url, f"{self.base}/blob.bin")
+            remote.seek(5)
+            self.assertEqual(remote.read(10), data[5:15])
+
+    def test_extract_redirected_workbook(self):
+        self.build(rows=[["款号", "图片"], ["A-1"]], images=[(1, 1, "image1.png")],
+                   media={"image1.png": make_png()})
+        extractor = SimpleExcelImageExtractor(f"{self.base}/moved/book.xlsx", "out", key_column="款号",
+                                              structure_cache=StructureCache())
+        extractor.extract_images()
+        self.assertIsNone(extractor.error)
+        self.assertEqual(self.files("out/Sheet1/图片"), ["A-1.png"])
+
+
+class TestRemoteHeaders(RemoteTestCase):
+    """读取列名时只下载工作表和共享字符串的开头"""
+
+    def test_large_shared_strings(self):
+        filler = [[None, None, os.urandom(16).hex()] for _ in range(60000)]
+        # 共享字符串按出现顺序编号：表头在前，大量其他文本在后
+        build_workbook(self.tmp / "big.xlsx", [
+            {'name': f'S{i}', 'rows': [["款号", f"图片{i}"], ["A-1"]] + filler * i,
+             'images': [(1, 1, "image1.png")], 'media': {"image1.png": make_png()}}
+            for i in range(2)])
+        with zipfile.ZipFile(self.tmp / "big.xlsx") as zf:
+            sst_size = zf.getinfo("xl/sharedStrings.xml").compress_size
+        self.assertGreater(sst_size, 1_000_000)
+
+        extractor = SimpleExcelImageExtractor(f"{self.base}/big.xlsx", "out")
+        extractor.extract_images()
+        self.assertIsNone(extractor.error)
+        self.assertEqual(self.files("out/S0/图片0"), ["image_1.png"])
+        self.assertEqual(self.files("out/S1/图片1"), ["image_1.png"])
+        # 共享字符串没有被整个下载（更不会每个工作表下载一次）
+        downloaded = sum(end - start + 1 for start, end in self.log['ranges'])
+        self.assertLess(downloaded, sst_size / 2)
+
+
+class TestRangeNotSupported(RemoteTestCase):
+    ranges_supported = False
+
+    def test_clear_error(self):
+        (self.tmp / "book.xlsx").write_bytes(b"PK" + os.urandom(1000))
+        with self.assertRaisesRegex(RemoteWorkbookError, "不支持 Range"):
+            HttpRangeFile(f"{self.base}/book.xlsx")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片报表测试
+"""
+
+import unittest
+import csv
+import os
+import sys
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_report import ReportWriter
+from simple_excel_image_extractor import SimpleExcelImageExtractor
+from tests.fixtures import make_png
+from tests.test_extractor import ExtractorTestCase
+
+
+class TestReport(ExtractorTestCase):
+    """图片报表测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.book = self.build(
+            rows=[["款号", "正面", "背面"], ["A-001"], ["=B-002"]],
+            images=[(1, 1, "image1.png"), (1, 2, "image2.png"), (2, 1, "image1.png")],
+            media={"image1.png": make_png(), "image2.png": make_png(color=(0, 0, 255))},
+        )
+
+    def test_xlsx_report_links_rows_to_images(self):
+        from openpyxl import load_workbook
+
+        extractor = SimpleExcelImageExtractor(str(self.book), "out", key_column="款号", report="xlsx")
+        extractor.extract_images()
+        self.assertIsNone(extractor.error)
+        ws = load_workbook("out/book_report.xlsx").active
+        rows = [[cell.value for cell in row] for row in ws.iter_rows()]
+        self.assertEqual(rows[0][:4], ["工作表", "行号", "关键值", "列名"])
+        self.assertEqual(rows[1][:4], ["Sheet1", 2, "A-001", "正面、背面"])
+        self.assertEqual(rows[1][4:], ['=HYPERLINK("Sheet1/正面/A-001.png","Sheet1/正面/A-001.png")',
+                                       '=HYPERLINK("Sheet1/背面/A-001.png","Sheet1/背面/A-001.png")'])
+        # 以 = 开头的关键值按文本写入
+        self.assertEqual(ws.cell(3, 3).data_type, 's')
+        self.assertEqual(rows[2][:3], ["Sheet1", 3, "=B-002"])
+        self.assertEqual(len(rows), 3)
+
+    def test_csv_report(self):
+        SimpleExcelImageExtractor(str(self.book), "out", report="csv").extract_images()
+        with open("out/book_report.csv", encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[1], ["Sheet1", "2", "", "正面、背面", "Sheet1/正面/image_1.png", "Sheet1/背面/image_1.png"])
+        self.assertEqual(rows[2], ["Sheet1", "3", "", "正面", "Sheet1/正面/image_2.png"])
+
+    def test_rows_without_position_are_not_merged(self):
+        with ReportWriter(self.tmp / "r.csv", "csv") as report:
+            report.add("S", None, None, "图片", "S/图片/image_1.png")
+            report.add("S", None, None, "图片", "S/图片/image_2.png")
+        self.assertEqual(report.rows, 2)
+
+    def test_anchors_out_of_order_merge_by_row(self):
+        # 绘图中的锚点不按行列顺序排列
+        self.book = self.build(
+            rows=[["款号", "正面", "背面"], ["A-001"], ["B-002"]],
+            images=[(2, 2, "image2.png"), (1, 2, "image2.png"), (2, 1, "image1.png"), (1, 1, "image1.png")],
+            media={"image1.png": make_png(), "image2.png": make_png(color=(0, 0, 255))},
+        )
+        SimpleExcelImageExtractor(str(self.book), "out", key_column="款号", report="csv").extract_images()
+        with open("out/book_report.csv", encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))[1:]
+        self.assertEqual(rows, [["Sheet1", "2", "A-001", "正面、背面", "Sheet1/正面/A-001.png", "Sheet1/背面/A-001.png"],
+                                ["Sheet1", "3", "B-002", "正面、背面", "Sheet1/正面/B-002.png", "Sheet1/背面/B-002.png"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似重复检测测试
+"""
+
+import unittest
+import io
+import json
+import os
+import sys
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.test_extractor import ExtractorTestCase
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = Image = None
+
+if np is not None:
+    from image_similarity import HashIndex, dhash, phash, popcount64
+    from simple_excel_image_extractor import SimpleExcelImageExtractor
+
+
+def photo(size, fmt, quality=90, seed=1):
+    """生成一张由随机色块平滑放大得到的"照片"，seed 不同则内容不同"""
+    import random
+
+    rnd = random.Random(seed)
+    img = Image.new('RGB', (12, 12))
+    img.putdata([tuple(rnd.randrange(256) for _ in range(3)) for _ in range(144)])
+    img = img.resize((size, size), Image.BICUBIC)
+    buf = io.BytesIO()
+    img.save(buf, fmt, quality=quality)
+    return buf.getvalue()
+
+
+@unittest.skipIf(np is None, "需要 Pillow 和 NumPy")
+class TestHashIndex(unittest.TestCase):
+    """哈希与索引测试"""
+
+    def test_popcount(self):
+        values = np.array([0, 1, 0xFF, 0xFFFFFFFFFFFFFFFF], dtype=np.uint64)
+        self.assertEqual(popcount64(values).tolist(), [0, 1, 8, 64])
+
+    def test_resaved_image_is_close(self):
+        for method in (dhash, phash):
+            big = method(photo(256, 'JPEG', 70))
+            small = method(photo(64, 'PNG'))
+            other = method(photo(128, 'PNG', seed=2))
+            index = HashIndex([big, other])
+            self.assertEqual(index.query(small, 6).tolist(), [0], method.__name__)
+
+    def test_clusters(self):
+        index = HashIndex([0b0, 0b1, 0b11, 0xFFFF0000, 0xFFFF0001, 0xFFFFFFFF00000000])
+        self.assertEqual(sorted(index.clusters(1)), [[0, 1, 2], [3, 4]])
+
+
+@unittest.skipIf(np is None, "需要 Pillow 和 NumPy")
+class TestNearDuplicateStage(ExtractorTestCase):
+    """提取时的近似重复检测测试"""
+
+    def test_keep_one_representative(self):
+        book = self.build(
+            rows=[["款号", "图片"], ["A"], ["B"], ["C"]],
+            images=[(1, 1, "image1.jpeg"), (2, 1, "image2.png"), (3, 1, "image3.png")],
+            media={"image1.jpeg": photo(256, 'JPEG', 60), "image2.png": photo(96, 'PNG'),
+                   "image3.png": photo(96, 'PNG', seed=2)},
+        )
+        SimpleExcelImageExtractor(str(book), "out", key_column="款号", keep_one_duplicate=True).extract_images()
+
+        self.assertEqual(self.files("out/Sheet1/图片"), ["A.jpeg", "C.png"])
+        with open("out/book_near_duplicates.json", encoding="utf-8") as f:
+            clusters = json.load(f)['clusters']
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0]['representative'], "xl/media/image1.jpeg")
+        self.assertEqual([m['skipped'] for m in clusters[0]['members']], [False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动性能测试
+"""
+
+import unittest
+import os
+import sys
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import startup_benchmark
+
+
+class TestStartup(unittest.TestCase):
+    """导入耗时与第一个窗口耗时的预算检查"""
+
+    def test_import_is_lazy_and_side_effect_free(self):
+        result = startup_benchmark.measure_import()
+        self.assertEqual(result['heavy'], [], "导入界面模块时不应加载重型依赖")
+        self.assertEqual(result['created'], [], "导入界面模块时不应创建文件")
+        self.assertLess(result['seconds'], startup_benchmark.IMPORT_BUDGET)
+
+    def test_first_window_budget(self):
+        result = startup_benchmark.measure_first_window()
+        if 'error' in result:
+            self.skipTest(f"没有图形环境: {result['error']}")
+        self.assertLess(result['seconds'], startup_benchmark.FIRST_WINDOW_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缩略图与格式统一测试
+"""
+
+import unittest
+import io
+import os
+import sys
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.test_extractor import ExtractorTestCase
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+if Image is not None:
+    from image_thumbnails import render_all, render_variants
+    from simple_excel_image_extractor import SimpleExcelImageExtractor
+
+
+def encode(size, fmt, mode='RGB'):
+    buf = io.BytesIO()
+    Image.new(mode, size, (200, 10, 10, 128)[:len(mode)]).save(buf, fmt)
+    return buf.getvalue()
+
+
+@unittest.skipIf(Image is None, "需要 Pillow")
+class TestRenderVariants(unittest.TestCase):
+    """单个媒体的派生图片测试"""
+
+    def test_jpeg_thumbnail_uses_draft(self):
+        variants = render_variants(encode((2000, 1000), 'JPEG'), thumbnail_size=256)
+        data, ext = variants['thumbnail']
+        self.assertEqual(ext, '.jpg')
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (256, 128))
+
+    def test_normalize_and_thumbnail_from_one_decode(self):
+        variants = render_variants(encode((600, 300), 'PNG', 'RGBA'), thumbnail_size=100,
+                                   thumbnail_format='webp', normalize_format='jpeg')
+        self.assertEqual(sorted(variants), ['normalized', 'thumbnail'])
+        self.assertEqual(Image.open(io.BytesIO(variants['normalized'][0])).size, (600, 300))
+        self.assertEqual(Image.open(io.BytesIO(variants['thumbnail'][0])).format, 'WEBP')
+
+    def test_render_all_reports_errors(self):
+        results = dict(render_all([("good", encode((50, 50), 'PNG')), ("bad", b"not an image")],
+                                  workers=2, thumbnail_size=16))
+        self.assertIn('thumbnail', results["good"])
+        self.assertIsInstance(results["bad"], Exception)
+
+
+@unittest.skipIf(Image is None, "需要 Pillow")
+class TestThumbnailStage(ExtractorTestCase):
+    """提取时生成缩略图测试"""
+
+    def test_thumbnail_per_placement(self):
+        book = self.build(rows=[["款号", "图片"], ["A"], ["B"]],
+                          images=[(1, 1, "image1.png"), (2, 1, "image1.png")],
+                          media={"image1.png": encode((640, 480), 'PNG')})
+        SimpleExcelImageExtractor(str(book), "out", key_column="款号", thumbnail_size=64).extract_images()
+        self.assertEqual(self.files("out/_thumbnails/Sheet1/图片"), ["A.png.jpg", "B.png.jpg"])
+        with Image.open("out/_thumbnails/Sheet1/图片/A.png.jpg") as img:
+            self.assertEqual(img.size, (64, 48))
+
+    def test_same_stem_different_format(self):
+        # 关键值 A_2 的 PNG 与第二个 A 的 JPEG 输出为 A_2.png、A_2.jpeg
+        book = self.build(rows=[["款号", "图片"], ["A_2"], ["A"], ["A"]],
+                          images=[(1, 1, "image1.png"), (2, 1, "image2.png"), (3, 1, "image3.jpeg")],
+                          media={"image1.png": encode((640, 480), 'PNG'), "image2.png": encode((64, 64), 'PNG'),
+                                 "image3.jpeg": encode((320, 480), 'JPEG')})
+        SimpleExcelImageExtractor(str(book), "out", key_column="款号", thumbnail_size=64).extract_images()
+        self.assertEqual(self.files("out/Sheet1/图片"), ["A.png", "A_2.jpeg", "A_2.png"])
+        self.assertEqual(self.files("out/_thumbnails/Sheet1/图片"), ["A.png.jpg", "A_2.jpeg.jpg", "A_2.png.jpg"])
+        with Image.open("out/_thumbnails/Sheet1/图片/A_2.png.jpg") as img:
+            self.assertEqual(img.size, (64, 48))
+        with Image.open("out/_thumbnails/Sheet1/图片/A_2.jpeg.jpg") as img:
+            self.assertEqual(img.size, (43, 64))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控文件夹测试
+"""
+
+import unittest
+import os
+import sys
+import json
+import threading
+import time
+from concurrent.futures import Future
+from unittest import mock
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_excel_image_extractor import extract_workbook
+from watch_folder import FolderWatcher
+from tests.fixtures import build_workbook, make_png
+from tests.test_extractor import ExtractorTestCase
+
+
+def _crash_once(excel_file, output_dir, **options):
+    """第一次调用时让工作进程直接退出（模拟内存不足被杀死或本地库崩溃）"""
+    marker = os.path.join(os.path.dirname(excel_file), ".crashed")
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return extract_workbook(excel_file, output_dir, **options)
+
+
+class TestFolderWatcher(ExtractorTestCase):
+    """监控目录中的新文件测试"""
+
+    def start(self, use_inotify):
+        watcher = FolderWatcher("inbox", "out", workers=2, debounce=0.3, poll_interval=0.1,
+                                use_inotify=use_inotify)
+        thread = threading.Thread(target=watcher.run, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 10)
+        self.addCleanup(watcher.stop)
+        return watcher
+
+    def drop(self, name):
+        build_workbook(self.tmp / "inbox" / name, [{
+            'name': 'Sheet1', 'rows': [["款号", "图片"], ["A"]],
+            'images': [(1, 1, "image1.png")], 'media': {"image1.png": make_png()}}])
+
+    def wait_done(self, watcher, count, timeout=15):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if watcher.stats()['done'] + watcher.stats()['failed'] >= count:
+                return
+            time.sleep(0.05)
+        self.fail(f"超时: {watcher.stats()}")
+
+    def check(self, use_inotify):
+        (self.tmp / "inbox").mkdir()
+        self.drop("before.xlsx")
+        (self.tmp / "inbox" / "~$before.xlsx").write_bytes(b"lock")
+        watcher = self.start(use_inotify)
+        self.drop("after.xlsx")
+        self.wait_done(watcher, 2)
+
+        stats = watcher.stats()
+        self.assertEqual((stats['done'], stats['failed'], stats['images']), (2, 0, 2))
+        self.assertLess(stats['latency_max'], 10)
+        self.assertTrue((self.tmp / "out" / "after_xlsx" / "Sheet1" / "图片" / "image_1.png").exists())
+        return watcher
+
+    def test_polling(self):
+        self.check(use_inotify=False)
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "inotify 仅在 Linux 上可用")
+    def test_inotify(self):
+        self.check(use_inotify=True)
+
+    def test_unchanged_files_are_not_redone(self):
+        watcher = self.check(use_inotify=False)
+        watcher.stop()
+        time.sleep(0.5)
+
+        again = self.start(use_inotify=False)
+        time.sleep(1.0)
+        self.assertEqual(again.stats()['done'], 0)
+        self.drop("before.xlsx")
+        self.wait_done(again, 1)
+
+    def test_same_name_different_format(self):
+        watcher = FolderWatcher("inbox", "out")
+        self.assertNotEqual(watcher._output_dir(self.tmp / "inbox" / "a.xlsx"),
+                            watcher._output_dir(self.tmp / "inbox" / "a.xlsm"))
+
+    def test_state_saved_when_worker_raised(self):
+        (self.tmp / "inbox").mkdir()
+        watcher = FolderWatcher("inbox", "out", use_inotify=False)
+        failed = Future()
+        failed.set_exception(RuntimeError("进程池已损坏"))
+        watcher._running[failed] = (self.tmp / "inbox" / "a.xlsx", (1, 2), time.time(), time.time())
+        watcher.stop()
+        watcher.run()
+        self.assertEqual(watcher.stats()['failed'], 1)
+        with open(self.tmp / "out" / ".watch_state.json", encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {str(self.tmp / "inbox" / "a.xlsx"): [1, 2]})
+
+    def test_worker_crash_is_retried(self):
+        (self.tmp / "inbox").mkdir()
+        self.drop("a.xlsx")
+        with mock.patch("watch_folder.extract_workbook", _crash_once):
+            watcher = self.start(use_inotify=False)
+            self.wait_done(watcher, 1, timeout=30)
+        self.assertTrue((self.tmp / "inbox" / ".crashed").exists())
+        stats = watcher.stats()
+        self.assertEqual((stats['done'], stats['failed']), (1, 0))
+        self.assertTrue((self.tmp / "out" / "a_xlsx" / "Sheet1" / "图片" / "image_1.png").exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作簿结构缓存测试
+"""
+
+import unittest
+import os
+import sys
+from unittest import mock
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_excel_image_extractor import SimpleExcelImageExtractor
+from workbook_backends import XlsxBackend
+from workbook_index import StructureCache
+from tests.fixtures import make_png
+from tests.test_extractor import ExtractorTestCase
+
+
+class TestStructureCache(ExtractorTestCase):
+    """再次提取同一工作簿时使用缓存的结构"""
+
+    def setUp(self):
+        super().setUp()
+        self.book = self.build(
+            rows=[["款号", "图片", "备注"], ["A-001", None, "x"], ["B-002", None, "y"]],
+            images=[(1, 1, "image1.png"), (2, 1, "image2.png")],
+            media={"image1.png": make_png(), "image2.png": make_png(color=(0, 255, 0))},
+        )
+
+    def extract(self, cache, output_dir, **options):
+        extractor = SimpleExcelImageExtractor(str(self.book), output_dir, structure_cache=cache, **options)
+        extractor.extract_images()
+        self.assertIsNone(extractor.error)
+        return extractor
+
+    def test_second_run_skips_parsing(self):
+        cache = StructureCache()
+        self.extract(cache, "out1", key_column="款号")
+        with mock.patch.object(XlsxBackend, 'sheet_names') as sheet_names, \
+                mock.patch.object(XlsxBackend, 'column_names') as column_names, \
+                mock.patch('zipfile.ZipFile.extractall') as extractall:
+            extractor = self.extract(cache, "out2", key_column="款号")
+        sheet_names.assert_not_called()
+        column_names.assert_not_called()
+        extractall.assert_not_called()
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(self.files("out2/Sheet1/图片"), ["A-001.png", "B-002.png"])
+        self.assertEqual(extractor.saved_count, 2)
+        self.assertFalse(extractor.temp_dir.exists())
+
+    def test_new_key_column_on_cached_structure(self):
+        cache = StructureCache()
+        self.extract(cache, "out1")
+        self.extract(cache, "out2", key_column="备注")
+        self.assertEqual(self.files("out2/Sheet1/图片"), ["x.png", "y.png"])
+        self.assertIn("Sheet1\t2", cache.get(str(self.book))['keys'])
+
+    def test_disk_cache_and_invalidation(self):
+        self.extract(StructureCache("cache"), "out1")
+        cache = StructureCache("cache")
+        self.extract(cache, "out2")
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+        # 内容变化后不再命中
+        self.book = self.build(rows=[["款号", "图片"], ["C-003"]], images=[(1, 1, "image9.png")],
+                               media={"image9.png": make_png(color=(0, 0, 255))})
+        self.extract(cache, "out3", key_column="款号")
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(self.files("out3/Sheet1/图片"), ["C-003.png"])
+
+    def test_unchanged_file_is_not_rehashed(self):
+        self.extract(StructureCache("cache"), "out1")
+        with mock.patch("image_catalog.file_sha256", side_effect=AssertionError("不应重新计算哈希")):
+            cache = StructureCache("cache")
+            self.assertIsNotNone(cache.get(str(self.book)))
+
+    def test_disk_cache_prunes_least_recently_used(self):
+        cache = StructureCache("cache")
+        structure = {'version': 2, 'padding': os.urandom(2000).hex()}
+        books = []
+        for i in range(3):
+            book = self.tmp / f"b{i}.bin"
+            book.write_bytes(os.urandom(100))
+            cache.put(str(book), structure)
+            books.append(book)
+            # 依次变旧：b0 最旧
+            for path in (self.tmp / "cache").iterdir():
+                os.utime(path, (path.stat().st_mtime - 10, path.stat().st_mtime - 10))
+        # 只能再容纳三个工作簿的缓存
+        cache.max_disk_bytes = sum(path.stat().st_size for path in (self.tmp / "cache").iterdir()) + 100
+        # 读取 b0 后它成为最近使用的
+        self.assertIsNotNone(StructureCache("cache").get(str(books[0])))
+        cache.put(str(self.book), structure)
+        total = sum(path.stat().st_size for path in (self.tmp / "cache").iterdir())
+        self.assertLessEqual(total, cache.max_disk_bytes)
+        fresh = StructureCache("cache")
+        self.assertIsNotNone(fresh.get(str(books[0])))
+        self.assertIsNone(fresh.get(str(books[1])))
+
+    def test_stale_offsets_fall_back_to_full_parse(self):
+        cache = StructureCache()
+        self.extract(cache, "out1")
+        for entry in cache.get(str(self.book))['media'].values():
+            entry[0] += 7
+        self.extract(cache, "out2")
+        self.assertEqual(self.files("out2/Sheet1/图片"), ["image_1.png", "image_2.png"])
+        self.assertEqual((self.tmp / "out2/Sheet1/图片/image_1.png").read_bytes(), make_png())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控文件夹
+持续监控收件箱目录，新放入或被修改的工作簿（.xlsx/.xlsm/.xlsb/.ods）在写入完成（大小和修改时间稳定）后
+排队交给有界的进程池，用 SimpleExcelImageExtractor 提取图片。
+Linux 上使用 inotify，其他平台或 inotify 不可用时退回到定时扫描
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from gui_jobs import workbook_output_dir
+from simple_excel_image_extractor import extract_workbook
+from workbook_backends import WORKBOOK_SUFFIXES
+
+WATCH_SUFFIXES = WORKBOOK_SUFFIXES
+STATE_FILE = ".watch_state.json"
+# 工作进程异常退出（内存不足、本地库崩溃）时同一工作簿最多重新排队的次数，
+# 每次都让进程崩溃的工作簿之后记为失败
+MAX_CRASH_RETRIES = 2
+
+
+class _Inotify:
+    """通过 ctypes 调用 Linux inotify，只报告发生变化的文件名"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch 失败")
+
+    def read(self, timeout):
+        """等待最多 timeout 秒，返回 (文件名集合, 是否溢出)"""
+        names = set()
+        overflow = False
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return names, overflow
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names, overflow
+        pos = 0
+        while pos + self._EVENT.size <= len(data):
+            _, mask, _, length = self._EVENT.unpack_from(data, pos)
+            pos += self._EVENT.size
+            name = data[pos:pos + length].rstrip(b'\0')
+            pos += length
+            if mask & self.IN_Q_OVERFLOW:
+                overflow = True
+            elif name:
+                names.add(os.fsdecode(name))
+        return names, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """监控收件箱目录并把稳定下来的工作簿交给进程池提取"""
+
+    def __init__(self, inbox, output_root="extracted_images", workers=2, debounce=2.0,
+                 poll_interval=1.0, rescan_interval=30.0, use_inotify=True, extractor_options=None):
+        """
+        Args:
+            inbox (str): 监控的目录
+            output_root (str): 输出根目录，每个工作簿输出到 output_root/<工作簿名>_<扩展名>
+                （a.xlsx 和 a.xlsm 不会写到同一个目录）
+            workers (int): 同时提取的工作簿数量上限
+            debounce (float): 文件大小和修改时间保持不变多少秒后才开始处理
+            poll_interval (float): 检查文件稳定性/定时扫描的间隔（秒）
+            rescan_interval (float): 使用 inotify 时完整扫描一次目录的间隔，防止漏掉事件
+            use_inotify (bool): 是否尝试使用 inotify
+            extractor_options (dict): 传给 SimpleExcelImageExtractor 的其他参数
+        """
+        self.inbox = Path(inbox)
+        self.output_root = Path(output_root)
+        self.workers = max(1, workers)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.use_inotify = use_inotify
+        self.extractor_options = dict(extractor_options or {})
+
+        # 路径 -> (大小, 修改时间, 最近一次变化的时间)
+        self._candidates = {}
+        # 等待提取的 (路径, 标识, 稳定时间)
+        self._queue = deque()
+        # future -> (路径, 标识, 稳定时间, 开始时间)
+        self._running = {}
+        # 路径 -> 工作进程异常退出导致重新排队的次数
+        self._crashes = {}
+        self._pool = None
+        # 进程池中有工作进程异常退出，需要重建进程池
+        self._pool_broken = False
+        # 路径 -> 已处理的 (大小, 修改时间)
+        self._state_file = self.output_root / STATE_FILE
+        self._processed = self._load_state()
+        self._latencies = deque(maxlen=1000)
+        self._done = 0
+        self._failed = 0
+        self._images = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        """队列长度、运行中任务数与延迟统计（从文件稳定到提取完成的秒数）"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                'pending': len(self._candidates),
+                'queued': len(self._queue),
+                'running': len(self._running),
+                'done': self._done,
+                'failed': self._failed,
+                'images': self._images,
+            }
+        if latencies:
+            stats['latency_avg'] = sum(latencies) / len(latencies)
+            stats['latency_p95'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            stats['latency_max'] = latencies[-1]
+        return stats
+
+    def run(self, stats_interval=None):
+        """监控循环，调用 stop() 后返回"""
+        self.output_root.mkdir(parents=True, exist_ok=True)
+        inotify = None
+        if self.use_inotify and sys.platform.startswith('linux'):
+            try:
+                inotify = _Inotify(self.inbox)
+            except (OSError, AttributeError) as e:
+                print(f"inotify 不可用，改为定时扫描: {e}")
+        print(f"开始监控 {self.inbox}（{'inotify' if inotify else '定时扫描'}，{self.workers} 个进程）")
+
+        last_scan = last_stats = 0.0
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            try:
+                while not self._stop.is_set():
+                    now = time.monotonic()
+                    rescan = self.rescan_interval if inotify else self.poll_interval
+                    if now - last_scan >= rescan:
+                        self._scan()
+                        last_scan = now
+
+                    if inotify:
+                        names, overflow = inotify.read(self.poll_interval if not self._candidates else 0.2)
+                        if overflow:
+                            last_scan = 0.0
+                        for name in names:
+                            self._touch(self.inbox / name)
+                    else:
+                        self._stop.wait(min(self.poll_interval, 0.2) if self._candidates else self.poll_interval)
+
+                    self._check_stable()
+                    self._dispatch()
+
+                    if stats_interval and now - last_stats >= stats_interval:
+                        last_stats = now
+                        self._print_stats()
+            finally:
+                if inotify:
+                    inotify.close()
+                # 等待已开始的任务完成，保存状态（任务的异常由 _collect 记为失败）
+                wait(list(self._running))
+                self._collect()
+                self._save_state()
+        finally:
+            self._pool.shutdown()
+
+    def _is_workbook(self, path):
+        name = path.name
+        return path.suffix.lower() in WATCH_SUFFIXES and not name.startswith(('~$', '.'))
+
+    def _scan(self):
+        try:
+            entries = list(os.scandir(self.inbox))
+        except OSError as e:
+            print(f"扫描目录失败: {e}")
+            return
+        for entry in entries:
+            if entry.is_file():
+                self._touch(Path(entry.path))
+
+    def _touch(self, path):
+        """记录一个可能有变化的文件，已处理且未变化的文件直接忽略"""
+        if not self._is_workbook(path):
+            return
+        try:
+            stat = path.stat()
+        except OSError:
+            self._candidates.pop(path, None)
+            return
+        identity = (stat.st_size, stat.st_mtime_ns)
+        key = str(path)
+        if self._processed.get(key) == list(identity) or self._is_queued(path, identity):
+            return
+        previous = self._candidates.get(path)
+        if previous is None or previous[:2] != identity:
+            self._candidates[path] = (identity[0], identity[1], time.monotonic())
+
+    def _is_queued(self, path, identity):
+        with self._lock:
+            if any(p == path and i == identity for p, i, _ in self._queue):
+                return True
+            return any(p == path and i == identity for p, i, _, _ in self._running.values())
+
+    def _check_stable(self):
+        """大小和修改时间在 debounce 秒内没有变化的文件进入队列"""
+        now = time.monotonic()
+        for path, (size, mtime_ns, changed_at) in list(self._candidates.items()):
+            try:
+                stat = path.stat()
+            except OSError:
+                del self._candidates[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self._candidates[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif now - changed_at >= self.debounce:
+                del self._candidates[path]
+                with self._lock:
+                    self._queue.append((path, (size, mtime_ns), time.time()))
+
+    def _dispatch(self):
+        """收集完成的任务，并在进程池有空位时提交排队的工作簿"""
+        self._collect()
+        while True:
+            if self._pool_broken:
+                self._restart_pool()
+            with self._lock:
+                if not self._queue or len(self._running) >= self.workers:
+                    return
+                path, identity, stable_at = self._queue.popleft()
+                output_dir = self._output_dir(path)
+                try:
+                    future = self._pool.submit(extract_workbook, str(path), str(output_dir),
+                                               **self.extractor_options)
+                except BrokenProcessPool:
+                    # 还没有开始处理，放回队首
+                    self._queue.appendleft((path, identity, stable_at))
+                    self._pool_broken = True
+                    continue
+                self._running[future] = (path, identity, stable_at, time.time())
+
+    def _restart_pool(self):
+        """工作进程异常退出后进程池不能再使用：等运行中的任务都以异常结束，重新排队后换一个新的进程池"""
+        print("工作进程异常退出，重建进程池")
+        wait(list(self._running))
+        self._collect()
+        self._pool.shutdown(wait=False)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._pool_broken = False
+
+    def _output_dir(self, path):
+        """工作簿的输出目录，名称带上扩展名，同名不同格式的工作簿互不覆盖"""
+        return workbook_output_dir(self.output_root, path)
+
+    def _collect(self):
+        finished = False
+        with self._lock:
+            for future in [f for f in self._running if f.done()]:
+                path, identity, stable_at, started_at = self._running.pop(future)
+                finished = True
+                try:
+                    count, error = future.result()
+                except BrokenProcessPool as e:
+                    self._pool_broken = True
+                    crashes = self._crashes.get(path, 0) + 1
+                    if crashes <= MAX_CRASH_RETRIES:
+                        # 进程池中的所有任务都会以该异常结束，不一定是这个工作簿导致的，重新排队
+                        self._crashes[path] = crashes
+                        self._queue.appendleft((path, identity, stable_at))
+                        print(f"工作进程异常退出，重新排队: {path.name}")
+                        continue
+                    count, error = 0, f"工作进程异常退出: {e}"
+                except Exception as e:
+                    count, error = 0, str(e)
+                self._crashes.pop(path, None)
+                elapsed = time.time() - started_at
+                self._latencies.append(time.time() - stable_at)
+                if error:
+                    self._failed += 1
+                    print(f"处理失败: {path.name}（{error}）")
+                else:
+                    self._done += 1
+                    self._images += count
+                    print(f"处理完成: {path.name}，{count} 张图片，用时 {elapsed:.1f} 秒")
+                # 失败的文件也记录下来，文件再次变化时才重试
+                self._processed[str(path)] = list(identity)
+        if finished:
+            self._save_state()
+
+    def _load_state(self):
+        try:
+            with open(self._state_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        try:
+            tmp = self._state_file.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._processed, f, ensure_ascii=False)
+            os.replace(tmp, self._state_file)
+        except OSError as e:
+            print(f"保存监控状态失败: {e}")
+
+    def _print_stats(self):
+        stats = self.stats()
+        line = (f"[统计] 等待稳定 {stats['pending']}，排队 {stats['queued']}，运行中 {stats['running']}，"
+                f"完成 {stats['done']}，失败 {stats['failed']}，图片 {stats['images']}")
+        if 'latency_avg' in stats:
+            line += f"，延迟 平均 {stats['latency_avg']:.1f}s / p95 {stats['latency_p95']:.1f}s"
+        print(line)
+
+
+def watch_main(argv=None):
+    """watch 子命令：监控文件夹"""
+    parser = argparse.ArgumentParser(prog="simple_excel_image_extractor.py watch",
+                                     description="监控文件夹，自动提取新放入的工作簿中的图片")
+    parser.add_argument("inbox", help="监控的目录")
+    parser.add_argument("-o", "--output-dir", default="extracted_images", help="输出根目录")
+    parser.add_argument("-j", "--workers", type=int, default=2, help="同时处理的工作簿数量")
+    parser.add_argument("--debounce", type=float, default=2.0, help="文件稳定多少秒后开始处理")
+    parser.add_argument("--poll", action="store_true", help="不使用 inotify，只定时扫描")
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="打印统计信息的间隔（秒）")
+    parser.add_argument("-k", "--key-column", help="关键列（表头名称或列字母），图片以该列的值命名")
+    parser.add_argument("--manifest", action="store_true", help="写出图片清单（JSONL）")
+    parser.add_argument("--catalog", help="把结果增量写入跨工作簿图片目录")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.inbox):
+        print(f"错误: 找不到目录 {args.inbox}")
+        return 1
+
+    options = {'key_column': args.key_column, 'manifest': args.manifest, 'catalog': args.catalog}
+    watcher = FolderWatcher(args.inbox, args.output_dir, workers=args.workers, debounce=args.debounce,
+                            use_inotify=not args.poll, extractor_options=options)
+    try:
+        watcher.run(stats_interval=args.stats_interval)
+    except KeyboardInterrupt:
+        print("停止监控")
+    return 0
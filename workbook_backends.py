@@ -0,0 +1,902 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作簿容器后端
+每种文件格式一个后端，在解压后的目录上提供：工作表列表、图片位置、表头和关键列的读取，
+以及媒体文件在压缩包中的位置（包索引）。输出、去重、清单等流程由提取器对所有格式共用。
+部件通过部件存储读取：默认是解压后的目录，加密工作簿直接从内存中的压缩包读取，不写到磁盘。
+- .xlsx/.xlsm：工作簿/工作表关系 + 绘图XML，表头流式读取工作表第一行
+- .xlsb：流式读取 BIFF12 二进制记录（工作簿、工作表、共享字符串），绘图部件仍是XML
+- .ods：流式解析 content.xml 中的表格和 draw:frame
+"""
+
+import bisect
+import math
+import os
+import re
+import shutil
+import struct
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# 支持的工作簿扩展名
+WORKBOOK_SUFFIXES = ('.xlsx', '.xlsm', '.xlsb', '.ods')
+
+# OOXML 命名空间
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+DRAWING_NS = {
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'xdr': 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing'
+}
+ANCHOR_TAGS = ('twoCellAnchor', 'oneCellAnchor', 'absoluteAnchor')
+
+_CELL_REF = re.compile(r'([A-Z]+)(\d*)')
+
+
+def column_letter_to_index(letters):
+    """列字母转换为从0开始的列索引，例如 A -> 0, AB -> 27"""
+    index = 0
+    for ch in letters.upper():
+        index = index * 26 + (ord(ch) - ord('A') + 1)
+    return index - 1
+
+
+def default_column_names():
+    return [f"列{i+1}" for i in range(26)]
+
+
+class ExtractedParts:
+    """
+    解压到目录中的部件，部件路径即文件路径。
+    fallback 为没有解压的部件的来源（例如远程工作簿的 ZipParts），只读取开头时不必下载整个部件
+    """
+
+    def __init__(self, root, fallback=None):
+        self.root = Path(root)
+        self.fallback = fallback
+
+    def _local(self, path):
+        return self.fallback is None or Path(path).exists()
+
+    def exists(self, path):
+        return Path(path).exists() or (self.fallback is not None and self.fallback.exists(path))
+
+    def open(self, path):
+        return open(path, 'rb') if self._local(path) else self.fallback.open(path)
+
+    def read_bytes(self, path):
+        return Path(path).read_bytes() if self._local(path) else self.fallback.read_bytes(path)
+
+    def copy(self, path, target):
+        if self._local(path):
+            shutil.copy2(path, target)
+        else:
+            self.fallback.copy(path, target)
+
+
+class ZipParts:
+    """
+    直接从压缩包（例如解密到内存中的工作簿）读取部件，不解压到磁盘。
+    部件路径与解压到 root 时相同，提取器和后端无需区分两种存储
+    """
+
+    def __init__(self, zip_ref, root):
+        self.zip_ref = zip_ref
+        self.root = Path(root)
+        self._names = set(zip_ref.namelist())
+
+    def _name(self, path):
+        try:
+            return Path(path).relative_to(self.root).as_posix()
+        except ValueError:
+            return None
+
+    def exists(self, path):
+        return self._name(path) in self._names
+
+    def open(self, path):
+        name = self._name(path)
+        if name not in self._names:
+            raise FileNotFoundError(f"压缩包中没有部件: {name}")
+        return self.zip_ref.open(name)
+
+    def read_bytes(self, path):
+        with self.open(path) as f:
+            return f.read()
+
+    def copy(self, path, target):
+        with self.open(path) as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+class ContainerBackend:
+    """
+    后端接口。图片位置为 {'image_file', 'row', 'col', 'anchor'} 字典，行列从0开始；
+    关键列索引为 {行号(从1开始): 关键值}
+    """
+
+    format = None
+    # 媒体文件在压缩包中的目录
+    media_prefix = None
+
+    def __init__(self, excel_file_path, root, parts=None):
+        self.excel_file_path = excel_file_path
+        self.root = Path(root)
+        self.parts = parts if parts is not None else ExtractedParts(root)
+
+    def _parse(self, path):
+        """解析一个XML部件，返回根元素"""
+        with self.parts.open(path) as f:
+            return ET.parse(f).getroot()
+
+    def _iterparse(self, path, events=('end',)):
+        """流式解析一个XML部件（提前结束迭代时关闭部件）"""
+        with self.parts.open(path) as f:
+            yield from ET.iterparse(f, events=events)
+
+    def sheet_names(self):
+        raise NotImplementedError
+
+    def sheet_part(self, sheet_name):
+        """工作表对应的部件路径（关键列从这里读取）"""
+        raise NotImplementedError
+
+    def placements(self, sheet_name, part):
+        raise NotImplementedError
+
+    def column_names(self, sheet_name):
+        raise NotImplementedError
+
+    def key_index(self, sheet_name, part, key_col, rows):
+        raise NotImplementedError
+
+    def key_parts(self, part):
+        """读取关键列需要的部件（使用缓存的结构时只解压这些部件）"""
+        return [part]
+
+    def index_parts(self, names):
+        """建立图片索引需要的部件（远程工作簿只下载这些，工作表数据在读取关键列时再补充）"""
+        return list(names)
+
+
+class XlsxBackend(ContainerBackend):
+    """.xlsx/.xlsm：工作表通过关系文件引用绘图部件"""
+
+    format = 'xlsx'
+    media_prefix = 'xl/media/'
+    workbook_part = 'xl/workbook.xml'
+    shared_strings_part = 'xl/sharedStrings.xml'
+    sheet_suffix = '.xml'
+
+    def sheet_names(self):
+        """获取工作表名称"""
+        try:
+            workbook_xml = self.root / self.workbook_part
+            if not self.parts.exists(workbook_xml):
+                return ["Sheet1"]  # 默认工作表名
+
+            root = self._parse(workbook_xml)
+
+            # 解析XML命名空间
+            namespaces = {'w': MAIN_NS}
+
+            sheet_names = []
+            for sheet in root.findall('.//w:sheet', namespaces):
+                name = sheet.get('name')
+                if name:
+                    sheet_names.append(name)
+
+            return sheet_names if sheet_names else ["Sheet1"]
+
+        except Exception as e:
+            print(f"获取工作表名称失败: {e}")
+            return ["Sheet1"]
+
+    def _sheet_rel_ids(self):
+        """工作表名称 -> 关系ID"""
+        root = self._parse(self.root / self.workbook_part)
+        return {sheet.get('name'): sheet.get(f'{{{REL_NS}}}id') for sheet in root.iter(f'{{{MAIN_NS}}}sheet')}
+
+    def sheet_part(self, sheet_name):
+        """通过工作簿的关系文件定位工作表部件，失败时按序号推测"""
+        index = 1
+        try:
+            rel_ids = self._sheet_rel_ids()
+            rels = self._read_rels(self.root / self.workbook_part)
+            rel = rels.get(rel_ids.get(sheet_name))
+            if rel:
+                return rel[1]
+            if sheet_name in rel_ids:
+                index = list(rel_ids).index(sheet_name) + 1
+        except Exception as e:
+            print(f"  定位工作表XML失败: {e}")
+
+        return self.root / "xl" / "worksheets" / f"sheet{index}{self.sheet_suffix}"
+
+    def _read_rels(self, part_path):
+        """读取部件的关系文件，返回 {关系ID: (关系类型, 目标路径)}"""
+        rels_file = part_path.parent / "_rels" / f"{part_path.name}.rels"
+        rels = {}
+        if not self.parts.exists(rels_file):
+            return rels
+
+        root = self._parse(rels_file)
+        for rel in root.iter(f'{{{PKG_REL_NS}}}Relationship'):
+            target = rel.get('Target')
+            if not target or rel.get('TargetMode') == 'External':
+                continue
+            if target.startswith('/'):
+                target_path = self.root / target.lstrip('/')
+            else:
+                target_path = part_path.parent / target
+            rel_type = rel.get('Type', '').rsplit('/', 1)[-1]
+            rels[rel.get('Id')] = (rel_type, Path(os.path.normpath(target_path)))
+        return rels
+
+    def placements(self, sheet_name, part):
+        """解析工作表关联的绘图，获取图片位置信息"""
+        try:
+            image_positions = []
+            # 工作表通过关系文件引用绘图部件，无需解析（可能很大的）工作表本身
+            for rel_type, drawing_path in self._read_rels(part).values():
+                if rel_type == 'drawing' and self.parts.exists(drawing_path):
+                    image_positions.extend(self._parse_drawing_xml(drawing_path))
+
+            return image_positions
+
+        except Exception as e:
+            print(f"    解析工作表XML失败: {e}")
+            return []
+
+    def _parse_drawing_xml(self, drawing_xml):
+        """解析绘图XML，返回每个图片锚点的位置与媒体文件"""
+        namespaces = DRAWING_NS
+        rels = self._read_rels(drawing_xml)
+        root = self._parse(drawing_xml)
+
+        image_positions = []
+        for anchor in root:
+            anchor_type = anchor.tag.rsplit('}', 1)[-1]
+            if anchor_type not in ANCHOR_TAGS:
+                continue
+
+            # 获取图片位置信息（absoluteAnchor 没有单元格位置）
+            col_idx = row_idx = 0
+            start = anchor.find('xdr:from', namespaces)
+            if start is not None:
+                col = start.find('xdr:col', namespaces)
+                row = start.find('xdr:row', namespaces)
+                col_idx = int(col.text) if col is not None and col.text else 0
+                row_idx = int(row.text) if row is not None and row.text else 0
+
+            # 组合图形中可能包含多张图片
+            for pic in anchor.iter(f"{{{namespaces['xdr']}}}pic"):
+                blip = pic.find('.//a:blip', namespaces)
+                if blip is None:
+                    continue
+                rel = rels.get(blip.get(f'{{{REL_NS}}}embed'))
+                if rel is None or not self.parts.exists(rel[1]):
+                    continue
+                image_positions.append({
+                    'col': col_idx,
+                    'row': row_idx,
+                    'anchor': anchor_type,
+                    'image_file': rel[1]
+                })
+
+        return image_positions
+
+    def column_names(self, sheet_name):
+        """
+        流式读取工作表第一行作为列名，读完第一行立即停止；共享字符串只解析到用到的最大索引。
+        空单元格（以及到工作表尺寸最右列之间的空位）为 列N
+        """
+        try:
+            part = self.sheet_part(sheet_name)
+            if not self.parts.exists(part):
+                return default_column_names()
+            raw_values, width = self._first_row(part)
+            shared_strings = self._load_shared_strings(
+                {int(v) for t, v in raw_values.values() if t == 's' and v.isdigit()})
+        except Exception as e:
+            print(f"    读取列名失败: {e}")
+            return default_column_names()
+
+        column_names = []
+        for col in range(width):
+            value = self._header_value(*raw_values[col], shared_strings) if col in raw_values else None
+            column_names.append(str(value) if value else f"列{col + 1}")
+        return column_names
+
+    def _first_row(self, part):
+        """返回第一行的 ({列索引: (类型, 原始值)}, 列数)，列数至少为工作表尺寸（dimension）的列数"""
+        dimension_tag = f'{{{MAIN_NS}}}dimension'
+        row_tag = f'{{{MAIN_NS}}}row'
+        cell_tag = f'{{{MAIN_NS}}}c'
+        raw_values = {}
+        width = 0
+        col = -1
+        for event, elem in self._iterparse(part, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == dimension_tag:
+                    match = _CELL_REF.match(elem.get('ref', '').rsplit(':', 1)[-1])
+                    if match and match.group(1):
+                        width = column_letter_to_index(match.group(1)) + 1
+                elif tag == row_tag:
+                    r = elem.get('r')
+                    if r and int(r) != 1:
+                        # 第一行没有任何单元格
+                        break
+                elif tag == cell_tag:
+                    ref = elem.get('r')
+                    match = _CELL_REF.match(ref) if ref else None
+                    col = column_letter_to_index(match.group(1)) if match else col + 1
+                continue
+
+            if tag == cell_tag:
+                raw_values[col] = self._read_cell_value(elem)
+                width = max(width, col + 1)
+            elif tag == row_tag:
+                break
+        return raw_values, width
+
+    def _header_value(self, cell_type, value, shared_strings):
+        """把单元格原始值转换为 Python 值（与 openpyxl 读取的值一致：数字、布尔、文本）"""
+        if cell_type == 's':
+            return shared_strings.get(int(value)) if value.isdigit() else None
+        if cell_type == 'b':
+            return value == '1'
+        if cell_type == 'n':
+            for convert in (int, float):
+                try:
+                    return convert(value)
+                except ValueError:
+                    continue
+            return None
+        return value
+
+    def key_parts(self, part):
+        return [part, self.root / self.shared_strings_part]
+
+    def index_parts(self, names):
+        # 工作簿、所有关系文件、绘图和媒体；工作表本身只通过关系文件引用绘图，不需要下载
+        return [name for name in names
+                if name in (self.workbook_part, '[Content_Types].xml') or name.endswith('.rels')
+                or name.startswith(('xl/drawings/', self.media_prefix))]
+
+    def key_index(self, sheet_name, part, key_col, rows):
+        """
+        流式扫描工作表XML，建立 行号(从1开始) -> 关键列值 的索引
+
+        只记录 rows 中的行，超过最大行号后立即停止；共享字符串只解析用到的部分。
+        """
+        if not rows:
+            return {}
+
+        cell_tag = f'{{{MAIN_NS}}}c'
+        row_tag = f'{{{MAIN_NS}}}row'
+        sheet_data_tag = f'{{{MAIN_NS}}}sheetData'
+        max_row = max(rows)
+
+        raw_values = {}  # 行号 -> (单元格类型, 原始值)
+        sheet_data = None
+        current_row = 0
+        current_col = -1
+
+        for event, elem in self._iterparse(part, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == row_tag:
+                    r = elem.get('r')
+                    current_row = int(r) if r else current_row + 1
+                    current_col = -1
+                elif tag == cell_tag:
+                    ref = elem.get('r')
+                    match = _CELL_REF.match(ref) if ref else None
+                    current_col = column_letter_to_index(match.group(1)) if match else current_col + 1
+                elif tag == sheet_data_tag:
+                    sheet_data = elem
+                continue
+
+            if tag == cell_tag:
+                if current_col == key_col and current_row in rows:
+                    raw_values[current_row] = self._read_cell_value(elem)
+            elif tag == row_tag:
+                if current_row >= max_row:
+                    break
+                # 已处理的行及时释放，保证内存不随行数增长
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+        return self._resolve_shared(raw_values)
+
+    def _resolve_shared(self, raw_values):
+        """把 {行号: (类型, 原始值)} 中的共享字符串替换为文本，去掉空值"""
+        shared_indexes = {int(v) for t, v in raw_values.values() if t == 's' and v.isdigit()}
+        shared_strings = self._load_shared_strings(shared_indexes)
+
+        key_values = {}
+        for row, (cell_type, value) in raw_values.items():
+            if cell_type == 's':
+                value = shared_strings.get(int(value)) if value.isdigit() else None
+            if value is not None and value.strip():
+                key_values[row] = value.strip()
+        return key_values
+
+    def _read_cell_value(self, cell):
+        """读取单元格原始值，返回 (类型, 文本)"""
+        cell_type = cell.get('t', 'n')
+        if cell_type == 'inlineStr':
+            texts = [t.text or '' for t in cell.iter(f'{{{MAIN_NS}}}t')]
+            return 'str', ''.join(texts)
+        v = cell.find(f'{{{MAIN_NS}}}v')
+        return cell_type, (v.text or '') if v is not None else ''
+
+    def _load_shared_strings(self, indexes):
+        """流式读取共享字符串表，只保留需要的索引"""
+        shared_strings = {}
+        sst_xml = self.root / self.shared_strings_part
+        if not indexes or not self.parts.exists(sst_xml):
+            return shared_strings
+
+        si_tag = f'{{{MAIN_NS}}}si'
+        t_tag = f'{{{MAIN_NS}}}t'
+        rph_tag = f'{{{MAIN_NS}}}rPh'
+        max_index = max(indexes)
+        index = 0
+        for event, elem in self._iterparse(sst_xml):
+            if elem.tag != si_tag:
+                continue
+            if index in indexes:
+                # 忽略注音（rPh）中的文本
+                texts = [t.text or '' for child in elem if child.tag != rph_tag for t in child.iter(t_tag)]
+                shared_strings[index] = ''.join(texts)
+            if index >= max_index:
+                break
+            index += 1
+            elem.clear()
+        return shared_strings
+
+
+# BIFF12 记录类型
+BRT_ROW_HDR = 0
+BRT_CELL_BLANK = 1
+BRT_CELL_RK = 2
+BRT_CELL_ERROR = 3
+BRT_CELL_BOOL = 4
+BRT_CELL_REAL = 5
+BRT_CELL_ST = 6
+BRT_CELL_ISST = 7
+BRT_FMLA_STRING = 8
+BRT_FMLA_NUM = 9
+BRT_FMLA_BOOL = 10
+BRT_FMLA_ERROR = 11
+BRT_SST_ITEM = 19
+BRT_CELL_RSTRING = 62
+BRT_END_SHEET_DATA = 146
+BRT_WS_DIM = 148
+BRT_BUNDLE_SH = 156
+
+_BIFF12_ERRORS = {0x00: '#NULL!', 0x07: '#DIV/0!', 0x0F: '#VALUE!', 0x17: '#REF!',
+                  0x1D: '#NAME?', 0x24: '#NUM!', 0x2A: '#N/A', 0x2B: '#GETTING_DATA'}
+_UINT32 = struct.Struct('<I')
+_DOUBLE = struct.Struct('<d')
+
+
+def iter_biff12_records(f, chunk_size=1024 * 1024):
+    """
+    流式读取 BIFF12 记录，产出 (记录类型, 数据)
+
+    记录类型和长度都是变长整数（每字节7位，最高位表示后面还有字节），按块读取文件
+    """
+    buf = b''
+    pos = 0
+    while True:
+        if len(buf) - pos < 6:
+            buf = buf[pos:] + f.read(chunk_size)
+            pos = 0
+            if not buf:
+                return
+        try:
+            b = buf[pos]
+            pos += 1
+            rec_type = b & 0x7F
+            if b & 0x80:
+                b = buf[pos]
+                pos += 1
+                rec_type |= (b & 0x7F) << 7
+            size = shift = 0
+            for _ in range(4):
+                b = buf[pos]
+                pos += 1
+                size |= (b & 0x7F) << shift
+                shift += 7
+                if not b & 0x80:
+                    break
+        except IndexError:
+            return  # 文件被截断
+        end = pos + size
+        if end > len(buf):
+            buf = buf[pos:] + f.read(max(chunk_size, size))
+            pos, end = 0, size
+            if end > len(buf):
+                return
+        yield rec_type, buf[pos:end]
+        pos = end
+
+
+def _wide_string(data, offset=0):
+    """读取 XLWideString（4字节字符数 + UTF-16LE），返回 (文本, 结束位置)；长度为 0xFFFFFFFF 表示空值"""
+    count = _UINT32.unpack_from(data, offset)[0]
+    offset += 4
+    if count == 0xFFFFFFFF:
+        return None, offset
+    end = offset + count * 2
+    return data[offset:end].decode('utf-16-le', errors='replace'), end
+
+
+def _rk_number(value):
+    """RkNumber：最低两位为 除以100、整数 标志"""
+    if value & 0x02:
+        number = value >> 2
+        if number & 0x20000000:
+            number -= 0x40000000
+    else:
+        number = _DOUBLE.unpack(struct.pack('<Q', (value & 0xFFFFFFFC) << 32))[0]
+    return number / 100 if value & 0x01 else number
+
+
+def _format_number(number):
+    """数字转为文本，整数不带小数点（与 .xlsx 中的原始值一致）"""
+    if isinstance(number, float) and number.is_integer() and not math.isinf(number):
+        return str(int(number))
+    return repr(number) if isinstance(number, float) else str(number)
+
+
+class XlsbBackend(XlsxBackend):
+    """.xlsb：工作簿、工作表、共享字符串为 BIFF12 二进制记录，关系文件和绘图部件与 .xlsx 相同"""
+
+    format = 'xlsb'
+    workbook_part = 'xl/workbook.bin'
+    shared_strings_part = 'xl/sharedStrings.bin'
+    sheet_suffix = '.bin'
+
+    def _bundle_sheets(self):
+        """BrtBundleSh 记录：[(工作表名, 关系ID)]"""
+        sheets = []
+        with self.parts.open(self.root / self.workbook_part) as f:
+            for rec_type, data in iter_biff12_records(f):
+                if rec_type == BRT_BUNDLE_SH:
+                    rel_id, offset = _wide_string(data, 8)
+                    name, _ = _wide_string(data, offset)
+                    sheets.append((name, rel_id))
+        return sheets
+
+    def sheet_names(self):
+        try:
+            names = [name for name, _ in self._bundle_sheets() if name]
+            return names if names else ["Sheet1"]
+        except Exception as e:
+            print(f"获取工作表名称失败: {e}")
+            return ["Sheet1"]
+
+    def _sheet_rel_ids(self):
+        return dict(self._bundle_sheets())
+
+    def _iter_cells(self, part, max_row=None):
+        """
+        流式产出 (行号从0开始, 列号, 类型, 值)，类型为 's'（共享字符串索引）、'str'、'n'、'b'、'e'；
+        超过 max_row 或工作表数据结束时停止
+        """
+        row = -1
+        with self.parts.open(part) as f:
+            for rec_type, data in iter_biff12_records(f):
+                if rec_type == BRT_ROW_HDR:
+                    row = _UINT32.unpack_from(data)[0]
+                    if max_row is not None and row > max_row:
+                        return
+                    continue
+                if rec_type == BRT_END_SHEET_DATA:
+                    return
+                if rec_type == BRT_WS_DIM:
+                    yield None, struct.unpack_from('<4i', data)[3], 'dim', None
+                    continue
+                if not BRT_CELL_BLANK < rec_type <= BRT_FMLA_ERROR and rec_type != BRT_CELL_RSTRING:
+                    continue
+                col = _UINT32.unpack_from(data)[0]
+                if rec_type == BRT_CELL_ISST:
+                    yield row, col, 's', _UINT32.unpack_from(data, 8)[0]
+                elif rec_type in (BRT_CELL_ST, BRT_FMLA_STRING):
+                    yield row, col, 'str', _wide_string(data, 8)[0]
+                elif rec_type == BRT_CELL_RSTRING:
+                    yield row, col, 'str', _wide_string(data, 9)[0]
+                elif rec_type == BRT_CELL_RK:
+                    yield row, col, 'n', _format_number(_rk_number(_UINT32.unpack_from(data, 8)[0]))
+                elif rec_type in (BRT_CELL_REAL, BRT_FMLA_NUM):
+                    yield row, col, 'n', _format_number(_DOUBLE.unpack_from(data, 8)[0])
+                elif rec_type in (BRT_CELL_BOOL, BRT_FMLA_BOOL):
+                    yield row, col, 'b', '1' if data[8] else '0'
+                else:
+                    yield row, col, 'e', _BIFF12_ERRORS.get(data[8], '#ERR')
+
+    def column_names(self, sheet_name):
+        """流式读取第一行作为列名，列数取工作表尺寸（与 openpyxl 的 max_column 一致）"""
+        try:
+            headers = {}
+            last_col = -1
+            for row, col, cell_type, value in self._iter_cells(self.sheet_part(sheet_name), max_row=0):
+                if cell_type == 'dim':
+                    last_col = col
+                elif row == 0:
+                    headers[col] = (cell_type, value)
+            if headers:
+                last_col = max(last_col, max(headers))
+            shared = self._load_shared_strings({v for t, v in headers.values() if t == 's'})
+            column_names = []
+            for col in range(last_col + 1):
+                cell_type, value = headers.get(col, (None, None))
+                if cell_type == 's':
+                    value = shared.get(value)
+                elif cell_type == 'b':
+                    value = 'True' if value == '1' else None
+                if value:
+                    column_names.append(str(value))
+                else:
+                    column_names.append(f"列{len(column_names)+1}")
+            return column_names if column_names else default_column_names()
+        except Exception as e:
+            print(f"    读取列名失败: {e}")
+        return default_column_names()
+
+    def key_index(self, sheet_name, part, key_col, rows):
+        """流式扫描工作表记录，建立 行号(从1开始) -> 关键列值 的索引"""
+        if not rows:
+            return {}
+        raw_values = {}
+        for row, col, cell_type, value in self._iter_cells(part, max_row=max(rows) - 1):
+            if col == key_col and row is not None and row + 1 in rows:
+                raw_values[row + 1] = (cell_type, str(value) if value is not None else '')
+        return self._resolve_shared(raw_values)
+
+    def _load_shared_strings(self, indexes):
+        """流式读取 BrtSSTItem 记录，只保留需要的索引"""
+        shared_strings = {}
+        sst_bin = self.root / self.shared_strings_part
+        if not indexes or not self.parts.exists(sst_bin):
+            return shared_strings
+        max_index = max(indexes)
+        index = 0
+        with self.parts.open(sst_bin) as f:
+            for rec_type, data in iter_biff12_records(f):
+                if rec_type != BRT_SST_ITEM:
+                    continue
+                if index in indexes:
+                    # RichStr：1字节标志 + XLWideString（忽略格式和注音）
+                    shared_strings[index] = _wide_string(data, 1)[0] or ''
+                if index >= max_index:
+                    break
+                index += 1
+        return shared_strings
+
+
+# OpenDocument 命名空间
+ODS_NS = {
+    'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0',
+    'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
+    'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
+    'draw': 'urn:oasis:names:tc:opendocument:xmlns:drawing:1.0',
+    'xlink': 'http://www.w3.org/1999/xlink',
+}
+_T = f"{{{ODS_NS['table']}}}"
+_O = f"{{{ODS_NS['office']}}}"
+_ODS_TABLE = _T + 'table'
+_ODS_ROW = _T + 'table-row'
+_ODS_CELL = _T + 'table-cell'
+_ODS_COVERED = _T + 'covered-table-cell'
+_ODS_SHAPES = _T + 'shapes'
+_ODS_FRAME = f"{{{ODS_NS['draw']}}}frame"
+_ODS_IMAGE = f"{{{ODS_NS['draw']}}}image"
+_ODS_P = f"{{{ODS_NS['text']}}}p"
+_ODS_HREF = f"{{{ODS_NS['xlink']}}}href"
+# 重复的空单元格最多展开的列数（行尾常有上千个重复的空单元格）
+_ODS_MAX_REPEAT = 1024
+
+
+class OdsBackend(ContainerBackend):
+    """.ods：表格、单元格和锚定在单元格上的 draw:frame 都在 content.xml 中"""
+
+    format = 'ods'
+    media_prefix = 'Pictures/'
+    content_part = 'content.xml'
+
+    def __init__(self, excel_file_path, root, parts=None):
+        super().__init__(excel_file_path, root, parts)
+        # 工作表 -> {'positions': [...], 'header': [...]}，一次扫描得到所有工作表
+        self._tables = None
+
+    def _iter_content(self, part):
+        """
+        流式解析 content.xml 的 start/end 事件。处理完的行清空后从父元素
+        （表格或行组）上移除，内存占用不随行数增长
+        """
+        parents = []
+        for event, elem in self._iterparse(part, events=('start', 'end')):
+            if event == 'start':
+                parents.append(elem)
+                yield event, elem
+                continue
+            parents.pop()
+            yield event, elem
+            if elem.tag == _ODS_ROW:
+                elem.clear()
+                if parents:
+                    parents[-1].remove(elem)
+
+    def _scan(self):
+        """流式扫描 content.xml，记录每个表格的图片位置和第一行"""
+        if self._tables is not None:
+            return self._tables
+        self._tables = tables = {}
+        content = self.root / self.content_part
+        if not self.parts.exists(content):
+            return tables
+
+        table = None
+        row = col = -1
+        in_shapes = False
+        for event, elem in self._iter_content(content):
+            tag = elem.tag
+            if event == 'start':
+                if tag == _ODS_TABLE:
+                    table = tables.setdefault(elem.get(_T + 'name') or f"Sheet{len(tables) + 1}",
+                                              {'positions': [], 'header': []})
+                    row = -1
+                elif tag == _ODS_ROW:
+                    row += 1
+                    col = -1
+                elif tag in (_ODS_CELL, _ODS_COVERED):
+                    col += 1
+                elif tag == _ODS_SHAPES:
+                    in_shapes = True
+                continue
+
+            if tag in (_ODS_CELL, _ODS_COVERED):
+                repeat = int(elem.get(_T + 'number-columns-repeated', 1))
+                if row == 0 and table is not None:
+                    value = self._cell_value(elem) if tag == _ODS_CELL else ''
+                    table['header'].extend([value] * (repeat if value else min(repeat, _ODS_MAX_REPEAT)))
+                col += repeat - 1
+            elif tag == _ODS_ROW:
+                row += int(elem.get(_T + 'number-rows-repeated', 1)) - 1
+            elif tag == _ODS_FRAME and table is not None:
+                image = elem.find(_ODS_IMAGE)
+                href = image.get(_ODS_HREF) if image is not None else None
+                image_file = self.root / href if href and '://' not in href else None
+                if image_file is None or not self.parts.exists(image_file):
+                    continue
+                if in_shapes:
+                    # 锚定在页面上的图形没有单元格位置
+                    position = (0, 0, 'absoluteAnchor')
+                else:
+                    anchor = 'twoCellAnchor' if elem.get(_T + 'end-cell-address') else 'oneCellAnchor'
+                    position = (row, max(col, 0), anchor)
+                table['positions'].append({'row': position[0], 'col': position[1], 'anchor': position[2],
+                                           'image_file': Path(os.path.normpath(image_file))})
+            elif tag == _ODS_SHAPES:
+                in_shapes = False
+            elif tag == _ODS_TABLE:
+                elem.clear()
+        return tables
+
+    def _cell_value(self, cell):
+        """单元格的值：数字、日期等取属性中的原始值，文本取各段落"""
+        value_type = cell.get(_O + 'value-type')
+        if value_type in ('float', 'percentage', 'currency'):
+            return cell.get(_O + 'value', '')
+        if value_type in ('date', 'time', 'boolean'):
+            return cell.get(_O + f'{value_type}-value', '')
+        return '\n'.join(''.join(p.itertext()) for p in cell.findall(_ODS_P))
+
+    def sheet_names(self):
+        try:
+            names = list(self._scan())
+            return names if names else ["Sheet1"]
+        except Exception as e:
+            print(f"获取工作表名称失败: {e}")
+            return ["Sheet1"]
+
+    def sheet_part(self, sheet_name):
+        return self.root / self.content_part
+
+    def index_parts(self, names):
+        return [name for name in names if name == self.content_part or name.startswith(self.media_prefix)]
+
+    def placements(self, sheet_name, part):
+        try:
+            return list(self._scan().get(sheet_name, {}).get('positions', []))
+        except Exception as e:
+            print(f"    解析 content.xml 失败: {e}")
+            return []
+
+    def column_names(self, sheet_name):
+        try:
+            header = list(self._scan().get(sheet_name, {}).get('header', []))
+        except Exception as e:
+            print(f"    读取列名失败: {e}")
+            return default_column_names()
+        while header and not header[-1]:
+            header.pop()
+        if not header:
+            return default_column_names()
+        return [value if value else f"列{i+1}" for i, value in enumerate(header)]
+
+    def key_index(self, sheet_name, part, key_col, rows):
+        """流式扫描目标表格的行，超过最大行号后立即停止"""
+        if not rows:
+            return {}
+        rows = set(rows)
+        # 重复的行按范围查找：在排序后的图片行号中二分
+        ordered_rows = sorted(rows)
+        max_row = ordered_rows[-1]
+        key_values = {}
+        in_table = False
+        row = col = 0
+        value = None
+        for event, elem in self._iter_content(part):
+            tag = elem.tag
+            if event == 'start':
+                if tag == _ODS_TABLE:
+                    in_table = elem.get(_T + 'name') == sheet_name
+                    row = 0
+                elif in_table and tag == _ODS_ROW:
+                    row += 1
+                    col = -1
+                    value = None
+                elif in_table and tag in (_ODS_CELL, _ODS_COVERED):
+                    col += 1
+                continue
+
+            if tag == _ODS_ROW:
+                if in_table:
+                    # 重复的行（number-rows-repeated）内容相同
+                    repeat = int(elem.get(_T + 'number-rows-repeated', 1))
+                    if value and repeat == 1:
+                        if row in rows:
+                            key_values[row] = value
+                    elif value:
+                        start = bisect.bisect_left(ordered_rows, row)
+                        end = bisect.bisect_left(ordered_rows, row + repeat)
+                        for r in ordered_rows[start:end]:
+                            key_values[r] = value
+                    row += repeat - 1
+                if in_table and row >= max_row:
+                    break
+            elif in_table and tag in (_ODS_CELL, _ODS_COVERED):
+                repeat = int(elem.get(_T + 'number-columns-repeated', 1))
+                if tag == _ODS_CELL and col <= key_col < col + repeat:
+                    value = self._cell_value(elem).strip()
+                col += repeat - 1
+            elif in_table and tag == _ODS_TABLE:
+                break
+        return key_values
+
+
+BACKENDS = {backend.format: backend for backend in (XlsxBackend, XlsbBackend, OdsBackend)}
+
+
+def detect_format(names):
+    """根据压缩包中的部件判断格式（不依赖扩展名）"""
+    names = set(names)
+    if XlsbBackend.workbook_part in names:
+        return 'xlsb'
+    if OdsBackend.content_part in names and XlsxBackend.workbook_part not in names:
+        return 'ods'
+    return 'xlsx'
+
+
+def open_backend(fmt, excel_file_path, root, parts=None):
+    """按格式创建后端；parts 为部件存储，默认读取解压到 root 的文件"""
+    return BACKENDS[fmt](excel_file_path, root, parts)
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+加密工作簿解密
+设置了打开密码的工作簿是 OLE2 复合文档，其中 EncryptionInfo 流保存加密参数，
+EncryptedPackage 流是加密后的 .xlsx 压缩包。本模块按扇区链流式读取 EncryptedPackage，
+逐段（4096 字节）解密到内存（或超过上限时溢出到临时文件）中的可寻址缓冲区，
+zipfile 直接从缓冲区读取，解密后的工作簿不会写到磁盘上。
+只支持 Office 2010 及以后使用的 Agile 加密（AES-CBC）；AES 由可选依赖 cryptography 提供
+"""
+
+import base64
+import contextlib
+import hashlib
+import hmac
+import struct
+import tempfile
+import xml.etree.ElementTree as ET
+
+OLE2_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+# EncryptedPackage 每段的明文长度，每段使用独立的初始向量
+SEGMENT_SIZE = 4096
+
+_ENCRYPTION_NS = '{http://schemas.microsoft.com/office/2006/encryption}'
+_PASSWORD_NS = '{http://schemas.microsoft.com/office/2006/keyEncryptor/password}'
+# Agile 加密中派生各个密钥和初始向量使用的块标识
+_BLOCK_VERIFIER_INPUT = bytes.fromhex('fea7d2763b4b9e79')
+_BLOCK_VERIFIER_VALUE = bytes.fromhex('d7aa0f6d3061344e')
+_BLOCK_KEY_VALUE = bytes.fromhex('146e0be7abacd0d6')
+_BLOCK_HMAC_KEY = bytes.fromhex('5fb2ad010cb9e1f6')
+_BLOCK_HMAC_VALUE = bytes.fromhex('a0677f02b22c8433')
+
+# 复合文档扇区编号中的特殊值
+_MAX_REGULAR_SECTOR = 0xFFFFFFFA
+_HEADER = struct.Struct('<8s16sHHHHH6sIIIIIIIII')
+_DIRECTORY_ENTRY = struct.Struct('<64sHBBIII16sIQQIQ')
+
+
+class EncryptedWorkbookError(Exception):
+    """加密工作簿无法解密（缺少密码、密码错误、不支持的加密方式或文件损坏）"""
+
+
+def is_compound_file(path_or_file):
+    """文件是否为 OLE2 复合文档（加密的 .xlsx 或旧版 .xls）"""
+    if hasattr(path_or_file, 'read'):
+        position = path_or_file.tell()
+        signature = path_or_file.read(len(OLE2_SIGNATURE))
+        path_or_file.seek(position)
+    else:
+        with open(path_or_file, 'rb') as f:
+            signature = f.read(len(OLE2_SIGNATURE))
+    return signature == OLE2_SIGNATURE
+
+
+class _ChainReader:
+    """按扇区链顺序读取一个流（只向前读，相邻扇区合并为一次读取）"""
+
+    def __init__(self, f, offsets, sector_size, size):
+        self._f = f
+        self._offsets = offsets
+        self._sector_size = sector_size
+        self.remaining = size
+        # 当前扇区及已读取的字节数
+        self._index = 0
+        self._within = 0
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        parts = []
+        while size > 0 and self._index < len(self._offsets):
+            first = self._offsets[self._index]
+            available = self._sector_size - self._within
+            count = 1
+            while (available < size and self._index + count < len(self._offsets)
+                   and self._offsets[self._index + count] == first + count * self._sector_size):
+                available += self._sector_size
+                count += 1
+            length = min(size, available)
+            self._f.seek(first + self._within)
+            data = self._f.read(length)
+            if len(data) < length:
+                raise EncryptedWorkbookError("复合文档被截断")
+            parts.append(data)
+            size -= length
+            self.remaining -= length
+            advanced, self._within = divmod(self._within + length, self._sector_size)
+            self._index += advanced
+        return b''.join(parts)
+
+
+class CompoundFile:
+    """只读的 OLE2 复合文档（CFB）解析，只支持按名称读取根存储下的流"""
+
+    def __init__(self, f):
+        self._f = f
+        f.seek(0)
+        header = f.read(512)
+        if len(header) < 512:
+            raise EncryptedWorkbookError("复合文档头不完整")
+        (signature, _, _, major, byte_order, sector_shift, mini_shift, _, _, fat_count, first_dir,
+         _, self._mini_cutoff, first_mini_fat, mini_fat_count, first_difat, difat_count) = _HEADER.unpack_from(header)
+        if signature != OLE2_SIGNATURE or byte_order != 0xFFFE:
+            raise EncryptedWorkbookError("不是有效的复合文档")
+        self.sector_size = 1 << sector_shift
+        self.mini_sector_size = 1 << mini_shift
+
+        # 主扇区分配表（FAT）所在的扇区：文件头中的 109 项，其余在 DIFAT 扇区链中
+        fat_sectors = list(struct.unpack_from('<109I', header, _HEADER.size))
+        per_sector = self.sector_size // 4
+        sector = first_difat
+        for _ in range(difat_count):
+            if sector > _MAX_REGULAR_SECTOR:
+                break
+            entries = struct.unpack(f'<{per_sector}I', self._read_sector(sector))
+            fat_sectors.extend(entries[:-1])
+            sector = entries[-1]
+        fat_sectors = [s for s in fat_sectors if s <= _MAX_REGULAR_SECTOR][:fat_count]
+        self._fat = []
+        for sector in fat_sectors:
+            self._fat.extend(struct.unpack(f'<{per_sector}I', self._read_sector(sector)))
+
+        directory = b''.join(self._read_sector(s) for s in self._chain(first_dir))
+        self._entries = {}
+        root = None
+        for offset in range(0, len(directory) - _DIRECTORY_ENTRY.size + 1, _DIRECTORY_ENTRY.size):
+            (raw_name, name_length, kind, _, _, _, _, _, _, _, _, start, size) = \
+                _DIRECTORY_ENTRY.unpack_from(directory, offset)
+            if kind == 0:
+                continue
+            name = raw_name[:max(0, name_length - 2)].decode('utf-16-le', errors='replace')
+            if major == 3:
+                # 版本 3 的文件中大小的高 32 位可能是未初始化的数据
+                size &= 0xFFFFFFFF
+            if kind == 5:
+                root = (start, size)
+            elif kind == 2:
+                self._entries.setdefault(name.casefold(), (start, size))
+
+        self._mini_fat = []
+        for sector in self._chain(first_mini_fat)[:mini_fat_count]:
+            self._mini_fat.extend(struct.unpack(f'<{per_sector}I', self._read_sector(sector)))
+        self._mini_stream = root and [self._sector_offset(s) for s in self._chain(root[0])]
+
+    def _sector_offset(self, sector):
+        return (sector + 1) * self.sector_size
+
+    def _read_sector(self, sector):
+        self._f.seek(self._sector_offset(sector))
+        data = self._f.read(self.sector_size)
+        if len(data) < self.sector_size:
+            raise EncryptedWorkbookError("复合文档被截断")
+        return data
+
+    def _chain(self, start, table=None):
+        """扇区链（带环检测）"""
+        table = self._fat if table is None else table
+        chain = []
+        sector = start
+        while sector <= _MAX_REGULAR_SECTOR:
+            if sector >= len(table) or len(chain) > len(table):
+                raise EncryptedWorkbookError("复合文档的扇区链损坏")
+            chain.append(sector)
+            sector = table[sector]
+        return chain
+
+    def has_stream(self, name):
+        return name.casefold() in self._entries
+
+    def open_stream(self, name):
+        """
+        打开根存储下的流
+
+        Returns:
+            有 read(size) 方法的对象，按顺序读取流的内容
+        """
+        entry = self._entries.get(name.casefold())
+        if entry is None:
+            raise EncryptedWorkbookError(f"复合文档中没有 {name} 流")
+        start, size = entry
+        if size < self._mini_cutoff:
+            # 小流保存在迷你流中，按 64 字节的迷你扇区分配
+            offsets = []
+            for mini_sector in self._chain(start, self._mini_fat):
+                position = mini_sector * self.mini_sector_size
+                sector, within = divmod(position, self.sector_size)
+                if not self._mini_stream or sector >= len(self._mini_stream):
+                    raise EncryptedWorkbookError("复合文档的迷你流损坏")
+                offsets.append(self._mini_stream[sector] + within)
+            return _ChainReader(self._f, offsets, self.mini_sector_size, size)
+        offsets = [self._sector_offset(s) for s in self._chain(start)]
+        return _ChainReader(self._f, offsets, self.sector_size, size)
+
+    def read_stream(self, name):
+        return self.open_stream(name).read()
+
+
+def _fix_size(data, size, pad=b'\x36'):
+    """截断或用填充字节补足到指定长度（Agile 加密派生密钥和初始向量的规则）"""
+    return data[:size] if len(data) >= size else data + pad * (size - len(data))
+
+
+class AgileEncryption:
+    """Agile 加密参数（EncryptionInfo 流中的 XML）"""
+
+    def __init__(self, info):
+        if len(info) < 8:
+            raise EncryptedWorkbookError("EncryptionInfo 不完整")
+        major, minor = struct.unpack_from('<HH', info)
+        if (major, minor) != (4, 4):
+            raise EncryptedWorkbookError(
+                f"不支持的加密方式（版本 {major}.{minor}），只支持 Office 2010 及以后的 Agile 加密")
+        try:
+            root = ET.fromstring(info[8:])
+        except ET.ParseError as e:
+            raise EncryptedWorkbookError(f"EncryptionInfo 解析失败: {e}")
+        key_data = root.find(f'{_ENCRYPTION_NS}keyData')
+        password_key = root.find(f'{_ENCRYPTION_NS}keyEncryptors/{_ENCRYPTION_NS}keyEncryptor/{_PASSWORD_NS}encryptedKey')
+        if key_data is None or password_key is None:
+            raise EncryptedWorkbookError("工作簿没有使用密码加密")
+        for params in (key_data, password_key):
+            if params.get('cipherAlgorithm') != 'AES' or params.get('cipherChaining') != 'ChainingModeCBC':
+                raise EncryptedWorkbookError(
+                    f"不支持的加密算法: {params.get('cipherAlgorithm')} {params.get('cipherChaining')}")
+        integrity = root.find(f'{_ENCRYPTION_NS}dataIntegrity')
+
+        self.key_data = self._params(key_data)
+        self.password_key = self._params(password_key)
+        self.spin_count = int(password_key.get('spinCount'))
+        self.encrypted_verifier_input = base64.b64decode(password_key.get('encryptedVerifierHashInput'))
+        self.encrypted_verifier_value = base64.b64decode(password_key.get('encryptedVerifierHashValue'))
+        self.encrypted_key_value = base64.b64decode(password_key.get('encryptedKeyValue'))
+        self.encrypted_hmac_key = self.encrypted_hmac_value = None
+        if integrity is not None:
+            self.encrypted_hmac_key = base64.b64decode(integrity.get('encryptedHmacKey'))
+            self.encrypted_hmac_value = base64.b64decode(integrity.get('encryptedHmacValue'))
+
+    @staticmethod
+    def _params(element):
+        algorithm = element.get('hashAlgorithm', '').lower()
+        if algorithm not in ('sha1', 'sha256', 'sha384', 'sha512', 'md5'):
+            raise EncryptedWorkbookError(f"不支持的哈希算法: {element.get('hashAlgorithm')}")
+        return {'salt': base64.b64decode(element.get('saltValue')), 'hash': algorithm,
+                'hash_size': int(element.get('hashSize')), 'block_size': int(element.get('blockSize')),
+                'key_bytes': int(element.get('keyBits')) // 8}
+
+    def package_key(self, password):
+        """
+        由密码得到解密数据包的密钥
+
+        Raises:
+            EncryptedWorkbookError: 密码错误
+        """
+        params = self.password_key
+        algorithm = params['hash']
+        digest = hashlib.new(algorithm, params['salt'] + password.encode('utf-16-le')).digest()
+        for i in range(self.spin_count):
+            digest = hashlib.new(algorithm, struct.pack('<I', i) + digest).digest()
+
+        def decrypt(block_key, data):
+            key = _fix_size(hashlib.new(algorithm, digest + block_key).digest(), params['key_bytes'])
+            return _aes_cbc_decrypt(key, _fix_size(params['salt'], params['block_size']), data)
+
+        verifier_input = decrypt(_BLOCK_VERIFIER_INPUT, self.encrypted_verifier_input)[:len(params['salt'])]
+        verifier_value = decrypt(_BLOCK_VERIFIER_VALUE, self.encrypted_verifier_value)[:params['hash_size']]
+        if not hmac.compare_digest(hashlib.new(algorithm, verifier_input).digest(), verifier_value):
+            raise EncryptedWorkbookError("密码错误")
+        return decrypt(_BLOCK_KEY_VALUE, self.encrypted_key_value)[:self.key_data['key_bytes']]
+
+    def segment_iv(self, block_key):
+        params = self.key_data
+        return _fix_size(hashlib.new(params['hash'], params['salt'] + block_key).digest(), params['block_size'])
+
+    def integrity_check(self, key):
+        """
+        数据完整性校验：返回 (HMAC 对象, 期望值)，没有 dataIntegrity 时返回 (None, None)。
+        HMAC 覆盖整个 EncryptedPackage 流，可以在解密的同时计算
+        """
+        if self.encrypted_hmac_key is None:
+            return None, None
+        hash_size = self.key_data['hash_size']
+        hmac_key = _aes_cbc_decrypt(key, self.segment_iv(_BLOCK_HMAC_KEY), self.encrypted_hmac_key)[:hash_size]
+        expected = _aes_cbc_decrypt(key, self.segment_iv(_BLOCK_HMAC_VALUE), self.encrypted_hmac_value)[:hash_size]
+        return hmac.new(hmac_key, digestmod=self.key_data['hash']), expected
+
+
+def _aes_cbc_decrypt(key, iv, data):
+    try:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    except ImportError as e:
+        raise EncryptedWorkbookError(f"解密工作簿需要安装 cryptography: {e}")
+    data = data[:len(data) - len(data) % 16]
+    decryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).decryptor()
+    return decryptor.update(data) + decryptor.finalize()
+
+
+def decrypt_workbook(path, password, max_memory=None, cancel_check=None):
+    """
+    解密加密的工作簿
+
+    Args:
+        path: 工作簿路径，或可寻址的文件对象（例如远程工作簿）
+        password (str): 打开密码
+        max_memory (int): 解密结果在内存中的最大字节数，超过后溢出到临时文件；None 表示始终保存在内存中
+        cancel_check (callable): 每解密一段调用一次，可以抛出异常中止解密
+
+    Returns:
+        可寻址的文件对象（位置在开头），内容为解密后的 .xlsx 压缩包，由调用方关闭
+
+    Raises:
+        EncryptedWorkbookError: 缺少密码、密码错误、不支持的加密方式或文件损坏
+    """
+    with contextlib.nullcontext(path) if hasattr(path, 'read') else open(path, 'rb') as f:
+        ole = CompoundFile(f)
+        if not ole.has_stream('EncryptionInfo') or not ole.has_stream('EncryptedPackage'):
+            raise EncryptedWorkbookError("不是加密的工作簿（可能是旧版 .xls 文件）")
+        if not password:
+            raise EncryptedWorkbookError("工作簿已加密，需要提供密码")
+        encryption = AgileEncryption(ole.read_stream('EncryptionInfo'))
+        key = encryption.package_key(password)
+        check, expected = encryption.integrity_check(key)
+
+        stream = ole.open_stream('EncryptedPackage')
+        size_field = stream.read(8)
+        if len(size_field) < 8:
+            raise EncryptedWorkbookError("加密数据不完整")
+        remaining = struct.unpack('<Q', size_field)[0]
+        if check is not None:
+            check.update(size_field)
+
+        output = tempfile.SpooledTemporaryFile(max_size=max_memory or 0)
+        try:
+            segment = 0
+            while True:
+                data = stream.read(SEGMENT_SIZE)
+                if not data:
+                    break
+                if check is not None:
+                    check.update(data)
+                if remaining > 0:
+                    if cancel_check is not None:
+                        cancel_check()
+                    plain = _aes_cbc_decrypt(key, encryption.segment_iv(struct.pack('<I', segment)), data)
+                    output.write(plain[:remaining])
+                    remaining -= min(remaining, len(plain))
+                    segment += 1
+            if remaining > 0:
+                raise EncryptedWorkbookError("加密数据不完整")
+            if check is not None and not hmac.compare_digest(check.digest(), expected):
+                raise EncryptedWorkbookError("数据完整性校验失败，文件可能已损坏")
+        except BaseException:
+            output.close()
+            raise
+    output.seek(0)
+    return output
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作簿结构缓存
+缓存解析好的工作簿结构（工作表、图片位置、表头、关键列索引、媒体在压缩包中的偏移），
+以文件标识（路径、大小、修改时间）和内容哈希为键。同一个工作簿再次提取时
+（例如换了输出目录或关键列）可以跳过解压、XML 解析和读取表头，直接写出图片。
+缓存保存在内存中（LRU 淘汰），也可以同时以压缩 JSON 的形式保存到磁盘目录
+（超过大小上限时删除最久未使用的文件）
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import struct
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+from pathlib import Path, PurePosixPath
+
+# 结构格式变化时递增，旧的缓存自动失效
+STRUCTURE_VERSION = 2
+# 磁盘缓存目录默认的大小上限（MB）
+DEFAULT_DISK_MB = 256
+_LOCAL_HEADER = struct.Struct('<4s22xHH')
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+def new_structure(fmt):
+    """
+    空的工作簿结构：
+        format: 容器格式（见 workbook_backends.BACKENDS）
+        sheets: [{'name', 'part'（工作表部件在压缩包内的路径）, 'positions': [[媒体, 行, 列, 锚点类型], ...]}]
+        media: {压缩包内路径: [本地文件头偏移, 压缩方式, 压缩后大小, 大小, CRC32]}
+        columns: {工作表: 表头列表}
+        keys: {"工作表\\t关键列索引": [[行号, 关键值], ...]}
+    """
+    return {'version': STRUCTURE_VERSION, 'format': fmt, 'sheets': [], 'media': {}, 'columns': {}, 'keys': {}}
+
+
+def media_entries(zip_ref, prefix):
+    """从压缩包目录中读取 prefix 目录下媒体文件的偏移信息（按压缩包中的顺序）"""
+    return {info.filename: [info.header_offset, info.compress_type, info.compress_size,
+                            info.file_size, info.CRC]
+            for info in zip_ref.infolist()
+            if info.filename.startswith(prefix) and not info.is_dir()
+            and '..' not in PurePosixPath(info.filename).parts}
+
+
+def read_media(f, entry):
+    """
+    按缓存的偏移直接读取一个媒体文件，无需解析压缩包目录
+
+    Raises:
+        ValueError: 偏移处不是预期的数据（文件已变化或缓存损坏）
+    """
+    offset, method, compress_size, size, crc = entry
+    f.seek(offset)
+    signature, name_length, extra_length = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+    if signature != _LOCAL_HEADER_SIGNATURE:
+        raise ValueError(f"偏移 {offset} 处不是压缩文件头")
+    f.seek(offset + _LOCAL_HEADER.size + name_length + extra_length)
+    data = f.read(compress_size)
+    if method == zipfile.ZIP_DEFLATED:
+        try:
+            data = zlib.decompress(data, -15)
+        except zlib.error as e:
+            raise ValueError(f"解压媒体文件失败: {e}")
+    elif method != zipfile.ZIP_STORED:
+        raise ValueError(f"不支持的压缩方式: {method}")
+    if len(data) != size or zlib.crc32(data) != crc:
+        raise ValueError("媒体文件校验失败")
+    return data
+
+
+class StructureCache:
+    """工作簿结构缓存：内存 LRU，可选磁盘目录"""
+
+    def __init__(self, cache_dir=None, max_entries=32, max_disk_mb=DEFAULT_DISK_MB):
+        """
+        Args:
+            cache_dir (str): 磁盘缓存目录，None 时只缓存在内存中
+            max_entries (int): 内存中最多保留的工作簿数量
+            max_disk_mb (float): 磁盘缓存目录的大小上限（MB），超过时删除最久未使用的文件
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_entries = max_entries
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        # 内容哈希 -> 结构
+        self._entries = OrderedDict()
+        # 文件标识 -> 内容哈希，文件未变化时无需重新计算哈希
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """返回工作簿的缓存结构，没有时返回None"""
+        try:
+            digest = self._digest(path)
+        except OSError:
+            return None
+        with self._lock:
+            structure = self._entries.get(digest)
+            if structure is not None:
+                self._entries.move_to_end(digest)
+        if structure is None and self.cache_dir is not None:
+            structure = self._load(digest)
+            if structure is not None:
+                self._remember(digest, structure)
+        if structure is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return structure
+
+    def put(self, path, structure, persist=True):
+        """保存工作簿结构（磁盘写入失败时只保留在内存中）；persist 为 False 时不写入磁盘目录"""
+        try:
+            digest = self._digest(path)
+        except OSError as e:
+            print(f"无法缓存工作簿结构: {e}")
+            return
+        self._remember(digest, structure)
+        if self.cache_dir is not None and persist:
+            self._store(digest, structure)
+
+    def _remember(self, digest, structure):
+        with self._lock:
+            self._entries[digest] = structure
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _digest(self, path):
+        from image_catalog import file_sha256, workbook_identity
+        from remote_workbook import is_remote, remote_digest
+
+        if is_remote(path):
+            # 远程工作簿不下载内容计算哈希，以地址、大小、修改时间和 ETag 为键
+            return remote_digest(path)
+        identity = workbook_identity(path)
+        digest = self._digests.get(identity)
+        if digest is None and self.cache_dir is not None:
+            # 文件标识（路径、大小、修改时间）没变时直接使用记录的哈希，不再读取整个文件
+            digest = self._read_text(self._identity_file(identity))
+        if digest is None:
+            digest = file_sha256(path)
+            if self.cache_dir is not None:
+                self._write(self._identity_file(identity), digest.encode('ascii'))
+        self._digests[identity] = digest
+        return digest
+
+    def _identity_file(self, identity):
+        key = hashlib.sha1(json.dumps(identity).encode('utf-8')).hexdigest()
+        return self.cache_dir / f"id_{key}.txt"
+
+    def _structure_file(self, digest):
+        return self.cache_dir / f"{digest}.json.gz"
+
+    def _load(self, digest):
+        path = self._structure_file(digest)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                structure = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if structure.get('version') != STRUCTURE_VERSION:
+            return None
+        self._touch(path)
+        return structure
+
+    def _store(self, digest, structure):
+        data = gzip.compress(json.dumps(structure, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        self._write(self._structure_file(digest), data)
+        self._prune()
+
+    def _prune(self):
+        """磁盘缓存超过大小上限时，按最后使用时间从旧到新删除文件"""
+        files = []
+        try:
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def _touch(self, path):
+        """更新修改时间，记录最后使用时间（清理时保留最近用过的缓存）"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _read_text(self, path):
+        try:
+            text = path.read_text(encoding='ascii').strip() or None
+        except OSError:
+            return None
+        self._touch(path)
+        return text
+
+    def _write(self, path, data):
+        """先写临时文件再替换，多个进程同时写同一项也不会读到半个文件"""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"写入结构缓存失败: {e}")
+
+
+_shared_caches = {}
+
+
+def shared_structure_cache(cache_dir=None):
+    """同一进程中共用的结构缓存（每个磁盘目录一个，None 为只在内存中）"""
+    key = str(Path(cache_dir).resolve()) if cache_dir else None
+    cache = _shared_caches.get(key)
+    if cache is None:
+        cache = _shared_caches[key] = StructureCache(cache_dir)
+    return cache